@@ -17,6 +17,8 @@ from Nabah.app.routes import api_routes, api_stream, api_video
 from Nabah.app.routes.auth_routes import router as auth_router
 from Nabah.app.routes.dashboard_routes import router as dashboard_router
 from Nabah.app.routes.api_routes import router as api_router
+from fastapi.concurrency import run_in_threadpool
+from Nabah.app.utils import save_to_db, video_jobs, db_executor, voice_alerts, model_registry
 
 PROJECT_ROOT = "/content/Nabah/app"
 TEMPLATES_DIR = os.path.join(PROJECT_ROOT, "templates")
@@ -35,4 +37,21 @@ app.include_router(api_routes.router)
 app.include_router(api_stream.router)
 app.include_router(api_video.router)
 
+
+@app.on_event("startup")
+async def load_models():
+    # every weight file is loaded and warmed before the first request is served
+    await run_in_threadpool(model_registry.registry.preload)
+    video_jobs.jobs.warm_up()
+
+
+@app.on_event("shutdown")
+def flush_pending_writes():
+    api_stream.streams.shutdown()
+    voice_alerts.audio.shutdown()
+    video_jobs.jobs.shutdown()
+    save_to_db.shutdown_writer()
+    db_executor.shutdown()
+    print("Pending DB writes flushed.")
+
 print("Nabah FastAPI Server is running successfully!")
@@ -1,273 +1,143 @@
+from typing import Optional
+import asyncio
 from fastapi import APIRouter
 from fastapi.responses import JSONResponse
-from datetime import datetime
-from collections import defaultdict
 from Nabah.app.utils.supabase_client import supabase
+from Nabah.app.utils import supabase_client, rag_search
 from pydantic import BaseModel
-from Nabah.app.utils.llm_chat import ask_llm
+from Nabah.app.utils.llm_chat import ask_llm, answer_cache
+from Nabah.app.utils import dashboard_stats, dashboard_charts, rollups, db_browse
+from Nabah.app.utils.response_cache import cache
+from Nabah.app.utils.db_executor import run_db, run_llm
+from Nabah.app.utils import db_executor
 
 router = APIRouter()
 
+STATS_TABLES = ("persons", "alerts", "spills", "videos")
+CHARTS_TABLES = ("persons", "alerts", "spills", "detections")
+DATABASE_TABLES = ["persons", "alerts", "spills", "videos", "detections", "clips"]
+
+
 @router.get("/api/dashboard-stats")
 async def get_dashboard_stats():
     if not supabase:
         print("Supabase client not initialized in get_dashboard_stats.")
         return JSONResponse({"error": "Database connection not available."}, status_code=500)
     try:
-        persons = supabase.table("persons").select("has_mask, has_gloves, has_labcoat, has_glasses, created_at, status, in_red_zone").execute().data or []
-        alerts = supabase.table("alerts").select("alert_type").execute().data or []
-        spills = supabase.table("spills").select("*").execute().data or []
-        videos = supabase.table("videos").select("*").execute().data or []
-
-        persons_count = len(persons)
-        alerts_count = len(alerts)
-        spills_count = len(spills)
-        videos_count = len(videos)
-
-        safe_count = sum(
-            1 for p in persons if all([
-                p.get("has_mask") is True,
-                p.get("has_gloves") is True,
-                p.get("has_labcoat") is True,
-                p.get("has_glasses") is True,
-            ])
+        stats = await cache.get_or_compute(
+            "dashboard-stats", lambda: run_db(dashboard_stats.fetch_stats, supabase), tags=STATS_TABLES
         )
-        compliance_rate = round((safe_count / persons_count) * 100, 2) if persons_count > 0 else 0
-
-        hours = set()
-        for p in persons:
-            ts = p.get("created_at")
-            if ts:
-                try:
-                    dt_obj = datetime.fromisoformat(ts.replace('Z', '+00:00'))
-                    hours.add(dt_obj.strftime('%Y-%m-%d %H'))
-                except ValueError:
-                    continue
-        active_hours = len(hours)
-
-        return JSONResponse({
-            "persons_count": persons_count,
-            "alerts_count": alerts_count,
-            "spills_count": spills_count,
-            "videos_count": videos_count,
-            "compliance_rate": compliance_rate,
-            "active_hours": active_hours
-        })
+        return JSONResponse(stats)
     except Exception as e:
         print("Error fetching dashboard stats:", e)
         return JSONResponse({"error": str(e)}, status_code=500)
 
 
+def _load_charts():
+    if rollups.ROLLUPS_ENABLED:
+        try:
+            return rollups.fetch_charts()
+        except Exception as e:
+            print("Rollups unavailable, computing charts from raw tables:", e)
+    persons = supabase.table("persons").select("has_mask, has_gloves, has_labcoat, has_glasses, created_at, status, in_red_zone").execute().data or []
+    alerts = supabase.table("alerts").select("alert_type").execute().data or []
+    spills = supabase.table("spills").select("*").execute().data or []
+    detections = supabase.table("detections").select("class_name, confidence").execute().data or []
+    return dashboard_charts.compute_charts(persons, alerts, spills, detections)
+
+
 @router.get("/api/dashboard-charts")
 async def get_dashboard_charts():
     if not supabase:
         print("Supabase client not initialized in get_dashboard_charts.")
         return JSONResponse({"error": "Database connection not available."}, status_code=500)
     try:
-        persons = supabase.table("persons").select("has_mask, has_gloves, has_labcoat, has_glasses, created_at, status, in_red_zone").execute().data or []
-        alerts = supabase.table("alerts").select("alert_type").execute().data or []
-        spills = supabase.table("spills").select("*").execute().data or []
-
-        compliance_daily = defaultdict(lambda: [0, 0])
-        for p in persons:
-            created_at = p.get("created_at")
-            if not created_at:
-                continue
-            try:
-                day = datetime.fromisoformat(created_at.replace('Z', '+00:00')).strftime('%Y-%m-%d')
-            except ValueError:
-                continue
-            compliance_daily[day][0] += 1
-            if all([p.get("has_mask") is True, p.get("has_gloves") is True, p.get("has_labcoat") is True, p.get("has_glasses") is True]):
-                compliance_daily[day][1] += 1
-
-        compliance_over_time = [
-            {"day": d, "rate": round((c / t) * 100, 2) if t else 0}
-            for d, (t, c) in sorted(compliance_daily.items())
-        ]
-
-        total_persons_for_ppe = len(persons) or 1
-        ppe_compliance = {
-            "Mask": round(sum(1 for p in persons if p.get("has_mask") is True) / total_persons_for_ppe * 100, 2),
-            "Gloves": round(sum(1 for p in persons if p.get("has_gloves") is True) / total_persons_for_ppe * 100, 2),
-            "Labcoat": round(sum(1 for p in persons if p.get("has_labcoat") is True) / total_persons_for_ppe * 100, 2),
-            "Glasses": round(sum(1 for p in persons if p.get("has_glasses") is True) / total_persons_for_ppe * 100, 2)
-        }
-
-        zone_events = {"Red Zone": 0, "Other": 0}
-        for p in persons:
-            if str(p.get("status", "")).lower() == "unsafe":
-                if p.get("in_red_zone") is True:
-                    zone_events["Red Zone"] += 1
-                else:
-                    zone_events["Other"] += 1
-
-        incident_types = defaultdict(int)
-        for a in alerts:
-            incident_types[a.get("alert_type", "Unknown")] += 1
-
-        shift_buckets = {"Morning": [0, 0], "Evening": [0, 0], "Night": [0, 0]}
-        for p in persons:
-            created_at = p.get("created_at")
-            if not created_at:
-                continue
-            try:
-                hour = datetime.fromisoformat(created_at.replace('Z', '+00:00')).hour
-            except ValueError:
-                continue
-
-            if 8 <= hour < 16:
-                shift = "Morning"
-            elif 16 <= hour < 24:
-                shift = "Evening"
-            else:
-                shift = "Night"
-            shift_buckets[shift][0] += 1
-            if all([p.get("has_mask") is True, p.get("has_gloves") is True, p.get("has_labcoat") is True, p.get("has_glasses") is True]):
-                shift_buckets[shift][1] += 1
-
-        shift_compliance = {
-            s: round((c / t) * 100, 2) if t else 0
-            for s, (t, c) in shift_buckets.items()
-        }
-
-        unsafe_ratio_daily = defaultdict(lambda: [0, 0])
-        for p in persons:
-            created_at = p.get("created_at")
-            if not created_at:
-                continue
-            try:
-                day = datetime.fromisoformat(created_at.replace('Z', '+00:00')).strftime('%Y-%m-%d')
-            except ValueError:
-                continue
-            unsafe_ratio_daily[day][0] += 1
-            if str(p.get("status", "")).lower() == "unsafe":
-                unsafe_ratio_daily[day][1] += 1
-
-        unsafe_ratio = {
-            d: round((unsafe / total) * 100, 2) if total else 0
-            for d, (total, unsafe) in sorted(unsafe_ratio_daily.items())
-        }
+        charts = await cache.get_or_compute("dashboard-charts", lambda: run_db(_load_charts), tags=CHARTS_TABLES)
+        return JSONResponse(charts)
+    except Exception as e:
+        print("Error in charts:", e)
+        return JSONResponse({"error": str(e)}, status_code=500)
 
-        violation_counts = {"Mask": 0, "Gloves": 0, "Labcoat": 0, "Glasses": 0}
-        for p in persons:
-            if str(p.get("status", "")).lower() == "unsafe":
-                if not p.get("has_mask"): violation_counts["Mask"] += 1
-                if not p.get("has_gloves"): violation_counts["Gloves"] += 1
-                if not p.get("has_labcoat"): violation_counts["Labcoat"] += 1
-                if not p.get("has_glasses"): violation_counts["Glasses"] += 1
 
-        alert_type_counts = defaultdict(int)
-        for a in alerts:
-            alert_type_counts[a.get("alert_type", "Unknown")] += 1
+def _browse(table, limit, cursor=None, columns=None, filters=None, since=None, until=None):
+    key = f"database:{table}:{limit}:{cursor}:{columns}:{sorted((filters or {}).items())}:{since}:{until}"
+    return cache.get_or_compute(
+        key,
+        lambda: run_db(db_browse.fetch_page, table, limit, cursor, columns, filters, since, until),
+        tags=(table,),
+    )
 
-        spills_per_day = defaultdict(int)
-        for s in spills:
-            ts = s.get("detected_at") or s.get("created_at")
-            if not ts:
-                continue
-            try:
-                day = datetime.fromisoformat(ts.replace('Z', '+00:00')).strftime('%Y-%m-%d')
-                spills_per_day[day] += 1
-            except ValueError:
-                continue
 
-        ppe_histogram = {
-            "Fully Safe": sum(1 for p in persons if p["status"] == "safe"),
-            "Unsafe": sum(1 for p in persons if p["status"] == "unsafe"),
-        }
+async def _first_page(table, limit):
+    try:
+        return await _browse(table, limit)
+    except Exception as sub_e:
+        print(f"Error loading {table}: {sub_e}")
+        return {"table": table, "rows": [], "limit": limit, "next_cursor": None}
 
-        avg_ppe_items = round(sum([
-            int(p.get("has_mask", 0)) +
-            int(p.get("has_gloves", 0)) +
-            int(p.get("has_labcoat", 0)) +
-            int(p.get("has_glasses", 0))
-            for p in persons
-        ]) / max(len(persons), 1), 2)
 
-        unsafe_trend = defaultdict(lambda: [0, 0])
-        for p in persons:
-            ts = p.get("created_at")
-            if not ts:
-                continue
-            try:
-                day = datetime.fromisoformat(ts.replace('Z', '+00:00')).strftime('%Y-%m-%d')
-            except ValueError:
-                continue
-            unsafe_trend[day][0] += 1
-            if str(p.get("status", "")).lower() == "unsafe":
-                unsafe_trend[day][1] += 1
+@router.get("/api/database")
+async def get_database(tables: Optional[str] = None, limit: int = db_browse.DEFAULT_PAGE_SIZE, with_cursors: bool = False):
+    """
+    Newest page of each requested table (all of them by default), fetched
+    concurrently. with_cursors=true wraps the result as {"tables", "cursors"}
+    so the client can continue with /api/database/{table}.
+    """
+    names = [t.strip() for t in tables.split(",") if t.strip()] if tables else DATABASE_TABLES
+    unknown = [t for t in names if t not in db_browse.BROWSE_TABLES]
+    if unknown:
+        return JSONResponse({"error": f"Unknown table(s): {', '.join(unknown)}"}, status_code=400)
+    try:
+        pages = await asyncio.gather(*(_first_page(t, limit) for t in names))
+        result = {p["table"]: p["rows"] for p in pages}
+        if with_cursors:
+            return JSONResponse({"tables": result, "cursors": {p["table"]: p["next_cursor"] for p in pages}})
+        return JSONResponse(result)
+    except Exception as e:
+        print("DB error:", e)
+        return JSONResponse({"error": str(e)}, status_code=500)
 
-        unsafe_over_time = [
-            {"day": d, "unsafe_rate": round((u / t) * 100, 2) if t else 0}
-            for d, (t, u) in sorted(unsafe_trend.items())
-        ]
 
-        total_persons = len(persons) or 1
-        ppe_missing_ratio = {
-            "Mask": round(sum(1 for p in persons if not p.get("has_mask")) / total_persons * 100, 2),
-            "Gloves": round(sum(1 for p in persons if not p.get("has_gloves")) / total_persons * 100, 2),
-            "Labcoat": round(sum(1 for p in persons if not p.get("has_labcoat")) / total_persons * 100, 2),
-            "Glasses": round(sum(1 for p in persons if not p.get("has_glasses")) / total_persons * 100, 2),
-        }
+@router.get("/api/database/{table}")
+async def browse_table(
+    table: str,
+    limit: int = db_browse.DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    columns: Optional[str] = None,
+    status: Optional[str] = None,
+    alert_type: Optional[str] = None,
+    video_id: Optional[int] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+):
+    if table not in db_browse.BROWSE_TABLES:
+        return JSONResponse({"error": f"Unknown table '{table}'"}, status_code=404)
+    filters = {"status": status, "alert_type": alert_type, "video_id": video_id}
+    try:
+        page = await _browse(table, limit, cursor, columns, filters, since, until)
+        return JSONResponse(page)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    except Exception as e:
+        print(f"DB error browsing {table}:", e)
+        return JSONResponse({"error": str(e)}, status_code=500)
 
-        alerts_daily = defaultdict(int)
-        for a in alerts:
-            ts = a.get("created_at")
-            if not ts:
-                continue
-            try:
-                day = datetime.fromisoformat(ts.replace('Z', '+00:00')).strftime('%Y-%m-%d')
-                alerts_daily[day] += 1
-            except ValueError:
-                continue
 
-        detections = supabase.table("detections").select("class_name, confidence").execute().data or []
-        conf_by_class = defaultdict(list)
-        for d in detections:
-            if d.get("class_name") and d.get("confidence") is not None:
-                conf_by_class[d["class_name"]].append(float(d["confidence"]))
-        avg_confidence = {k: round(sum(v) / len(v), 2) for k, v in conf_by_class.items() if v}
+@router.get("/api/cache-stats")
+async def get_cache_stats():
+    return JSONResponse({**cache.stats(), "embeddings": rag_search.cache_stats(), "answers": answer_cache.stats()})
 
-        return JSONResponse({
-            "compliance_over_time": compliance_over_time,
-            "ppe_compliance": ppe_compliance,
-            "zone_events": zone_events,
-            "incident_types": incident_types,
-            "shift_compliance": shift_compliance,
-            "unsafe_ratio": unsafe_ratio,
-            "violation_counts": violation_counts,
-            "alert_type_counts": alert_type_counts,
-            "spills_per_day": spills_per_day,
-            "ppe_histogram": ppe_histogram,
-            "avg_ppe_items": avg_ppe_items,
-            "unsafe_over_time": unsafe_over_time,
-            "ppe_missing_ratio": ppe_missing_ratio,
-            "alerts_daily": alerts_daily,
-            "avg_confidence": avg_confidence
-        })
 
-    except Exception as e:
-        print("Error in charts:", e)
-        return JSONResponse({"error": str(e)}, status_code=500)
+@router.get("/api/executor-stats")
+async def get_executor_stats():
+    return JSONResponse(db_executor.stats())
 
 
-@router.get("/api/database")
-async def get_database():
-    try:
-        tables = ["persons", "alerts", "spills", "videos", "detections", "clips"]
-        result = {}
-        for t in tables:
-            try:
-                rows = supabase.table(t).select("*").limit(100).execute().data or []
-                result[t] = rows
-            except Exception as sub_e:
-                print(f"Error loading {t}: {sub_e}")
-                result[t] = []
-        return JSONResponse(result)
-    except Exception as e:
-        print("DB error:", e)
-        return JSONResponse({"error": str(e)}, status_code=500)
+@router.get("/api/health")
+async def get_health():
+    checks = await run_db(supabase_client.health)
+    ok = all(c["ok"] for c in checks.values())
+    return JSONResponse({"ok": ok, **checks}, status_code=200 if ok else 503)
 
 
 class ChatRequest(BaseModel):
@@ -276,7 +146,7 @@ class ChatRequest(BaseModel):
 @router.post("/api/db-chat")
 async def db_chat(request: ChatRequest):
     try:
-        answer = ask_llm(request.question)
+        answer = await run_llm(ask_llm, request.question)
         return JSONResponse({"answer": answer})
     except Exception as e:
         print("LLM chat error:", e)
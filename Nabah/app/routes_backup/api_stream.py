@@ -1,156 +1,166 @@
 from fastapi import APIRouter
 from fastapi.responses import JSONResponse, StreamingResponse
-from datetime import datetime, timezone
-import cv2, os, asyncio, time
-import edge_tts
-from playsound import playsound
-from ultralytics import YOLO
-from Nabah.app.utils import save_to_db
-from Nabah.app.utils.supabase_client import supabase
+from pydantic import BaseModel
+from typing import Optional
+from Nabah.app.utils import model_registry, video_utils, voice_alerts
+from Nabah.app.utils.stream_manager import StreamManager, alert_text
+from fastapi.concurrency import run_in_threadpool
 
 router = APIRouter()
 
-MODELS_DIR = "/content/models"
-VOICES_DIR = "voices"
-os.makedirs(VOICES_DIR, exist_ok=True)
+DEFAULT_CAMERA = "default"
 
-person_model = YOLO(os.path.join(MODELS_DIR, "yolov8n.pt"))
-mask_model = YOLO(os.path.join(MODELS_DIR, "mask.pt"))
-gloves_model = YOLO(os.path.join(MODELS_DIR, "gloves.pt"))
-labcoat_model = YOLO(os.path.join(MODELS_DIR, "labcoat.pt"))
-glasses_model = YOLO(os.path.join(MODELS_DIR, "glasses.pt"))
 
-camera = None
-is_streaming = False
-current_status = "safe"
+def _on_alert(cam, text):
+    # queued for the audio worker; the inference thread moves on immediately
+    voice_alerts.say(text)
 
 
-async def generate_voice_file(text):
-    voice = "ar-SA-ZariyahNeural"
-    timestamp = int(time.time() * 1000)
-    mp3_path = os.path.join(VOICES_DIR, f"alert_{timestamp}.mp3")
-    communicate = edge_tts.Communicate(text=text, voice=voice)
-    await communicate.save(mp3_path)
-    return mp3_path
+streams = StreamManager(model_registry.registry, on_alert=_on_alert)
+streams.register_from_env()
+voice_alerts.presynthesize_in_background(
+    alert_text(missing) for missing in voice_alerts.missing_combinations(video_utils.PPE_ITEMS)
+)
 
-def speak(text):
+
+class StreamSource(BaseModel):
+    camera_id: str
+    source: str
+    title: Optional[str] = None
+
+
+async def _feed(camera_id):
+    if streams.get(camera_id) is None:
+        return JSONResponse({"error": f"Unknown camera '{camera_id}'"}, status_code=404)
     try:
-        loop = asyncio.get_event_loop()
-    except RuntimeError:
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-    mp3_path = loop.run_until_complete(generate_voice_file(text))
-    playsound(mp3_path)
-
-
-def analyze_frame(frame, video_id):
-    global current_status
-    results = person_model(frame, verbose=False)
-    unsafe_detected = False
-    alert_text = ""
-
-    for box in results[0].boxes:
-        if int(box.cls[0]) == 0 and float(box.conf[0]) > 0.6:
-            x1, y1, x2, y2 = map(int, box.xyxy[0].cpu())
-            crop = frame[y1:y2, x1:x2]
-            if crop.size == 0:
-                continue
-
-            has_mask = len(mask_model(crop, verbose=False)[0].boxes) > 0
-            has_gloves = len(gloves_model(crop, verbose=False)[0].boxes) > 0
-            has_labcoat = len(labcoat_model(crop, verbose=False)[0].boxes) > 0
-            has_glasses = len(glasses_model(crop, verbose=False)[0].boxes) > 0
-
-            all_ok = has_mask and has_gloves and has_labcoat and has_glasses
-            status = "safe" if all_ok else "unsafe"
-            color = (0, 255, 0) if all_ok else (0, 0, 255)
-            cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
-            cv2.putText(frame, status.upper(), (x1, y1 - 10),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
-
-            save_to_db.save_person(
-                video_id=video_id,
-                track_id=None,
-                frame_number=int(time.time() * 1000) % 100000,
-                has_mask=has_mask,
-                has_gloves=has_gloves,
-                has_labcoat=has_labcoat,
-                has_glasses=has_glasses,
-                in_red_zone=False,
-                status=status,
-                created_at=datetime.now(timezone.utc).isoformat()
-            )
-
-            if not all_ok:
-                unsafe_detected = True
-                missing_ar = []
-                if not has_mask: missing_ar.append("الكمامة")
-                if not has_gloves: missing_ar.append("القفازات")
-                if not has_labcoat: missing_ar.append("المعطف")
-                if not has_glasses: missing_ar.append("النظارات")
-                alert_text = f"لم يتم ارتداء {' و '.join(missing_ar)}"
-
-    if unsafe_detected and current_status == "safe":
-        print(f"Alert: {alert_text}")
-        speak(alert_text)
-        save_to_db.save_alert(None, "PPE Violation", alert_text)
-        current_status = "unsafe"
-    elif not unsafe_detected and current_status == "unsafe":
-        print("Status is safe now")
-        current_status = "safe"
-
-    return frame
-
-
-def generate_frames(video_id):
-    global camera, is_streaming
-    while is_streaming and camera.isOpened():
-        ret, frame = camera.read()
-        if not ret:
-            break
-        frame = analyze_frame(frame, video_id)
-        _, buffer = cv2.imencode('.jpg', frame)
-        yield (b'--frame\r\nContent-Type: image/jpeg\r\n\r\n' +
-               buffer.tobytes() + b'\r\n')
+        # every viewer shares the camera's loop; only the first one starts it
+        cam = await run_in_threadpool(streams.start, camera_id)
+    except KeyError:
+        return JSONResponse({"error": f"Unknown camera '{camera_id}'"}, status_code=404)
+    except ConnectionError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    return StreamingResponse(
+        cam.frames(),
+        media_type="multipart/x-mixed-replace; boundary=frame"
+    )
 
 
 @router.get("/video_feed")
 async def video_feed():
-    global camera, is_streaming
     try:
-        if not is_streaming:
-            camera = cv2.VideoCapture(1)
-            if not camera.isOpened():
-                return JSONResponse({"error": "Cannot access external camera"}, status_code=400)
-
-            is_streaming = True
-            print("External camera started")
-
-            video = save_to_db.save_video(
-                video_name="External Camera",
-                title="Real-Time Monitoring"
-            )
-            video_id = video.data[0]["id"] if video and video.data else None
-        else:
-            video_id = None
+        return await _feed(DEFAULT_CAMERA)
+    except Exception as e:
+        print("Stream error:", e)
+        return JSONResponse({"error": str(e)}, status_code=500)
+
 
-        return StreamingResponse(
-            generate_frames(video_id),
-            media_type="multipart/x-mixed-replace; boundary=frame"
-        )
+@router.get("/video_feed/{camera_id}")
+async def camera_feed(camera_id: str):
+    try:
+        return await _feed(camera_id)
     except Exception as e:
         print("Stream error:", e)
         return JSONResponse({"error": str(e)}, status_code=500)
 
 
 @router.get("/stop_feed")
-async def stop_feed():
-    global camera, is_streaming
+async def stop_feed(camera_id: str = DEFAULT_CAMERA):
     try:
-        if camera and camera.isOpened():
-            camera.release()
-        is_streaming = False
-        print("Camera stopped.")
+        await run_in_threadpool(streams.stop, camera_id)
         return JSONResponse({"message": "Camera stopped."})
     except Exception as e:
         return JSONResponse({"error": str(e)}, status_code=500)
+
+
+@router.get("/api/streams")
+async def list_streams():
+    return JSONResponse(streams.report())
+
+
+@router.get("/api/voice-alerts")
+async def voice_alert_stats():
+    return JSONResponse(voice_alerts.audio.stats())
+
+
+@router.post("/api/streams")
+async def register_stream(body: StreamSource):
+    try:
+        cam = streams.register(body.camera_id, body.source, body.title)
+        return JSONResponse(cam.report(), status_code=201)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=409)
+
+
+@router.get("/api/streams/{camera_id}/latency")
+async def stream_latency(camera_id: str):
+    cam = streams.get(camera_id)
+    if cam is None:
+        return JSONResponse({"error": f"Unknown camera '{camera_id}'"}, status_code=404)
+    return JSONResponse({
+        "camera_id": camera_id,
+        "frames": list(cam.stats.frames),
+        "alerts": list(cam.stats.alerts),
+        "stale_frames_dropped": cam.slot.dropped,
+    })
+
+
+@router.post("/api/streams/{camera_id}/start")
+async def start_stream(camera_id: str):
+    try:
+        cam = await run_in_threadpool(streams.start, camera_id)
+        return JSONResponse(cam.report())
+    except KeyError:
+        return JSONResponse({"error": f"Unknown camera '{camera_id}'"}, status_code=404)
+    except ConnectionError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+
+@router.post("/api/streams/{camera_id}/stop")
+async def stop_stream(camera_id: str):
+    if streams.get(camera_id) is None:
+        return JSONResponse({"error": f"Unknown camera '{camera_id}'"}, status_code=404)
+    await run_in_threadpool(streams.stop, camera_id)
+    return JSONResponse(streams.get(camera_id).report())
+
+
+@router.delete("/api/streams/{camera_id}")
+async def remove_stream(camera_id: str):
+    removed = await run_in_threadpool(streams.remove, camera_id)
+    if not removed:
+        return JSONResponse({"error": f"Unknown camera '{camera_id}'"}, status_code=404)
+    return JSONResponse({"message": f"Camera {camera_id} removed."})
+
+
+MODEL_ACTIONS = {"start": "enable", "enable": "enable", "stop": "disable", "disable": "disable", "reload": "reload"}
+
+
+@router.get("/api/models")
+async def list_models():
+    return JSONResponse({"models": model_registry.registry.stats()})
+
+
+@router.post("/api/model/{model}/{action}")
+async def control_model(model: str, action: str):
+    """Used by the settings page: start / stop (aliases of enable / disable) and reload."""
+    registry = model_registry.registry
+    op = MODEL_ACTIONS.get(action.lower())
+    if model not in registry.entries:
+        return JSONResponse({"error": f"Unknown model '{model}'"}, status_code=404)
+    if op is None:
+        return JSONResponse({"error": f"Unknown action '{action}'", "actions": sorted(MODEL_ACTIONS)}, status_code=400)
+    try:
+        if op == "reload":
+            # the one synchronous load; kept off the event loop, and inference keeps using the old pool meanwhile
+            entry = await run_in_threadpool(registry.reload, model)
+            message = f"Model '{model}' reloaded in {entry.load_ms + entry.warmup_ms:.0f} ms."
+        else:
+            entry = registry.set_enabled(model, op == "enable")
+            message = f"Model '{model}' {op}d."
+            if entry.loading:
+                message += " It is loading in the background."
+            elif entry.enabled and entry.pool is None:
+                message += f" It is not loaded: {entry.error or 'load failed recently, retry shortly'}."
+    except Exception as e:
+        print(f"Model {action} failed ({model}):", e)
+        return JSONResponse({"error": str(e), "message": f"Cannot {action} model '{model}': {e}"}, status_code=500)
+    return JSONResponse({"message": message, "model": entry.report()})
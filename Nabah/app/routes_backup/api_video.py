@@ -1,66 +1,120 @@
-from fastapi import APIRouter, UploadFile, File, Form
+from fastapi import APIRouter, UploadFile, File, Form, Request
 from fastapi.responses import JSONResponse, FileResponse
-from datetime import datetime, timezone
-import cv2, os, tempfile
-from Nabah.app.utils import save_to_db, video_utils
-from Nabah.app.utils.supabase_client import supabase
+from fastapi.routing import APIRoute
+from starlette.concurrency import run_in_threadpool
+import os, tempfile
+from Nabah.app.utils import video_jobs
 
-router = APIRouter()
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_MB", "2048")) * 1024 * 1024
+# multipart boundaries and the other form fields on top of the file itself
+FORM_OVERHEAD_BYTES = 64 * 1024
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+VIDEO_EXTENSIONS = {".mp4", ".avi", ".mov", ".mkv", ".webm", ".ts"}
 
-@router.post("/api/analyze-video")
-async def analyze_video(file: UploadFile = File(...), title: str = Form("Analyzed Video"), analysis_type: str = Form("ppe")):
-    try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".mp4") as tmp:
-            tmp.write(await file.read())
-            src = tmp.name
 
-        cap = cv2.VideoCapture(src)
-        if not cap.isOpened():
-            return JSONResponse({"error": "Cannot open video"}, status_code=400)
+class UploadTooLarge(Exception):
+    pass
 
-        fps = max(1, int(cap.get(cv2.CAP_PROP_FPS)))
-        w = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        h = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        os.makedirs("/content/outputs", exist_ok=True)
-        out_path = f"/content/outputs/annotated_{datetime.now().strftime('%Y%m%d_%H%M%S')}.mp4"
-        out = cv2.VideoWriter(out_path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (w, h))
 
-        models = video_utils.load_models_by_type(analysis_type)
+def _too_large_response():
+    return JSONResponse({"error": f"Upload exceeds {MAX_UPLOAD_BYTES // (1024 * 1024)} MB limit"}, status_code=413)
+
+
+class UploadLimitRoute(APIRoute):
+    """
+    Checks Content-Length before FastAPI parses the form: by the time the
+    handler runs, Starlette has already spooled the whole body to disk.
+    Chunked bodies (no Content-Length) are caught by save_upload instead.
+    """
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def limited(request: Request):
+            length = request.headers.get("content-length")
+            if length is not None:
+                if not length.isdigit():
+                    return JSONResponse({"error": "Invalid Content-Length"}, status_code=400)
+                if int(length) > MAX_UPLOAD_BYTES + FORM_OVERHEAD_BYTES:
+                    return _too_large_response()
+            return await handler(request)
+
+        return limited
+
+
+router = APIRouter(route_class=UploadLimitRoute)
+
+
+async def save_upload(file: UploadFile) -> str:
+    """
+    Copy the upload to a temp file chunk by chunk (never the whole video in RAM).
+    The temp file is removed here on failure, otherwise by the video job.
+    """
+    ext = os.path.splitext(file.filename or "")[1].lower()
+    fd, path = tempfile.mkstemp(suffix=ext if ext in VIDEO_EXTENSIONS else ".mp4")
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as tmp:
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_BYTES)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > MAX_UPLOAD_BYTES:
+                    raise UploadTooLarge(f"Upload exceeds {MAX_UPLOAD_BYTES // (1024 * 1024)} MB limit")
+                await run_in_threadpool(tmp.write, chunk)
+    except BaseException:
+        os.remove(path)
+        raise
+    finally:
+        await file.close()
+    print(f"Upload saved: {path} ({size / (1024 * 1024):.1f} MB)")
+    return path
 
-        video_id = None
-        try:
-            res = supabase.table("videos").insert({
-                "title": title,
-                "video_name": os.path.basename(src),
-                "uploaded_at": datetime.now(timezone.utc).isoformat()
-            }).execute()
-            video_id = res.data[0]["id"] if res.data else None
-        except Exception as e:
-            print("Cannot insert video:", e)
-
-        frame_i = 0
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-            frame_i += 1
-            frame = video_utils.process_frame(frame, models, video_id, frame_i)
-            out.write(frame)
-
-        cap.release()
-        out.release()
 
+@router.post("/api/analyze-video")
+async def analyze_video(file: UploadFile = File(...), title: str = Form("Analyzed Video"), analysis_type: str = Form("ppe"), ppe_mode: str = Form("separate"),
+                        sampling: str = Form("all"), analysis_fps: float = Form(0)):
+    try:
+        src = await save_upload(file)
+        try:
+            job_id = video_jobs.jobs.submit(src, title, analysis_type, ppe_mode, sampling, analysis_fps)
+        except Exception:
+            os.remove(src)
+            raise
         return JSONResponse({
-            "status": "success",
-            "video_id": video_id,
+            "status": "queued",
+            "job_id": job_id,
             "analysis_type": analysis_type,
-            "download_url": f"/download/{os.path.basename(out_path)}"
-        })
+            "status_url": f"/api/jobs/{job_id}"
+        }, status_code=202)
+    except UploadTooLarge as e:
+        return JSONResponse({"error": str(e)}, status_code=413)
     except Exception as e:
         print("analyze_video error:", e)
         return JSONResponse({"error": str(e)}, status_code=500)
 
 
+@router.get("/api/jobs")
+async def list_jobs():
+    return JSONResponse({"jobs": video_jobs.jobs.list()})
+
+
+@router.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = video_jobs.jobs.get(job_id)
+    if job is None:
+        return JSONResponse({"error": "Job not found"}, status_code=404)
+    return JSONResponse(job)
+
+
+@router.post("/api/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str):
+    if not video_jobs.jobs.cancel(job_id):
+        return JSONResponse({"error": "Job not found"}, status_code=404)
+    return JSONResponse({"message": "Cancellation requested.", "job_id": job_id})
+
+
 @router.get("/download/{filename}")
 async def download_file(filename: str):
     path = f"/content/outputs/{filename}"
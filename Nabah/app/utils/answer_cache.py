@@ -0,0 +1,116 @@
+"""
+Semantic cache for LLM answers.
+
+A question hits when its embedding is within `threshold` cosine
+similarity of a cached one, in the same language, with the same time
+words / numbers ("today" vs "this week" must not share an answer), and
+the chat tables haven't changed since: every entry keeps the
+response_cache table versions it was answered under, which the DB
+writers bump (and video_jobs, when an upload finishes in its worker
+process, since those writes never reach this process's writer).
+"""
+from collections import OrderedDict
+import os, re, threading, time
+import numpy as np
+from Nabah.app.utils import response_cache
+
+
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "256"))
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "600"))
+ANSWER_TABLES = ("persons", "alerts", "spills", "detections", "videos")
+
+_TIME_WORDS = re.compile(
+    r"\b(today|yesterday|week|month|year|hour|last|this)\b|اليوم|أمس|البارحة|أسبوع|اسبوع|شهر|سنة|ساعة|\d+",
+    re.IGNORECASE,
+)
+
+
+def time_signature(question):
+    return frozenset(m.group(0).lower() for m in _TIME_WORDS.finditer(question))
+
+
+class AnswerCache:
+    def __init__(self, max_entries=ANSWER_CACHE_SIZE, threshold=ANSWER_CACHE_THRESHOLD, ttl=ANSWER_CACHE_TTL, tables=ANSWER_TABLES):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.ttl = ttl
+        self.tables = tables
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.saved_seconds = 0.0
+        self.llm_seconds = 0.0
+        self.stored = 0
+        self._entries = OrderedDict()
+        self._matrix = None
+        self._next_key = 0
+        self._lock = threading.Lock()
+
+    def current_versions(self):
+        return response_cache.cache.versions(*self.tables)
+
+    def _fresh(self, entry):
+        return time.monotonic() - entry["created"] < self.ttl and entry["versions"] == self.current_versions()
+
+    def lookup(self, question, vec, arabic):
+        """Cached answer or None."""
+        vec = np.asarray(vec, dtype=np.float32)
+        signature = time_signature(question)
+        with self._lock:
+            if self._entries:
+                if self._matrix is None:
+                    self._matrix = (list(self._entries), np.stack([e["vec"] for e in self._entries.values()]))
+                keys, matrix = self._matrix
+                sims = matrix @ vec
+                for i in np.argsort(-sims):
+                    if sims[i] < self.threshold:
+                        break
+                    entry = self._entries[keys[i]]
+                    if entry["arabic"] != arabic or entry["signature"] != signature:
+                        continue
+                    if not self._fresh(entry):
+                        self._entries.pop(keys[i])
+                        self._matrix = None
+                        self.stale += 1
+                        # a less similar entry may still be fresh
+                        continue
+                    self._entries.move_to_end(keys[i])
+                    self.hits += 1
+                    self.saved_seconds += entry["seconds"]
+                    return entry["answer"]
+            self.misses += 1
+            return None
+
+    def store(self, question, vec, answer, arabic, seconds, versions=None):
+        """versions: table versions read before answering (so writes during the LLM call count)."""
+        with self._lock:
+            self._entries[self._next_key] = {
+                "vec": np.asarray(vec, dtype=np.float32),
+                "answer": answer,
+                "arabic": arabic,
+                "signature": time_signature(question),
+                "versions": versions if versions is not None else self.current_versions(),
+                "created": time.monotonic(),
+                "seconds": seconds,
+            }
+            self._next_key += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._matrix = None
+            self.stored += 1
+            self.llm_seconds += seconds
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0,
+            "latency_saved_s": round(self.saved_seconds, 2),
+            "avg_llm_s": round(self.llm_seconds / self.stored, 2) if self.stored else None,
+        }
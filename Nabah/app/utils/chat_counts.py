@@ -0,0 +1,89 @@
+"""
+DB lookups behind the chat's count/trend answers (see sql/chat_counts.sql).
+
+Every lookup is a network round trip, so the independent ones are issued
+concurrently; trend questions use one grouped-count RPC when installed.
+`client` is the Supabase client (benchmarks pass a local stand-in).
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+import os
+
+
+CHAT_FANOUT_WORKERS = int(os.getenv("CHAT_FANOUT_WORKERS", "6"))
+CHAT_COUNTS_RPC = os.getenv("CHAT_COUNTS_RPC", "1") == "1"
+
+# timestamp column per table (spills and detections have no created_at)
+TIME_COLUMNS = {
+    "persons": "created_at",
+    "alerts": "created_at",
+    "spills": "detected_at",
+    "detections": "detected_at",
+    "videos": "uploaded_at",
+}
+
+_pool = ThreadPoolExecutor(max_workers=CHAT_FANOUT_WORKERS, thread_name_prefix="chat-fanout")
+_warned = False
+
+
+def fan_out(calls):
+    """Run zero-argument callables concurrently; results in call order."""
+    futures = [_pool.submit(call) for call in calls]
+    return [f.result() for f in futures]
+
+
+def count_between(client, table, start_date, end_date):
+    col = TIME_COLUMNS[table]
+    res = (
+        client.table(table)
+        .select("id", count="exact")
+        .gte(col, f"{start_date}T00:00:00Z")
+        .lte(col, f"{end_date}T23:59:59Z")
+        .limit(1)
+        .execute()
+    )
+    return res.count or 0
+
+
+def trend_counts(client, table, today=None):
+    """(today, yesterday, last 7 days) counts for `table`."""
+    global _warned
+    today = today or datetime.now(timezone.utc).date()
+    if CHAT_COUNTS_RPC:
+        try:
+            data = client.rpc("chat_trend_counts", {"p_table": table, "p_today": today.isoformat()}).execute().data
+            row = data[0] if isinstance(data, list) else data
+            return int(row["today"]), int(row["yesterday"]), int(row["week"])
+        except Exception as e:
+            if not _warned:
+                print("chat_trend_counts RPC unavailable, counting with separate queries:", e)
+                _warned = True
+
+    yesterday = today - timedelta(days=1)
+    week_start = today - timedelta(days=7)
+    return tuple(fan_out([
+        lambda: count_between(client, table, today, today),
+        lambda: count_between(client, table, yesterday, yesterday),
+        lambda: count_between(client, table, week_start, today),
+    ]))
+
+
+def _latest(client, table, top_k):
+    try:
+        res = (
+            client.table(table)
+            .select("*")
+            .order(TIME_COLUMNS[table], desc=True)
+            .limit(top_k)
+            .execute()
+        )
+        return res.data or []
+    except Exception as e:
+        print(f"Error reading {table}: {e}")
+        return []
+
+
+def latest_rows(client, tables, top_k):
+    """{table: newest rows} for several tables, fetched concurrently."""
+    results = fan_out([lambda t=t: _latest(client, t, top_k) for t in tables])
+    return dict(zip(tables, results))
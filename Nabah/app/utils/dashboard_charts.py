@@ -0,0 +1,153 @@
+from collections import defaultdict
+from datetime import datetime
+import numpy as np
+
+
+PPE_KEYS = (("Mask", "has_mask"), ("Gloves", "has_gloves"), ("Labcoat", "has_labcoat"), ("Glasses", "has_glasses"))
+SHIFTS = ("Morning", "Evening", "Night")
+# hour -> index into SHIFTS (08-16 Morning, 16-24 Evening, 00-08 Night)
+_SHIFT_OF_HOUR = np.array([2] * 8 + [0] * 8 + [1] * 8, dtype=np.int8)
+
+
+def _parse(ts):
+    try:
+        return datetime.fromisoformat(ts.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+
+
+def _pct(part, total):
+    return round((part / total) * 100, 2) if total else 0
+
+
+def _person_columns(persons):
+    """
+    One pass over the rows: every field the charts need goes into a NumPy
+    column, and each created_at is parsed exactly once.
+    """
+    flags = []        # per row: has_mask, has_gloves, has_labcoat, has_glasses as stored
+    status_codes = [] # 0 other, 1 "safe", 2 "unsafe", 3 unsafe in another case
+    red = []
+    day_idx = []
+    hour = []
+
+    days = {}
+    for p in persons:
+        flags.append((p.get("has_mask"), p.get("has_gloves"), p.get("has_labcoat"), p.get("has_glasses")))
+        status = p.get("status", "")
+        if status == "safe":
+            status_codes.append(1)
+        elif status == "unsafe":
+            status_codes.append(2)
+        else:
+            status_codes.append(3 if str(status).lower() == "unsafe" else 0)
+        red.append(p.get("in_red_zone") is True)
+
+        ts = p.get("created_at")
+        dt = _parse(ts) if ts else None
+        if dt is None:
+            day_idx.append(-1)
+            hour.append(0)
+        else:
+            day_idx.append(days.setdefault(dt.date(), len(days)))
+            hour.append(dt.hour)
+
+    raw = np.array(flags, dtype=object).reshape(len(persons), 4)
+    status_codes = np.array(status_codes, dtype=np.int8)
+    return {
+        "has": raw == True,  # noqa: E712 -- elementwise "is True" on bool/None cells
+        "missing": ~raw.astype(bool),
+        "items": np.where(raw == None, 0, raw).astype(np.int64).sum(axis=1),  # noqa: E711
+        "unsafe": status_codes >= 2,
+        "safe_exact": status_codes == 1,
+        "unsafe_exact": status_codes == 2,
+        "red": np.array(red, dtype=bool),
+        "day_idx": np.array(day_idx, dtype=np.int64),
+        "hour": np.array(hour, dtype=np.int8),
+        "days": [d.strftime('%Y-%m-%d') for d in days],
+    }
+
+
+def _count_by_day(values, *timestamp_keys):
+    out = defaultdict(int)
+    for row in values:
+        ts = None
+        for key in timestamp_keys:
+            ts = ts or row.get(key)
+        if not ts:
+            continue
+        dt = _parse(ts)
+        if dt is not None:
+            out[dt.strftime('%Y-%m-%d')] += 1
+    return out
+
+
+def compute_charts(persons, alerts, spills, detections) -> dict:
+    """
+    Every series for /api/dashboard-charts from one pass over each table.
+    The output matches the previous per-chart loops key for key.
+    """
+    c = _person_columns(persons)
+    n = len(persons)
+    n_days = len(c["days"])
+
+    safe = c["has"].all(axis=1)
+    dated = c["day_idx"] >= 0
+    day_idx = c["day_idx"][dated]
+    day_total = np.bincount(day_idx, minlength=n_days)
+    day_safe = np.bincount(day_idx, weights=safe[dated], minlength=n_days).astype(np.int64)
+    day_unsafe = np.bincount(day_idx, weights=c["unsafe"][dated], minlength=n_days).astype(np.int64)
+    day_order = sorted(range(n_days), key=c["days"].__getitem__)
+
+    shift_idx = _SHIFT_OF_HOUR[c["hour"][dated]]
+    shift_total = np.bincount(shift_idx, minlength=3)
+    shift_safe = np.bincount(shift_idx, weights=safe[dated], minlength=3).astype(np.int64)
+
+    has_counts = c["has"].sum(axis=0)
+    missing_counts = c["missing"].sum(axis=0)
+    unsafe_missing = c["missing"][c["unsafe"]].sum(axis=0)
+    unsafe_red = int((c["unsafe"] & c["red"]).sum())
+    unsafe_total = int(c["unsafe"].sum())
+    total = n or 1
+
+    compliance_over_time = [
+        {"day": c["days"][d], "rate": _pct(int(day_safe[d]), int(day_total[d]))}
+        for d in day_order
+    ]
+    unsafe_ratio = {c["days"][d]: _pct(int(day_unsafe[d]), int(day_total[d])) for d in day_order}
+    unsafe_over_time = [
+        {"day": c["days"][d], "unsafe_rate": _pct(int(day_unsafe[d]), int(day_total[d]))}
+        for d in day_order
+    ]
+
+    alert_types = defaultdict(int)
+    for a in alerts:
+        alert_types[a.get("alert_type", "Unknown")] += 1
+
+    conf_sum, conf_n = {}, {}
+    for d in detections:
+        name, conf = d.get("class_name"), d.get("confidence")
+        if name and conf is not None:
+            conf_sum[name] = conf_sum.get(name, 0) + float(conf)
+            conf_n[name] = conf_n.get(name, 0) + 1
+
+    return {
+        "compliance_over_time": compliance_over_time,
+        "ppe_compliance": {label: round(int(has_counts[j]) / total * 100, 2) for j, (label, _) in enumerate(PPE_KEYS)},
+        "zone_events": {"Red Zone": unsafe_red, "Other": unsafe_total - unsafe_red},
+        "incident_types": dict(alert_types),
+        "shift_compliance": {s: _pct(int(shift_safe[k]), int(shift_total[k])) for k, s in enumerate(SHIFTS)},
+        "unsafe_ratio": unsafe_ratio,
+        "violation_counts": {label: int(unsafe_missing[j]) for j, (label, _) in enumerate(PPE_KEYS)},
+        "alert_type_counts": dict(alert_types),
+        "spills_per_day": dict(_count_by_day(spills, "detected_at", "created_at")),
+        "ppe_histogram": {
+            "Fully Safe": int(c["safe_exact"].sum()),
+            "Unsafe": int(c["unsafe_exact"].sum()),
+        },
+        "avg_ppe_items": round(int(c["items"].sum()) / max(n, 1), 2),
+        "unsafe_over_time": unsafe_over_time,
+        "ppe_missing_ratio": {label: round(int(missing_counts[j]) / total * 100, 2) for j, (label, _) in enumerate(PPE_KEYS)},
+        "alerts_daily": dict(_count_by_day(alerts, "created_at")),
+        "avg_confidence": {k: round(conf_sum[k] / conf_n[k], 2) for k in conf_sum},
+    }
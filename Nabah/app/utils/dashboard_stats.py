@@ -0,0 +1,58 @@
+from datetime import datetime
+
+
+def is_safe(p) -> bool:
+    return all([
+        p.get("has_mask") is True,
+        p.get("has_gloves") is True,
+        p.get("has_labcoat") is True,
+        p.get("has_glasses") is True,
+    ])
+
+
+def stats_from_rows(persons, alerts_count, spills_count, videos_count) -> dict:
+    """Python-side KPIs over raw person rows (fallback when the RPC is missing)."""
+    persons_count = len(persons)
+    safe_count = sum(1 for p in persons if is_safe(p))
+    compliance_rate = round((safe_count / persons_count) * 100, 2) if persons_count > 0 else 0
+
+    hours = set()
+    for p in persons:
+        ts = p.get("created_at")
+        if ts:
+            try:
+                dt_obj = datetime.fromisoformat(ts.replace('Z', '+00:00'))
+                hours.add(dt_obj.strftime('%Y-%m-%d %H'))
+            except ValueError:
+                continue
+
+    return {
+        "persons_count": persons_count,
+        "alerts_count": alerts_count,
+        "spills_count": spills_count,
+        "videos_count": videos_count,
+        "compliance_rate": compliance_rate,
+        "active_hours": len(hours),
+    }
+
+
+def fetch_stats(supabase) -> dict:
+    """
+    KPIs from the `dashboard_stats` RPC (see sql/dashboard_stats.sql).
+    Falls back to fetching rows if the function isn't installed yet.
+    """
+    try:
+        data = supabase.rpc("dashboard_stats").execute().data
+        if isinstance(data, list):
+            data = data[0] if data else None
+        if data:
+            data["compliance_rate"] = float(data.get("compliance_rate") or 0)
+            return data
+    except Exception as e:
+        print("dashboard_stats RPC unavailable, falling back to table scan:", e)
+
+    persons = supabase.table("persons").select("has_mask, has_gloves, has_labcoat, has_glasses, created_at").execute().data or []
+    counts = {}
+    for t in ("alerts", "spills", "videos"):
+        counts[t] = supabase.table(t).select("id", count="exact").limit(1).execute().count or 0
+    return stats_from_rows(persons, counts["alerts"], counts["spills"], counts["videos"])
@@ -0,0 +1,105 @@
+"""
+Keyset pagination for the database tab (see sql/database_browse.sql).
+
+Rows are ordered by (time column desc, id desc); the cursor is the
+(time, id) of the last row on the page, so page N costs the same as page 1.
+"""
+from datetime import datetime
+import base64, json, re
+from Nabah.app.utils.supabase_client import supabase
+
+
+BROWSE_TABLES = {
+    "persons": {"time": "created_at", "filters": ("status", "video_id")},
+    "alerts": {"time": "created_at", "filters": ("alert_type",)},
+    "spills": {"time": "detected_at", "filters": ("video_id",)},
+    "videos": {"time": "uploaded_at", "filters": ()},
+    "detections": {"time": "detected_at", "filters": ()},
+    "clips": {"time": "created_at", "filters": ()},
+}
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+_COLUMN = re.compile(r"^[a-z_][a-z0-9_]*$")
+
+
+def encode_cursor(row, time_col):
+    raw = json.dumps({"t": row.get(time_col), "id": row.get("id")}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """
+    (time, id) from a client-supplied cursor. Both end up inside a PostgREST
+    or_() filter string, so the time must parse as a timestamp (and is
+    re-emitted in canonical ISO form) and the id must be an integer.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+        t, last_id = data["t"], data["id"]
+        if t is not None:
+            t = datetime.fromisoformat(t.replace("Z", "+00:00")).isoformat()
+        if isinstance(last_id, bool) or not isinstance(last_id, (int, str)):
+            raise ValueError
+        return t, int(last_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def _columns(columns, time_col):
+    if not columns:
+        return "*"
+    cols = [c.strip() for c in columns.split(",") if c.strip()]
+    bad = [c for c in cols if not _COLUMN.match(c)]
+    if bad:
+        raise ValueError(f"Invalid column name(s): {', '.join(bad)}")
+    # the cursor needs both keys even if the caller didn't ask for them
+    for key in ("id", time_col):
+        if key not in cols:
+            cols.append(key)
+    return ",".join(cols)
+
+
+def fetch_page(table, limit=DEFAULT_PAGE_SIZE, cursor=None, columns=None, filters=None, since=None, until=None):
+    if table not in BROWSE_TABLES:
+        raise ValueError(f"Unknown table '{table}'")
+    cfg = BROWSE_TABLES[table]
+    time_col = cfg["time"]
+    limit = max(1, min(int(limit or DEFAULT_PAGE_SIZE), MAX_PAGE_SIZE))
+
+    query = supabase.table(table).select(_columns(columns, time_col))
+    for key, value in (filters or {}).items():
+        if value is None or value == "":
+            continue
+        if key not in cfg["filters"]:
+            raise ValueError(f"Filter '{key}' not supported for {table}")
+        query = query.eq(key, value)
+    if since:
+        query = query.gte(time_col, since)
+    if until:
+        query = query.lte(time_col, until)
+
+    if cursor:
+        t, last_id = decode_cursor(cursor)
+        # desc order puts NULL timestamps first (Postgres default)
+        if t is None:
+            query = query.or_(f"and({time_col}.is.null,id.lt.{last_id}),{time_col}.not.is.null")
+        else:
+            query = query.or_(f'{time_col}.lt."{t}",and({time_col}.eq."{t}",id.lt.{last_id})')
+
+    rows = (
+        query.order(time_col, desc=True)
+        .order("id", desc=True)
+        .limit(limit + 1)
+        .execute()
+        .data
+        or []
+    )
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return {
+        "table": table,
+        "rows": rows,
+        "limit": limit,
+        "next_cursor": encode_cursor(rows[-1], time_col) if has_more and rows else None,
+    }
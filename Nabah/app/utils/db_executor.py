@@ -0,0 +1,91 @@
+"""
+Bounded executors for the blocking clients (Supabase, OpenRouter).
+
+Routes are async; the Supabase client and requests are not. Every DB call
+from a route goes through run_db() so a slow query occupies one pool
+thread instead of the event loop. LLM calls get their own pool because a
+60 s chat completion must not hold a DB slot.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import asyncio, functools, os, threading, time
+
+
+DB_EXECUTOR_WORKERS = int(os.getenv("DB_EXECUTOR_WORKERS", "16"))
+LLM_EXECUTOR_WORKERS = int(os.getenv("LLM_EXECUTOR_WORKERS", "4"))
+
+
+class BlockingPool:
+    """ThreadPoolExecutor plus the numbers needed to tell when it is saturated."""
+
+    def __init__(self, name, max_workers):
+        self.name = name
+        self.max_workers = max_workers
+        self.calls = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.queue_wait = 0.0
+        self.busy = 0.0
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+
+    def _call(self, fn, submitted):
+        started = time.perf_counter()
+        with self._lock:
+            self.queue_wait += started - submitted
+        try:
+            return fn()
+        except Exception:
+            with self._lock:
+                self.errors += 1
+            raise
+        finally:
+            with self._lock:
+                self.busy += time.perf_counter() - started
+                self.in_flight -= 1
+
+    async def run(self, fn, *args, **kwargs):
+        with self._lock:
+            self.calls += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        call = functools.partial(self._call, functools.partial(fn, *args, **kwargs), time.perf_counter())
+        return await asyncio.get_running_loop().run_in_executor(self._executor, call)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "calls": self.calls,
+                "errors": self.errors,
+                "in_flight": self.in_flight,
+                "peak_in_flight": self.peak_in_flight,
+                "avg_queue_wait_ms": round(self.queue_wait / self.calls * 1000, 2) if self.calls else 0,
+                "avg_busy_ms": round(self.busy / self.calls * 1000, 2) if self.calls else 0,
+            }
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+
+db_pool = BlockingPool("db", DB_EXECUTOR_WORKERS)
+llm_pool = BlockingPool("llm", LLM_EXECUTOR_WORKERS)
+
+
+async def run_db(fn, *args, **kwargs):
+    """Await a blocking Supabase call on the DB pool."""
+    return await db_pool.run(fn, *args, **kwargs)
+
+
+async def run_llm(fn, *args, **kwargs):
+    """Await a blocking LLM request (and the DB lookups it makes) on the LLM pool."""
+    return await llm_pool.run(fn, *args, **kwargs)
+
+
+def stats():
+    return {"db": db_pool.stats(), "llm": llm_pool.stats()}
+
+
+def shutdown():
+    db_pool.shutdown(wait=False)
+    llm_pool.shutdown(wait=False)
@@ -0,0 +1,111 @@
+"""
+Bounded LRU cache of query embeddings, keyed on the normalized query text.
+
+Optionally persisted to an .npz file so a restart doesn't re-encode the
+questions people keep asking. The file records the model name and is
+ignored if the model changed.
+"""
+from collections import OrderedDict
+import os, tempfile, threading, unicodedata
+import numpy as np
+
+
+EMBED_CACHE_SIZE = int(os.getenv("EMBED_CACHE_SIZE", "2048"))
+EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH", "")
+EMBED_CACHE_SAVE_EVERY = int(os.getenv("EMBED_CACHE_SAVE_EVERY", "50"))
+
+
+def normalize(text):
+    """Case, Unicode form and whitespace don't change the key."""
+    return " ".join(unicodedata.normalize("NFKC", text).casefold().split())
+
+
+class EmbeddingCache:
+    def __init__(self, model_name, max_entries=EMBED_CACHE_SIZE, path=EMBED_CACHE_PATH, save_every=EMBED_CACHE_SAVE_EVERY):
+        self.model_name = str(model_name)
+        self.max_entries = max_entries
+        self.path = path
+        self.save_every = save_every
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._unsaved = 0
+        self._lock = threading.Lock()
+        if path:
+            self.load()
+
+    def get(self, text):
+        key = normalize(text)
+        with self._lock:
+            vec = self._entries.get(key)
+            if vec is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return vec
+
+    def put(self, text, vec):
+        key = normalize(text)
+        with self._lock:
+            self._entries[key] = np.asarray(vec, dtype=np.float32)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._unsaved += 1
+            save = self.path and self._unsaved >= self.save_every
+        if save:
+            self.save()
+
+    def get_or_compute(self, text, compute):
+        vec = self.get(text)
+        if vec is None:
+            vec = np.asarray(compute(text), dtype=np.float32)
+            self.put(text, vec)
+        return vec
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                if str(data["model"]) != self.model_name:
+                    print(f"Embedding cache {self.path} is for another model, ignoring it.")
+                    return
+                keys, vectors = data["keys"].tolist(), data["vectors"]
+            with self._lock:
+                for key, vec in list(zip(keys, vectors))[-self.max_entries:]:
+                    self._entries[key] = vec
+            print(f"Embedding cache loaded: {len(keys)} queries.")
+        except Exception as e:
+            print(f"Cannot load embedding cache {self.path}: {e}")
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            if not self._entries:
+                return
+            keys = np.array(list(self._entries), dtype=str)
+            vectors = np.stack(list(self._entries.values()))
+            self._unsaved = 0
+        try:
+            folder = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(folder, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=folder, suffix=".npz")
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, model=np.array(self.model_name), keys=keys, vectors=vectors)
+            os.replace(tmp, self.path)
+        except Exception as e:
+            print(f"Cannot save embedding cache {self.path}: {e}")
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0,
+            "persisted_to": self.path or None,
+        }
@@ -0,0 +1,96 @@
+"""
+One-producer / many-viewer broadcast of encoded MJPEG parts.
+
+The camera loop publishes each annotated frame once (already JPEG-encoded
+and wrapped as a multipart part); every viewer gets the newest part. A
+slow viewer simply skips the parts it missed — the producer never waits
+for anyone.
+"""
+import asyncio, itertools, threading
+
+
+def mjpeg_part(jpeg: bytes) -> bytes:
+    return b'--frame\r\nContent-Type: image/jpeg\r\n\r\n' + jpeg + b'\r\n'
+
+
+class Subscriber:
+    def __init__(self, sub_id, loop):
+        self.sub_id = sub_id
+        self.loop = loop
+        self.event = asyncio.Event()
+        self.seq = 0
+        self.sent = 0
+        self.dropped = 0
+
+
+class FrameHub:
+    def __init__(self):
+        self.seq = 0
+        self.latest = None
+        self.published = 0
+        self._subscribers = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    @property
+    def subscribers(self):
+        return len(self._subscribers)
+
+    def publish(self, part: bytes):
+        """Called from the camera thread; never blocks on viewers."""
+        with self._lock:
+            self.seq += 1
+            self.latest = part
+            self.published += 1
+            subs = list(self._subscribers.values())
+        for sub in subs:
+            try:
+                sub.loop.call_soon_threadsafe(sub.event.set)
+            except RuntimeError:
+                # viewer's loop already closed
+                self._subscribers.pop(sub.sub_id, None)
+
+    def wake_all(self):
+        """Let waiting viewers notice the camera stopped."""
+        for sub in list(self._subscribers.values()):
+            try:
+                sub.loop.call_soon_threadsafe(sub.event.set)
+            except RuntimeError:
+                pass
+
+    async def stream(self, is_live, idle_timeout=1.0):
+        """Async generator of multipart parts for one viewer, until is_live() is False."""
+        sub = Subscriber(next(self._ids), asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers[sub.sub_id] = sub
+            if self.latest is not None:
+                sub.event.set()
+        try:
+            while is_live():
+                try:
+                    await asyncio.wait_for(sub.event.wait(), idle_timeout)
+                except asyncio.TimeoutError:
+                    continue
+                sub.event.clear()
+                with self._lock:
+                    seq, part = self.seq, self.latest
+                if part is None or seq == sub.seq:
+                    continue
+                if sub.seq:
+                    sub.dropped += seq - sub.seq - 1
+                sub.seq = seq
+                sub.sent += 1
+                yield part
+        finally:
+            with self._lock:
+                self._subscribers.pop(sub.sub_id, None)
+
+    def stats(self):
+        with self._lock:
+            subs = list(self._subscribers.values())
+        return {
+            "viewers": len(subs),
+            "frames_published": self.published,
+            "viewer_frames_sent": [s.sent for s in subs],
+            "viewer_frames_dropped": [s.dropped for s in subs],
+        }
@@ -0,0 +1,74 @@
+import cv2
+import numpy as np
+
+
+SAMPLING_MODES = ("all", "stride", "adaptive")
+
+
+class FrameSampler:
+    """
+    Decides which decoded frames go through the detectors.
+
+    - all:      every frame (previous behaviour)
+    - stride:   every Nth frame, N derived from analysis_fps
+    - adaptive: on the stride grid, only when the scene changed (cheap
+                grayscale frame differencing), a track is still active, or
+                max_gap frames passed since the last analysed frame
+    """
+
+    def __init__(self, mode="all", source_fps=30, analysis_fps=0, diff_threshold=8.0, max_gap=None):
+        mode = (mode or "all").strip().lower()
+        if mode not in SAMPLING_MODES:
+            print(f"Unknown sampling mode '{mode}', analysing every frame.")
+            mode = "all"
+        self.mode = mode
+        self.stride = max(1, round(source_fps / analysis_fps)) if analysis_fps and analysis_fps > 0 else 1
+        if mode == "stride" and self.stride == 1:
+            self.mode = "all"
+        self.diff_threshold = diff_threshold
+        self.max_gap = max_gap or max(1, int(source_fps) * 2)
+        self.decoded = 0
+        self.analyzed = 0
+        self._last_small = None
+        self._last_analyzed = None
+
+    def _small(self, frame):
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        return cv2.resize(gray, (64, 36), interpolation=cv2.INTER_AREA).astype(np.int16)
+
+    def should_analyze(self, frame, frame_number, tracker=None):
+        self.decoded += 1
+        run = self._decide(frame, frame_number, tracker)
+        if run:
+            self.analyzed += 1
+            self._last_analyzed = frame_number
+        return run
+
+    def _decide(self, frame, frame_number, tracker):
+        if self.mode == "all":
+            return True
+        if (frame_number - 1) % self.stride != 0:
+            return False
+        if self.mode == "stride":
+            return True
+
+        small = self._small(frame)
+        if self._last_small is None or frame_number - self._last_analyzed >= self.max_gap:
+            self._last_small = small
+            return True
+        if tracker is not None and any(t.last_frame == self._last_analyzed for t in tracker.tracks.values()):
+            self._last_small = small
+            return True
+        if float(np.abs(small - self._last_small).mean()) > self.diff_threshold:
+            self._last_small = small
+            return True
+        return False
+
+    def report(self):
+        return {
+            "mode": self.mode,
+            "stride": self.stride,
+            "frames_decoded": self.decoded,
+            "frames_analyzed": self.analyzed,
+            "analyzed_ratio": round(self.analyzed / self.decoded, 4) if self.decoded else 0,
+        }
@@ -1,9 +1,9 @@
 # llm_chat.py
 import os
 import re
-import requests
+import json
+import time
 from dotenv import load_dotenv
-from supabase import create_client
 from datetime import datetime, timedelta, timezone
 
 env_path = "/content/Nabah/.env"
@@ -12,23 +12,17 @@ if os.path.exists(env_path):
 else:
     print(f".env not found at {env_path}")
 
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_ANON_KEY")
+from Nabah.app.utils.supabase_client import supabase, http_session, http_timeout
+from Nabah.app.utils import chat_counts
+
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
 LLM_MODEL = os.getenv("LLM_MODEL")
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
 
-print("llm_chat config:")
-print("SUPABASE_URL:", SUPABASE_URL)
-print("SUPABASE_KEY exists:", bool(SUPABASE_KEY))
-
-if not SUPABASE_URL or not SUPABASE_KEY:
-    raise ValueError(
-        f"Missing Supabase credentials in llm_chat.\nSUPABASE_URL={SUPABASE_URL}\nSUPABASE_KEY exists={bool(SUPABASE_KEY)}"
-    )
+from Nabah.app.utils.rag_search import search_context, embed_query
+from Nabah.app.utils.answer_cache import AnswerCache
 
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
-
-from Nabah.app.utils.rag_search import search_context
+answer_cache = AnswerCache()
 
 OPENROUTER_URL = "https://openrouter.ai/api/v1/chat/completions"
 HEADERS = {
@@ -156,22 +150,7 @@ def _compare_trends(q: str, arabic: bool) -> str | None:
         metric = "PPE violations"
     else:
         return None
-    today = datetime.now(timezone.utc).date()
-    yesterday = today - timedelta(days=1)
-    week_start = today - timedelta(days=7)
-    def _count_between(table, start_date, end_date):
-        res = (
-            supabase.table(table)
-            .select("id", count="exact")
-            .gte("created_at", f"{start_date}T00:00:00Z")
-            .lte("created_at", f"{end_date}T23:59:59Z")
-            .limit(1)
-            .execute()
-        )
-        return res.count or 0
-    today_count = _count_between(table, today, today)
-    yest_count = _count_between(table, yesterday, yesterday)
-    week_count = _count_between(table, week_start, today)
+    today_count, yest_count, week_count = chat_counts.trend_counts(supabase, table)
     if "week" in ql or "أسبوع" in ql:
         trend = f"{week_count} {metric} this week"
         return (f"There were {trend}." if not arabic else f"تم تسجيل {week_count} {metric} خلال هذا الأسبوع.")
@@ -205,25 +184,15 @@ def _retrieve_context(question: str, top_k: int = 8) -> str:
     else:
         tables = ["alerts", "spills", "persons", "detections", "videos"]
     context_parts = []
-    for table in tables:
-        try:
-            res = (
-                supabase.table(table)
-                .select("*")
-                .order("created_at", desc=True)
-                .limit(top_k)
-                .execute()
-            )
-            if res.data:
-                context_parts.append(f"### {table.upper()} SAMPLE ###\n{json.dumps(res.data[:top_k], indent=2)}")
-        except Exception as e:
-            print(f"Error reading {table}: {e}")
+    for table, rows in chat_counts.latest_rows(supabase, tables, top_k).items():
+        if rows:
+            context_parts.append(f"### {table.upper()} SAMPLE ###\n{json.dumps(rows[:top_k], indent=2)}")
     context = "\n\n".join(context_parts)
     return context if context else "No relevant database context found."
 
 def _llm(messages: list[dict]) -> str:
     payload = {"model": LLM_MODEL, "messages": messages, "temperature": 0.2}
-    r = requests.post(OPENROUTER_URL, headers=HEADERS, json=payload, timeout=60)
+    r = http_session().post(OPENROUTER_URL, headers=HEADERS, json=payload, timeout=http_timeout(LLM_TIMEOUT))
     r.raise_for_status()
     return r.json()["choices"][0]["message"]["content"].strip()
 
@@ -238,6 +207,12 @@ def ask_llm(question: str, top_k: int = 8) -> str:
     trend = _compare_trends(question, arabic)
     if trend:
         return trend.strip()
+    started = time.perf_counter()
+    q_vec = embed_query(question)
+    versions = answer_cache.current_versions()
+    cached = answer_cache.lookup(question, q_vec, arabic)
+    if cached is not None:
+        return cached
     ctx = search_context(question, top_k=top_k, threshold=0.0)
     if not ctx:
         return ("I don't have enough data in the database."
@@ -264,6 +239,7 @@ def ask_llm(question: str, top_k: int = 8) -> str:
             return ("The AI model could not generate a valid response."
                     if not arabic else "لم يتمكن نموذج الذكاء الاصطناعي من تقديم إجابة صحيحة.")
         response = response.replace("<s>", "").replace("</s>", "").strip()
+        answer_cache.store(question, q_vec, response, arabic, time.perf_counter() - started, versions)
         return response
     except Exception as e:
         return (f"LLM error: {e}" if not arabic else f"حدث خطأ أثناء الاتصال بالنموذج: {e}")
@@ -0,0 +1,246 @@
+"""
+Process-wide YOLO model registry shared by the live streams and uploads.
+
+- each weight file is read once; the model is copied into a small pool of
+  MODEL_POOL_SIZE instances (YOLO instances aren't thread-safe, so callers
+  check one out per model and give it back) and every instance is warmed
+  up with a dummy inference, so the first real frame isn't slow either
+- preload() runs at startup, so requests never pay the load; checkout()
+  never loads either: a model without a pool starts loading in the
+  background and the caller gets ModelNotReady right away
+- the settings page enables / disables / reloads models; a reload builds
+  the new pool next to the old one and swaps it in, inference never stops
+  (it is the only operation that loads synchronously)
+- upload jobs run in worker processes, each with its own registry that
+  follows this one through state() / sync()
+"""
+from contextlib import contextmanager
+import copy, os, queue, threading, time
+import numpy as np
+from Nabah.app.utils import video_utils
+
+
+MODEL_POOL_SIZE = int(os.getenv("MODEL_POOL_SIZE", "2"))
+# "all" = every model in MODEL_FILES whose weight file exists, or a comma list
+MODEL_PRELOAD = os.getenv("MODEL_PRELOAD", "all")
+MODEL_WARMUP_SIZE = int(os.getenv("MODEL_WARMUP_SIZE", "640"))
+MODEL_CHECKOUT_TIMEOUT = float(os.getenv("MODEL_CHECKOUT_TIMEOUT", "30"))
+# a failed background load is retried at most this often
+MODEL_RETRY_DELAY = float(os.getenv("MODEL_RETRY_DELAY", "30"))
+
+
+class ModelNotReady(RuntimeError):
+    """A requested model has no warm pool yet (loading, or its load failed)."""
+
+
+class ModelEntry:
+    def __init__(self, name, path):
+        self.name = name
+        self.path = path
+        self.enabled = True
+        self.generation = 0
+        self.pool = None
+        self.size = 0
+        self.loaded_generation = None
+        self.loaded_at = None
+        self.load_ms = None
+        self.warmup_ms = None
+        self.checkouts = 0
+        self.waits = 0
+        self.loading = False
+        self.error = None
+        self.failed_at = None
+        self.load_lock = threading.Lock()
+
+    def report(self):
+        return {
+            "model": self.name,
+            "path": self.path,
+            "enabled": self.enabled,
+            "loaded": self.pool is not None,
+            "loading": self.loading,
+            "instances": self.size,
+            "idle": self.pool.qsize() if self.pool is not None else 0,
+            "generation": self.generation,
+            "loaded_at": self.loaded_at,
+            "load_ms": self.load_ms,
+            "warmup_ms": self.warmup_ms,
+            "checkouts": self.checkouts,
+            "waits": self.waits,
+            "error": self.error,
+        }
+
+
+class ModelRegistry:
+    def __init__(self, files=None, pool_size=MODEL_POOL_SIZE):
+        self.pool_size = max(1, pool_size)
+        self.entries = {name: ModelEntry(name, path) for name, path in (files or video_utils.MODEL_FILES).items()}
+        self._lock = threading.Lock()
+
+    def _entry(self, name):
+        entry = self.entries.get(name)
+        if entry is None:
+            raise KeyError(name)
+        return entry
+
+    def available(self, name):
+        entry = self.entries.get(name)
+        return entry is not None and entry.enabled and (entry.pool is not None or os.path.exists(entry.path))
+
+    def _build(self, entry):
+        t = time.perf_counter()
+        first = video_utils.load_model(entry.name)
+        instances = [first]
+        for _ in range(self.pool_size - 1):
+            try:
+                instances.append(copy.deepcopy(first))
+            except Exception:
+                instances.append(video_utils.load_model(entry.name))
+        load_ms = round((time.perf_counter() - t) * 1000, 1)
+
+        t = time.perf_counter()
+        dummy = np.zeros((MODEL_WARMUP_SIZE, MODEL_WARMUP_SIZE, 3), dtype=np.uint8)
+        for model in instances:
+            model(dummy, imgsz=MODEL_WARMUP_SIZE, verbose=False)
+        return instances, load_ms, round((time.perf_counter() - t) * 1000, 1)
+
+    def load(self, name):
+        """Build and warm a fresh pool for name, then swap it in."""
+        entry = self._entry(name)
+        with entry.load_lock:
+            generation = entry.generation
+            entry.loading = True
+            try:
+                try:
+                    instances, load_ms, warmup_ms = self._build(entry)
+                except Exception as e:
+                    entry.error = str(e)
+                    entry.failed_at = time.time()
+                    raise
+                pool = queue.Queue()
+                for model in instances:
+                    pool.put(model)
+                with self._lock:
+                    # instances still checked out from the old pool go back to it and are dropped with it
+                    entry.pool = pool
+                    entry.size = len(instances)
+                    entry.loaded_generation = generation
+                    entry.loaded_at = time.time()
+                    entry.load_ms = load_ms
+                    entry.warmup_ms = warmup_ms
+                    entry.error = None
+                    entry.failed_at = None
+            finally:
+                entry.loading = False
+        print(f"Model {name} ready: {len(instances)} instance(s), load {load_ms} ms, warm-up {warmup_ms} ms")
+        return entry
+
+    def load_in_background(self, name, force=False):
+        """Start load(name) on a thread unless it is loaded (or force), loading, or failed recently."""
+        entry = self._entry(name)
+        with self._lock:
+            if entry.loading or (entry.pool is not None and not force):
+                return False
+            if entry.failed_at is not None and time.time() - entry.failed_at < MODEL_RETRY_DELAY:
+                return False
+            entry.loading = True
+        threading.Thread(target=self._load_quietly, args=(name,), name=f"model-load-{name}", daemon=True).start()
+        return True
+
+    def _load_quietly(self, name):
+        try:
+            self.load(name)
+        except Exception as e:
+            print(f"Background load of model {name} failed: {e}")
+
+    def reload(self, name):
+        entry = self._entry(name)
+        with self._lock:
+            entry.generation += 1
+        return self.load(name)
+
+    def set_enabled(self, name, enabled):
+        """Disabling keeps the pool warm, so enabling again is instant (or loads in the background)."""
+        entry = self._entry(name)
+        entry.enabled = enabled
+        if enabled and entry.pool is None:
+            self.load_in_background(name)
+        return entry
+
+    def preload(self, names=None):
+        if names is None:
+            if MODEL_PRELOAD.strip().lower() == "all":
+                names = [n for n, e in self.entries.items() if os.path.exists(e.path)]
+            else:
+                names = [n.strip() for n in MODEL_PRELOAD.split(",") if n.strip()]
+        t = time.perf_counter()
+        for name in names:
+            try:
+                self.load(name)
+            except Exception as e:
+                print(f"Cannot preload model {name}: {e}")
+        print(f"Models preloaded in {time.perf_counter() - t:.1f}s: {', '.join(names) or 'none'}")
+
+    def names_for(self, analysis_type, ppe_mode="separate"):
+        return video_utils.model_names(analysis_type, ppe_mode, available=self.available)
+
+    @contextmanager
+    def checkout(self, names):
+        """
+        {name: instance} for the enabled models among names, plus "disabled":
+        the PPE items switched off (video_utils doesn't count them as missing).
+        Instances are taken in a fixed order, so concurrent callers can't deadlock.
+        """
+        taken = []
+        try:
+            models = {}
+            for name in sorted(set(names)):
+                entry = self.entries.get(name)
+                if entry is None or not entry.enabled:
+                    continue
+                pool = entry.pool
+                if pool is None:
+                    self.load_in_background(name)
+                    if entry.loading:
+                        raise ModelNotReady(f"Model '{name}' is loading")
+                    raise ModelNotReady(f"Model '{name}' is not loaded: {entry.error or 'not preloaded'}")
+                try:
+                    model = pool.get_nowait()
+                except queue.Empty:
+                    entry.waits += 1
+                    try:
+                        model = pool.get(timeout=MODEL_CHECKOUT_TIMEOUT)
+                    except queue.Empty:
+                        raise TimeoutError(f"No free instance of model '{name}' after {MODEL_CHECKOUT_TIMEOUT}s")
+                entry.checkouts += 1
+                taken.append((pool, model))
+                models[name] = model
+            models["disabled"] = frozenset(
+                item for item in video_utils.PPE_ITEMS if not self.entries[item].enabled
+            )
+            yield models
+        finally:
+            for pool, model in taken:
+                pool.put(model)
+
+    def state(self):
+        """What a worker process needs to follow this registry."""
+        return {name: {"enabled": e.enabled, "generation": e.generation} for name, e in self.entries.items()}
+
+    def sync(self, state):
+        for name, s in state.items():
+            entry = self.entries.get(name)
+            if entry is None:
+                continue
+            entry.enabled = s["enabled"]
+            if s["generation"] != entry.generation:
+                entry.generation = s["generation"]
+                # the current pool keeps serving until the new one is swapped in
+                if entry.pool is not None:
+                    self.load_in_background(name, force=True)
+
+    def stats(self):
+        return [entry.report() for entry in self.entries.values()]
+
+
+registry = ModelRegistry()
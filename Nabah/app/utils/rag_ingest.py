@@ -0,0 +1,207 @@
+"""
+Incremental ingestion of DB rows into the RAG store (see sql/rag_ingest.sql).
+
+New persons / alerts / spills / videos rows are rendered to text, embedded
+in batches with the rag_search embedder and upserted into documents_rag on
+(table_name, source_id). Each source keeps a watermark (last id, and its
+timestamp) in rag_ingest_state that only moves after a batch is stored, so
+a crashed run resumes where it stopped and re-running is harmless. Every
+run also re-reads RAG_INGEST_RESCAN ids behind the watermark to pick up
+rows that committed late; ones already in documents_rag are skipped.
+
+    python -m Nabah.app.utils.rag_ingest              # one pass over all sources
+    python -m Nabah.app.utils.rag_ingest --follow 60  # keep polling every 60 s
+"""
+import argparse, os, queue, threading, time
+from datetime import datetime, timezone
+from Nabah.app.utils.supabase_client import supabase
+from Nabah.app.utils import rag_search
+
+
+RAG_INGEST_BATCH = int(os.getenv("RAG_INGEST_BATCH", "64"))
+RAG_INGEST_PAGE = int(os.getenv("RAG_INGEST_PAGE", "500"))
+# ids are assigned at insert but become visible at commit, and the API and the
+# video-job processes insert concurrently: a lower id can show up after a
+# higher one was ingested. Each run re-reads this many ids behind the watermark.
+RAG_INGEST_RESCAN = int(os.getenv("RAG_INGEST_RESCAN", "500"))
+# update the local index too (needed for RAG_RETRIEVAL=local/hybrid)
+RAG_INGEST_LOCAL = os.getenv("RAG_INGEST_LOCAL", "1" if rag_search.RAG_RETRIEVAL != "remote" else "0") == "1"
+
+SOURCES = {
+    "persons": "created_at",
+    "alerts": "created_at",
+    "spills": "detected_at",
+    "videos": "uploaded_at",
+}
+
+
+def _yes(value):
+    return "yes" if value is True else "no"
+
+
+def render(table, row):
+    """One sentence per row, in the words people use when asking the chat."""
+    t = row.get(SOURCES[table]) or "unknown time"
+    if table == "persons":
+        missing = [name for name in ("mask", "gloves", "labcoat", "glasses") if row.get(f"has_{name}") is not True]
+        return (
+            f"Person track {row.get('track_id')} in video {row.get('video_id')} at {t} "
+            f"(frame {row.get('frame_number')}): status {row.get('status')}. "
+            f"Mask {_yes(row.get('has_mask'))}, gloves {_yes(row.get('has_gloves'))}, "
+            f"lab coat {_yes(row.get('has_labcoat'))}, glasses {_yes(row.get('has_glasses'))}. "
+            f"Missing PPE: {', '.join(missing) or 'none'}. In red zone: {_yes(row.get('in_red_zone'))}."
+        )
+    if table == "alerts":
+        return f"Alert at {t}: {row.get('alert_type')}. {row.get('reason') or ''}".strip()
+    if table == "spills":
+        conf = row.get("confidence")
+        conf = f"{float(conf):.2f}" if conf is not None else "unknown"
+        return f"Liquid spill detected in video {row.get('video_id')} at {t} with confidence {conf}."
+    if table == "videos":
+        return f"Video '{row.get('title')}' ({row.get('video_name')}) uploaded at {t}."
+    raise ValueError(f"Unknown source table '{table}'")
+
+
+def load_watermark(source):
+    rows = supabase.table("rag_ingest_state").select("*").eq("source", source).execute().data or []
+    return rows[0] if rows else {"source": source, "last_id": 0, "last_time": None, "documents": 0}
+
+
+def save_watermark(state):
+    state = {**state, "updated_at": datetime.now(timezone.utc).isoformat()}
+    supabase.table("rag_ingest_state").upsert(state, on_conflict="source").execute()
+
+
+def _ingested_ids(table, first_id, last_id):
+    """source_ids already stored for table in [first_id, last_id]."""
+    ids, offset = set(), 0
+    while True:
+        rows = (
+            supabase.table(rag_search.RAG_DOCUMENTS_TABLE).select("source_id")
+            .eq("table_name", table).gte("source_id", first_id).lte("source_id", last_id)
+            .order("source_id").range(offset, offset + 999).execute().data or []
+        )
+        ids.update(r["source_id"] for r in rows)
+        if len(rows) < 1000:
+            return ids
+        offset += len(rows)
+
+
+def _fetch_pages(table, last_id, page_size, out, stop):
+    # producer: pages of new rows in id order, so fetching overlaps embedding
+    try:
+        while not stop.is_set():
+            rows = (
+                supabase.table(table).select("*").gt("id", last_id)
+                .order("id").limit(page_size).execute().data or []
+            )
+            if rows:
+                out.put(rows)
+                last_id = rows[-1]["id"]
+            if len(rows) < page_size:
+                break
+    except Exception as e:
+        out.put(e)
+    finally:
+        out.put(None)
+
+
+def _store(table, rows, vectors):
+    time_col = SOURCES[table]
+    docs = [
+        {
+            "table_name": table,
+            "source_id": row["id"],
+            "source_time": row.get(time_col),
+            "text": text,
+            "embedding": vec.tolist(),
+        }
+        for (row, text), vec in zip(rows, vectors)
+    ]
+    supabase.table(rag_search.RAG_DOCUMENTS_TABLE).upsert(docs, on_conflict="table_name,source_id").execute()
+    if RAG_INGEST_LOCAL:
+        rag_search.add_documents(
+            [{"id": f"{table}:{d['source_id']}", "table_name": table, "source_id": d["source_id"], "text": d["text"]} for d in docs],
+            vectors,
+        )
+
+
+def ingest_source(table, batch_size=RAG_INGEST_BATCH, page_size=RAG_INGEST_PAGE):
+    """Ingest everything newer than the watermark. Returns the number of documents stored."""
+    state = load_watermark(table)
+    start = max(0, state["last_id"] - RAG_INGEST_RESCAN)
+    done = _ingested_ids(table, start + 1, state["last_id"]) if start < state["last_id"] else set()
+    pages = queue.Queue(maxsize=2)
+    stop = threading.Event()
+    fetcher = threading.Thread(target=_fetch_pages, args=(table, start, page_size, pages, stop), daemon=True)
+    fetcher.start()
+
+    stored = 0
+    try:
+        while True:
+            rows = pages.get()
+            if rows is None:
+                break
+            if isinstance(rows, Exception):
+                raise rows
+            rows = [row for row in rows if row["id"] not in done]
+            for i in range(0, len(rows), batch_size):
+                batch = [(row, render(table, row)) for row in rows[i:i + batch_size]]
+                vectors = rag_search.embed_documents([text for _, text in batch])
+                _store(table, batch, vectors)
+                last = batch[-1][0]
+                if last["id"] > state["last_id"]:
+                    state.update(last_id=last["id"], last_time=last.get(SOURCES[table]))
+                state["documents"] = state.get("documents", 0) + len(batch)
+                save_watermark(state)
+                stored += len(batch)
+    finally:
+        stop.set()
+        while fetcher.is_alive():
+            try:
+                pages.get_nowait()
+            except queue.Empty:
+                fetcher.join(0.1)
+    return stored
+
+
+def ingest_all(tables=None, batch_size=RAG_INGEST_BATCH):
+    tables = tables or list(SOURCES)
+    report = {}
+    t0 = time.perf_counter()
+    for table in tables:
+        t = time.perf_counter()
+        try:
+            n = ingest_source(table, batch_size)
+            elapsed = time.perf_counter() - t
+            report[table] = {"documents": n, "seconds": round(elapsed, 2), "docs_per_sec": round(n / elapsed, 1) if elapsed > 0 else None}
+        except Exception as e:
+            print(f"RAG ingestion of {table} failed:", e)
+            report[table] = {"documents": 0, "error": str(e)}
+    total = sum(r["documents"] for r in report.values())
+    elapsed = time.perf_counter() - t0
+    if total and RAG_INGEST_LOCAL:
+        rag_search.save_index()
+    report["total"] = {"documents": total, "seconds": round(elapsed, 2), "docs_per_sec": round(total / elapsed, 1) if elapsed > 0 else None}
+    return report
+
+
+def _print_report(report):
+    for name, r in report.items():
+        if "error" in r:
+            print(f"{name:<10} failed: {r['error']}")
+        else:
+            print(f"{name:<10} {r['documents']:>8} docs  {r['seconds']:>8}s  {r['docs_per_sec'] or 0:>8} docs/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Incremental RAG ingestion")
+    parser.add_argument("--tables", nargs="+", choices=list(SOURCES), help="sources to ingest (default: all)")
+    parser.add_argument("--batch", type=int, default=RAG_INGEST_BATCH, help="rows per embedding batch")
+    parser.add_argument("--follow", type=float, metavar="SECONDS", help="keep polling for new rows")
+    args = parser.parse_args()
+    while True:
+        _print_report(ingest_all(args.tables, args.batch))
+        if not args.follow:
+            break
+        time.sleep(args.follow)
@@ -1,8 +1,7 @@
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
 from typing import List, Dict
-import os
+import argparse, atexit, json, os, threading
 import numpy as np
-from sentence_transformers import SentenceTransformer
-from supabase import create_client, Client
 from dotenv import load_dotenv
 
 
@@ -12,46 +11,189 @@ if os.path.exists(env_path):
 else:
     print(f" .env not found at {env_path}")
 
+from Nabah.app.utils.supabase_client import supabase
+from Nabah.app.utils.embedding_cache import EmbeddingCache
+from Nabah.app.utils.vector_index import VectorIndex
 
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_ANON_KEY")
 EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL")
 
+# remote: match_documents_rag only; local: in-process index only;
+# hybrid: remote, falling back to the local index if it errors, is empty or is slow
+RAG_RETRIEVAL = os.getenv("RAG_RETRIEVAL", "remote").strip().lower()
+RAG_INDEX_DIR = os.getenv("RAG_INDEX_DIR", "/content/rag_index")
+RAG_REMOTE_TIMEOUT = float(os.getenv("RAG_REMOTE_TIMEOUT", "2"))
+RAG_DOCUMENTS_TABLE = os.getenv("RAG_DOCUMENTS_TABLE", "documents_rag")
 
-print("🔧 rag_search config:")
-print("SUPABASE_URL:", SUPABASE_URL)
-print("SUPABASE_KEY exists:", bool(SUPABASE_KEY))
 
+# the model loads on the first question, not at import
+_embedder = None
+_embedder_lock = threading.Lock()
+_cache = EmbeddingCache(EMBEDDING_MODEL)
+atexit.register(_cache.save)
 
-if not SUPABASE_URL or not SUPABASE_KEY:
-    raise ValueError(
-        f" Missing Supabase credentials.\nSUPABASE_URL={SUPABASE_URL}\nSUPABASE_KEY exists={bool(SUPABASE_KEY)}"
-    )
 
+def get_embedder():
+    global _embedder
+    if _embedder is None:
+        with _embedder_lock:
+            if _embedder is None:
+                from sentence_transformers import SentenceTransformer
+                print(f"Loading embedding model {EMBEDDING_MODEL}...")
+                _embedder = SentenceTransformer(EMBEDDING_MODEL)
+    return _embedder
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
 
+def _encode(text: str):
+    return get_embedder().encode([f"query: {text}"], normalize_embeddings=True)[0]
 
-_embedder = SentenceTransformer(EMBEDDING_MODEL)
 
 def embed_query(text: str) -> list[float]:
-    vec = _embedder.encode([f"query: {text}"], normalize_embeddings=True)[0]
-    return np.asarray(vec, dtype=np.float32).tolist()
+    return _cache.get_or_compute(text, _encode).tolist()
+
+
+def cache_stats() -> dict:
+    return _cache.stats()
+
+def embed_documents(texts: List[str]) -> np.ndarray:
+    """Batch-encode document texts (not cached: each is embedded once)."""
+    vecs = get_embedder().encode([f"passage: {t}" for t in texts], normalize_embeddings=True, batch_size=64)
+    return np.asarray(vecs, dtype=np.float32)
+
+
+_index = None
+_index_mtime = None
+_index_lock = threading.Lock()
+_remote_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="rag-remote")
+
+
+def _snapshot_mtime():
+    try:
+        return os.stat(os.path.join(RAG_INDEX_DIR, "meta.json")).st_mtime_ns
+    except OSError:
+        return None
+
+
+def get_index(dim=None):
+    """
+    The local index: loaded from RAG_INDEX_DIR, or created empty when dim is
+    given. A newer snapshot on disk (written by `rag_ingest --follow` in
+    another process) replaces the loaded one on the next call.
+    """
+    global _index, _index_mtime
+    mtime = _snapshot_mtime()
+    with _index_lock:
+        if mtime is not None and mtime != _index_mtime:
+            try:
+                _index = VectorIndex.load(RAG_INDEX_DIR)
+                _index_mtime = mtime
+                print(f"Local RAG index loaded: {len(_index)} documents.")
+            except Exception as e:
+                # caught mid-swap; keep serving the current one and retry next call
+                print("Cannot load local RAG index snapshot:", e)
+        if _index is None and dim is not None:
+            _index = VectorIndex(dim)
+        return _index
+
+
+def add_documents(docs: List[Dict], vectors) -> None:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    get_index(vectors.shape[1]).add(docs, vectors)
+
+
+def _snapshot(index) -> None:
+    # our own snapshot: remember its mtime so get_index doesn't reload it
+    global _index_mtime
+    with _index_lock:
+        index.snapshot(RAG_INDEX_DIR)
+        _index_mtime = _snapshot_mtime()
+
+
+def save_index() -> None:
+    index = get_index()
+    if index is not None:
+        _snapshot(index)
+
+
+def _search_remote(q, top_k, threshold):
+    res = supabase.rpc(
+        "match_documents_rag",
+        {"query_embedding": q, "match_threshold": threshold, "match_count": top_k},
+    ).execute()
+    return res.data or []
+
+
+def _search_local(q, top_k, threshold):
+    index = get_index()
+    if index is None:
+        return []
+    return [{**doc, "similarity": score} for score, doc in index.search(q, top_k, threshold)]
+
 
 def search_context(query: str, top_k: int = 8, threshold: float = 0.0) -> List[Dict]:
     q = embed_query(query)
+    if RAG_RETRIEVAL == "local":
+        return _search_local(q, top_k, threshold)
+
+    if RAG_RETRIEVAL == "hybrid":
+        remote = _remote_pool.submit(_search_remote, q, top_k, threshold)
+        try:
+            rows = remote.result(timeout=RAG_REMOTE_TIMEOUT)
+            if rows:
+                return rows
+        except FutureTimeout:
+            print(f" search_context: remote slower than {RAG_REMOTE_TIMEOUT}s, using local index")
+        except Exception as e:
+            print(" search_context remote error, using local index:", e)
+        return _search_local(q, top_k, threshold)
+
     try:
-        res = supabase.rpc(
-            "match_documents_rag",
-            {"query_embedding": q, "match_threshold": threshold, "match_count": top_k},
-        ).execute()
-        rows = res.data or []
+        rows = _search_remote(q, top_k, threshold)
     except Exception as e:
         print(" search_context error:", e)
         rows = []
     return rows
 
+
+def build_index_from_remote(page_size=1000) -> int:
+    """Copy every document (with its stored embedding) into a fresh local index and snapshot it."""
+    global _index
+    index = None
+    last_id = None
+    while True:
+        query = supabase.table(RAG_DOCUMENTS_TABLE).select("*").order("id").limit(page_size)
+        if last_id is not None:
+            query = query.gt("id", last_id)
+        rows = query.execute().data or []
+        if not rows:
+            break
+        vectors = [json.loads(r["embedding"]) if isinstance(r["embedding"], str) else r["embedding"] for r in rows]
+        # same ids as rag_ingest uses, so later incremental adds replace instead of duplicating
+        docs = [
+            {**{k: v for k, v in r.items() if k != "embedding"},
+             "id": f"{r['table_name']}:{r['source_id']}" if r.get("source_id") is not None else r["id"]}
+            for r in rows
+        ]
+        if index is None:
+            index = VectorIndex(len(vectors[0]))
+        index.add(docs, vectors)
+        last_id = rows[-1]["id"]
+        print(f"Indexed {len(index)} documents...")
+    if index is None:
+        print("No documents to index.")
+        return 0
+    with _index_lock:
+        _index = index
+    _snapshot(index)
+    return len(index)
+
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="RAG retrieval tools")
+    parser.add_argument("--build-index", action="store_true", help=f"rebuild the local index in {RAG_INDEX_DIR} from {RAG_DOCUMENTS_TABLE}")
+    parser.add_argument("--query", default="PPE violations")
+    args = parser.parse_args()
+    if args.build_index:
+        print(f"Local index built: {build_index_from_remote()} documents.")
     print("Testing search…")
-    out = search_context("PPE violations", 5)
-    print(f"Retrieved {len(out)} rows.")
+    out = search_context(args.query, 5)
+    print(f"Retrieved {len(out)} rows ({RAG_RETRIEVAL}).")
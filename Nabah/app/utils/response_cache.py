@@ -0,0 +1,106 @@
+from collections import defaultdict
+import asyncio, inspect, os, threading, time
+
+
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "15"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "256"))
+
+
+class ResponseCache:
+    """
+    TTL cache for read endpoints.
+
+    - concurrent misses on the same key share one computation (single flight)
+    - every entry remembers the version of the tables it was built from;
+      invalidate(table) bumps that version so dependent entries go stale at
+      once, even before their TTL (called by the save_to_db writers, and by
+      video_jobs when a worker process finishes: its writes never reach
+      this process's writer)
+    """
+
+    def __init__(self, ttl=RESPONSE_CACHE_TTL, max_entries=RESPONSE_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.invalidations = 0
+        self._entries = {}
+        self._versions = defaultdict(int)
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def _fresh(self, entry):
+        expires, snapshot, _ = entry
+        return time.monotonic() < expires and all(self._versions[t] == v for t, v in snapshot.items())
+
+    async def get_or_compute(self, key, compute, tags=(), ttl=None):
+        """
+        compute may be a plain or an async callable. It runs as its own task,
+        so a caller that disconnects (the first one included) cancels only
+        its own wait, never the shared computation.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._fresh(entry):
+                self.hits += 1
+                return entry[2]
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            with self._lock:
+                snapshot = {t: self._versions[t] for t in tags}
+            task = asyncio.ensure_future(self._compute(key, compute, snapshot, ttl))
+            # every waiter may be gone by the time it fails; don't warn about that
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            self._inflight[key] = task
+        return await asyncio.shield(task)
+
+    async def _compute(self, key, compute, snapshot, ttl):
+        try:
+            value = compute()
+            if inspect.isawaitable(value):
+                value = await value
+        finally:
+            self._inflight.pop(key, None)
+        with self._lock:
+            if key not in self._entries and len(self._entries) >= self.max_entries:
+                self._entries.pop(next(iter(self._entries)))
+            self._entries[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), snapshot, value)
+        return value
+
+    def invalidate(self, *tables):
+        with self._lock:
+            for t in tables:
+                self._versions[t] += 1
+            self.invalidations += 1
+
+    def versions(self, *tables):
+        with self._lock:
+            return {t: self._versions[t] for t in tables}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "entries": len(self._entries),
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "invalidations": self.invalidations,
+            "hit_rate": round((self.hits + self.coalesced) / lookups, 4) if lookups else 0,
+        }
+
+
+cache = ResponseCache()
+
+
+def invalidate(*tables):
+    cache.invalidate(*tables)
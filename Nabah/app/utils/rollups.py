@@ -0,0 +1,93 @@
+"""
+Dashboard rollups (see sql/rollups.sql).
+
+Insert triggers keep the hourly buckets current, in the same transaction
+as the rows themselves; get_dashboard_charts reads the daily / hour-of-day
+views instead of the raw tables.
+
+Backfill existing data:
+    python -m Nabah.app.utils.rollups --backfill
+"""
+import argparse, os
+from Nabah.app.utils.supabase_client import supabase
+
+
+ROLLUPS_ENABLED = os.getenv("DASHBOARD_ROLLUPS", "1") == "1"
+
+HOURLY_COLUMNS = (
+    "persons_total", "persons_safe", "persons_unsafe", "status_safe", "unsafe_red",
+    "has_mask", "has_gloves", "has_labcoat", "has_glasses",
+    "unsafe_no_mask", "unsafe_no_gloves", "unsafe_no_labcoat", "unsafe_no_glasses",
+    "alerts", "spills",
+)
+PPE = (("Mask", "mask"), ("Gloves", "gloves"), ("Labcoat", "labcoat"), ("Glasses", "glasses"))
+
+
+def backfill():
+    print("Rebuilding dashboard rollups from raw tables...")
+    supabase.rpc("rebuild_rollups").execute()
+    rows = supabase.table("rollup_daily").select("day").execute().data or []
+    print(f"Rollups rebuilt: {len(rows)} days.")
+
+
+def _pct(part, total):
+    return round((part / total) * 100, 2) if total else 0
+
+
+def charts_from_rollups(daily, hours, alert_types, detection_conf) -> dict:
+    """Chart JSON (same keys as dashboard_charts.compute_charts) from bucket rows."""
+    daily = sorted(daily, key=lambda r: str(r["day"]))
+    total = {c: sum(int(r.get(c) or 0) for r in daily) for c in HOURLY_COLUMNS}
+    n = total["persons_total"]
+    persons_days = [r for r in daily if int(r.get("persons_total") or 0)]
+
+    shifts = {"Morning": [0, 0], "Evening": [0, 0], "Night": [0, 0]}
+    for r in hours:
+        h = int(r["hour"])
+        shift = "Morning" if 8 <= h < 16 else "Evening" if 16 <= h < 24 else "Night"
+        shifts[shift][0] += int(r.get("persons_total") or 0)
+        shifts[shift][1] += int(r.get("persons_safe") or 0)
+
+    types = {r["alert_type"]: int(r["total"]) for r in alert_types}
+    unsafe_ratio = {str(r["day"]): _pct(int(r["persons_unsafe"]), int(r["persons_total"])) for r in persons_days}
+
+    return {
+        "compliance_over_time": [
+            {"day": str(r["day"]), "rate": _pct(int(r["persons_safe"]), int(r["persons_total"]))} for r in persons_days
+        ],
+        "ppe_compliance": {label: round(total[f"has_{item}"] / (n or 1) * 100, 2) for label, item in PPE},
+        "zone_events": {"Red Zone": total["unsafe_red"], "Other": total["persons_unsafe"] - total["unsafe_red"]},
+        "incident_types": types,
+        "shift_compliance": {s: _pct(c, t) for s, (t, c) in shifts.items()},
+        "unsafe_ratio": unsafe_ratio,
+        "violation_counts": {label: total[f"unsafe_no_{item}"] for label, item in PPE},
+        "alert_type_counts": dict(types),
+        "spills_per_day": {str(r["day"]): int(r["spills"]) for r in daily if int(r.get("spills") or 0)},
+        "ppe_histogram": {"Fully Safe": total["status_safe"], "Unsafe": total["persons_unsafe"]},
+        "avg_ppe_items": round(sum(total[f"has_{item}"] for _, item in PPE) / max(n, 1), 2),
+        "unsafe_over_time": [{"day": d, "unsafe_rate": rate} for d, rate in unsafe_ratio.items()],
+        "ppe_missing_ratio": {label: round((n - total[f"has_{item}"]) / (n or 1) * 100, 2) for label, item in PPE},
+        "alerts_daily": {str(r["day"]): int(r["alerts"]) for r in daily if int(r.get("alerts") or 0)},
+        "avg_confidence": {
+            r["class_name"]: round(float(r["conf_sum"]) / int(r["total"]), 2)
+            for r in detection_conf if int(r["total"])
+        },
+    }
+
+
+def fetch_charts() -> dict:
+    daily = supabase.table("rollup_daily").select("*").order("day").execute().data or []
+    hours = supabase.table("rollup_hour_of_day").select("*").execute().data or []
+    alert_types = supabase.table("rollup_alert_types").select("*").execute().data or []
+    detection_conf = supabase.table("rollup_detection_conf").select("*").execute().data or []
+    return charts_from_rollups(daily, hours, alert_types, detection_conf)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Dashboard rollup maintenance")
+    parser.add_argument("--backfill", action="store_true", help="rebuild all rollups from the raw tables")
+    args = parser.parse_args()
+    if args.backfill:
+        backfill()
+    else:
+        parser.print_help()
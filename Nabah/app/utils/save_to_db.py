@@ -1,5 +1,135 @@
 from datetime import datetime, timezone
+from collections import defaultdict
+import atexit, os, queue, threading, time
 from Nabah.app.utils.supabase_client import supabase
+from Nabah.app.utils import response_cache
+
+
+WRITE_QUEUE_SIZE = int(os.getenv("DB_WRITE_QUEUE_SIZE", "10000"))
+WRITE_BATCH_SIZE = int(os.getenv("DB_WRITE_BATCH_SIZE", "200"))
+WRITE_FLUSH_INTERVAL = float(os.getenv("DB_WRITE_FLUSH_INTERVAL", "2.0"))
+WRITE_MAX_RETRIES = int(os.getenv("DB_WRITE_MAX_RETRIES", "3"))
+
+_STOP = object()
+
+
+class BatchWriter:
+    """
+    Background writer for high-volume rows (persons / spills / detections).
+    Rows go into a bounded queue and are flushed as multi-row inserts when
+    batch_size rows are pending or flush_interval seconds have passed.
+    submit() never blocks: if the queue is full the row is dropped and counted.
+    """
+
+    def __init__(self, queue_size=WRITE_QUEUE_SIZE, batch_size=WRITE_BATCH_SIZE,
+                 flush_interval=WRITE_FLUSH_INTERVAL, max_retries=WRITE_MAX_RETRIES):
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.written = 0
+        self.failed = 0
+        self.dropped = 0
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+                self._thread.start()
+
+    def submit(self, table, row):
+        self.start()
+        try:
+            self.queue.put_nowait((table, row))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped % 1000 == 1:
+                print(f"DB write queue full, dropped {self.dropped} rows so far.")
+            return False
+
+    def flush(self, timeout=None):
+        """Block until everything submitted so far has been written."""
+        if self._thread is None or not self._thread.is_alive():
+            return True
+        done = threading.Event()
+        self.queue.put(done)
+        return done.wait(timeout)
+
+    def shutdown(self, timeout=10.0):
+        if self._thread is None or not self._thread.is_alive():
+            return
+        self.queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def stats(self):
+        return {
+            "queued": self.queue.qsize(),
+            "written": self.written,
+            "failed": self.failed,
+            "dropped": self.dropped,
+        }
+
+    def _run(self):
+        pending = defaultdict(list)
+        count = 0
+        last_flush = time.monotonic()
+        while True:
+            wait = max(0.0, self.flush_interval - (time.monotonic() - last_flush))
+            try:
+                item = self.queue.get(timeout=wait)
+            except queue.Empty:
+                item = None
+
+            if item is _STOP:
+                self._write(pending)
+                return
+            if isinstance(item, threading.Event):
+                self._write(pending)
+                pending, count, last_flush = defaultdict(list), 0, time.monotonic()
+                item.set()
+                continue
+            if item is not None:
+                table, row = item
+                pending[table].append(row)
+                count += 1
+
+            if count >= self.batch_size or time.monotonic() - last_flush >= self.flush_interval:
+                self._write(pending)
+                pending, count, last_flush = defaultdict(list), 0, time.monotonic()
+
+    def _write(self, pending):
+        for table, rows in pending.items():
+            for i in range(0, len(rows), self.batch_size):
+                self._insert(table, rows[i:i + self.batch_size])
+
+    def _insert(self, table, rows):
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                supabase.table(table).insert(rows).execute()
+                self.written += len(rows)
+                print(f"Saved {len(rows)} rows to {table}")
+                response_cache.invalidate(table)
+                return True
+            except Exception as e:
+                print(f"Error saving {len(rows)} rows to {table} (attempt {attempt}/{self.max_retries}): {e}")
+                if attempt < self.max_retries:
+                    time.sleep(min(0.5 * 2 ** attempt, 5.0))
+        self.failed += len(rows)
+        return False
+
+
+writer = BatchWriter()
+atexit.register(writer.shutdown)
+
+
+def flush_writes(timeout=None):
+    return writer.flush(timeout)
+
+def shutdown_writer(timeout=10.0):
+    writer.shutdown(timeout)
 
 def save_video(video_name, title, uploaded_by=None, uploaded_at=None):
     try:
@@ -10,6 +140,7 @@ def save_video(video_name, title, uploaded_by=None, uploaded_at=None):
             "uploaded_by": uploaded_by
         }
         response = supabase.table("videos").insert(data).execute()
+        response_cache.invalidate("videos")
         print(f"Video saved: {video_name}")
         return response
     except Exception as e:
@@ -17,71 +148,64 @@ def save_video(video_name, title, uploaded_by=None, uploaded_at=None):
         return None
 
 def save_person(video_id, track_id, frame_number, has_mask, has_gloves, has_labcoat, has_glasses, in_red_zone, status, created_at):
-    try:
-        data = {
-            "video_id": video_id,
-            "track_id": track_id,
-            "frame_number": frame_number,
-            "has_mask": has_mask,
-            "has_gloves": has_gloves,
-            "has_labcoat": has_labcoat,
-            "has_glasses": has_glasses,
-            "in_red_zone": in_red_zone,
-            "status": status,
-            "created_at": created_at
-        }
-        response = supabase.table("persons").insert(data).execute()
-        print(f"Person saved: frame={frame_number}, status={status}")
-        return response
-    except Exception as e:
-        print(f"Error saving person: {e}")
-        return None
+    data = {
+        "video_id": video_id,
+        "track_id": track_id,
+        "frame_number": frame_number,
+        "has_mask": has_mask,
+        "has_gloves": has_gloves,
+        "has_labcoat": has_labcoat,
+        "has_glasses": has_glasses,
+        "in_red_zone": in_red_zone,
+        "status": status,
+        "created_at": created_at
+    }
+    return writer.submit("persons", data)
 
 def save_detection(class_name, confidence, bbox, frame_path, detected_at=None):
-    try:
-        data = {
-            "class_name": class_name,
-            "confidence": confidence,
-            "bbox": bbox,
-            "frame_path": frame_path,
-            "detected_at": detected_at or datetime.now(timezone.utc).isoformat()
-        }
-        response = supabase.table("detections").insert(data).execute()
-        print(f"Detection saved: {class_name} ({confidence:.2f})")
-        return response
-    except Exception as e:
-        print(f"Error saving detection: {e}")
-        return None
+    data = {
+        "class_name": class_name,
+        "confidence": confidence,
+        "bbox": bbox,
+        "frame_path": frame_path,
+        "detected_at": detected_at or datetime.now(timezone.utc).isoformat()
+    }
+    return writer.submit("detections", data)
 
 def save_alert(person_id, alert_type, reason, created_at=None):
-    try:
-        data = {
-            "person_id": person_id,
-            "alert_type": alert_type,
-            "reason": reason,
-            "created_at": created_at or datetime.now(timezone.utc).isoformat()
-        }
-        response = supabase.table("alerts").insert(data).execute()
-        print(f"Alert saved: {alert_type}")
-        return response
-    except Exception as e:
-        print(f"Error saving alert: {e}")
-        return None
+    data = {
+        "person_id": person_id,
+        "alert_type": alert_type,
+        "reason": reason,
+        "created_at": created_at or datetime.now(timezone.utc).isoformat()
+    }
+    print(f"Alert queued: {alert_type}")
+    return writer.submit("alerts", data)
 
 def save_spill(video_id, frame_path, bbox, confidence, detected_at=None):
+    data = {
+        "video_id": video_id,
+        "frame_path": frame_path,
+        "bbox": bbox,
+        "confidence": confidence,
+        "detected_at": detected_at or datetime.now(timezone.utc).isoformat()
+    }
+    return writer.submit("spills", data)
+
+def save_clip(person_id, alert_id, clip_path, start_frame, end_frame, created_at=None):
     try:
         data = {
-            "video_id": video_id,
-            "frame_path": frame_path,
-            "bbox": bbox,
-            "confidence": confidence,
-            "detected_at": detected_at or datetime.now(timezone.utc).isoformat()
+            "person_id": person_id,
+            "alert_id": alert_id,
+            "clip_path": clip_path,
+            "start_frame": start_frame,
+            "end_frame": end_frame,
+            "created_at": created_at or datetime.now(timezone.utc).isoformat()
         }
-        response = supabase.table("spills").insert(data).execute()
-        print(f"Spill saved for video_id={video_id}")
+        response = supabase.table("clips").insert(data).execute()
+        response_cache.invalidate("clips")
+        print(f"Clip saved: {clip_path}")
         return response
     except Exception as e:
-        print(f"Error saving spill: {e}")
+        print(f"Error saving clip: {e}")
         return None
-
-def save_clip(person_id, alert_id, clip_path, start_frame, end_frame, created_at=None):
\ No newline at end of file
@@ -0,0 +1,412 @@
+"""
+Live camera streams: N sources, each with its own capture thread, tracker,
+safety status and DB video record. Inference for all cameras runs on one
+shared worker pool (STREAM_INFERENCE_WORKERS); a camera has at most one
+frame in flight, so per-camera order and tracker state stay consistent.
+
+Capture and analysis are separate threads joined by a one-frame slot:
+analysis always takes the newest frame and stale ones are dropped, so
+the live view and alerts stay near real time. Every analysed frame
+records its capture-to-publish latency, every alert its capture-to-alert
+latency.
+
+Sources are a device index ("1"), an RTSP/HTTP URL, or a video file
+(handy for testing). STREAM_SOURCES registers cameras at startup:
+    STREAM_SOURCES="lab=1,door=rtsp://10.0.0.5/stream"
+"""
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+import os, threading, time
+import cv2
+from Nabah.app.utils import save_to_db, video_utils
+from Nabah.app.utils.frame_hub import FrameHub, mjpeg_part
+from Nabah.app.utils.model_registry import ModelNotReady
+from Nabah.app.utils.tracker import IoUTracker
+
+
+STREAM_INFERENCE_WORKERS = int(os.getenv("STREAM_INFERENCE_WORKERS", "2"))
+STREAM_SOURCES = os.getenv("STREAM_SOURCES", "default=1")
+STREAM_PERSON_CONF = float(os.getenv("STREAM_PERSON_CONF", "0.6"))
+STREAM_RECONNECT_DELAY = float(os.getenv("STREAM_RECONNECT_DELAY", "2"))
+STREAM_JPEG_QUALITY = int(os.getenv("STREAM_JPEG_QUALITY", "80"))
+STATS_WINDOW = 120
+STREAM_MODELS = ("person", *video_utils.PPE_ITEMS)
+
+MISSING_AR = {"mask": "الكمامة", "gloves": "القفازات", "labcoat": "المعطف", "glasses": "النظارات"}
+
+
+def parse_source(source):
+    """Device indexes arrive as strings from env / query params."""
+    if isinstance(source, str) and source.strip().isdigit():
+        return int(source)
+    return source
+
+
+def alert_text(missing):
+    return f"لم يتم ارتداء {' و '.join(MISSING_AR[item] for item in missing)}"
+
+
+def _pct(values, q):
+    values = sorted(values)
+    return round(values[int(q * (len(values) - 1))], 1) if values else None
+
+
+class CameraStats:
+    def __init__(self):
+        self.started_at = None
+        self.captured = 0
+        self.analyzed = 0
+        self.failed = 0
+        self.analyzed_at = deque(maxlen=STATS_WINDOW)
+        # per analysed frame: frame, wait_ms (captured -> inference start),
+        # infer_ms, latency_ms (captured -> annotated frame published)
+        self.frames = deque(maxlen=STATS_WINDOW)
+        # per alert: frame, latency_ms (captured -> alert raised), at
+        self.alerts = deque(maxlen=20)
+
+    def report(self):
+        span = self.analyzed_at[-1] - self.analyzed_at[0] if len(self.analyzed_at) > 1 else 0
+        infer = [f["infer_ms"] for f in self.frames]
+        latency = [f["latency_ms"] for f in self.frames]
+        return {
+            "frames_captured": self.captured,
+            "frames_analyzed": self.analyzed,
+            "failed_reads": self.failed,
+            "fps": round((len(self.analyzed_at) - 1) / span, 2) if span > 0 else None,
+            "infer_ms_avg": round(sum(infer) / len(infer), 1) if infer else None,
+            "infer_ms_p95": _pct(infer, 0.95),
+            "latency_ms_p50": _pct(latency, 0.5),
+            "latency_ms_p95": _pct(latency, 0.95),
+            "last_alert_latency_ms": self.alerts[-1]["latency_ms"] if self.alerts else None,
+        }
+
+
+class FrameSlot:
+    """
+    One-frame mailbox between capture and analysis: put() overwrites a frame
+    nobody took yet (counted as dropped), take() returns the newest.
+    """
+
+    def __init__(self):
+        self.dropped = 0
+        self.closed = False
+        self._item = None
+        self._cond = threading.Condition()
+
+    def put(self, frame, captured_at):
+        with self._cond:
+            if self._item is not None:
+                self.dropped += 1
+            self._item = (frame, captured_at)
+            self._cond.notify()
+
+    def take(self, timeout=0.5):
+        """(frame, captured_at), or None on timeout / once closed and empty."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._item is not None or self.closed, timeout)
+            item, self._item = self._item, None
+            return item
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+
+class CameraStream:
+    def __init__(self, camera_id, source, title=None):
+        self.camera_id = camera_id
+        self.source = parse_source(source)
+        self.title = title or f"Camera {camera_id}"
+        self.is_file = isinstance(self.source, str) and os.path.isfile(self.source)
+        self.video_id = None
+        self.status = "safe"
+        self.tracker = IoUTracker()
+        self.frame_index = 0
+        self.stats = CameraStats()
+        self.hub = FrameHub()
+        self.slot = FrameSlot()
+        # one start() == one CameraStream: the capture, stop event and threads
+        # below are never reused, so a thread that outlives stop() only ever
+        # touches its own (already released) capture
+        self._cap = None
+        self._started = False
+        self._stop = threading.Event()
+        self._thread = None
+        self._capture_thread = None
+
+    @property
+    def running(self):
+        return self._started and not self._stop.is_set()
+
+    def _open(self):
+        cap = cv2.VideoCapture(self.source)
+        if not cap.isOpened():
+            cap.release()
+            return None
+        return cap
+
+    def _publish(self, frame):
+        # encoded once here, shared by every viewer; skipped when nobody watches
+        if not self.hub.subscribers:
+            return
+        ok, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, STREAM_JPEG_QUALITY])
+        if ok:
+            self.hub.publish(mjpeg_part(buffer.tobytes()))
+
+    def frames(self):
+        """Async iterator of MJPEG parts for one viewer."""
+        return self.hub.stream(lambda: self.running)
+
+    def report(self):
+        return {
+            "camera_id": self.camera_id,
+            "source": str(self.source),
+            "title": self.title,
+            "running": self.running,
+            "status": self.status,
+            "video_id": self.video_id,
+            "tracks": len(self.tracker.tracks),
+            **self.stats.report(),
+            "stale_frames_dropped": self.slot.dropped,
+            **self.hub.stats(),
+        }
+
+
+class StreamManager:
+    def __init__(self, models, on_alert=None, workers=STREAM_INFERENCE_WORKERS):
+        """
+        - models: a model_registry.ModelRegistry; each frame checks out the
+          person and PPE models (YOLO instances aren't thread-safe)
+        - on_alert(camera, text): called when a camera turns unsafe
+        """
+        self.models = models
+        self.on_alert = on_alert
+        self.cameras = {}
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="stream-infer")
+        self._lock = threading.Lock()
+        self._start_locks = {}
+
+    def register(self, camera_id, source, title=None):
+        with self._lock:
+            cam = self.cameras.get(camera_id)
+            if cam is not None and cam.running:
+                raise ValueError(f"Camera '{camera_id}' is running; stop it before changing its source")
+            cam = CameraStream(camera_id, source, title)
+            self.cameras[camera_id] = cam
+            return cam
+
+    def register_from_env(self, spec=STREAM_SOURCES):
+        for item in filter(None, (s.strip() for s in spec.split(","))):
+            camera_id, _, source = item.partition("=")
+            self.register(camera_id.strip(), source.strip())
+
+    def get(self, camera_id):
+        return self.cameras.get(camera_id)
+
+    def _start_lock(self, camera_id):
+        with self._lock:
+            return self._start_locks.setdefault(camera_id, threading.Lock())
+
+    def start(self, camera_id):
+        """
+        Open the source and start its loop. Idempotent for a running camera.
+        Returns the running CameraStream (a new object on every start).
+
+        Opening the source (an RTSP timeout can take tens of seconds) and
+        creating the DB video happen outside the manager lock, so other
+        cameras can start, stop and report meanwhile.
+        """
+        with self._start_lock(camera_id):
+            with self._lock:
+                cam = self.cameras.get(camera_id)
+                if cam is None:
+                    raise KeyError(camera_id)
+                if cam.running:
+                    return cam
+
+            run = CameraStream(camera_id, cam.source, cam.title)
+            cap = run._open()
+            if cap is None:
+                raise ConnectionError(f"Cannot open source {cam.source!r}")
+            try:
+                video = save_to_db.save_video(video_name=f"Camera {camera_id}", title=cam.title)
+            except Exception:
+                cap.release()
+                raise
+            run._cap = cap
+            run.video_id = video.data[0]["id"] if video and video.data else None
+            run.stats.started_at = time.time()
+
+            with self._lock:
+                if self.cameras.get(camera_id) is not cam:
+                    # removed or re-registered while we were opening
+                    cap.release()
+                    raise KeyError(camera_id)
+                self.cameras[camera_id] = run
+                run._started = True
+                run._capture_thread = threading.Thread(target=self._capture, args=(run,), name=f"capture-{camera_id}", daemon=True)
+                run._thread = threading.Thread(target=self._run, args=(run,), name=f"camera-{camera_id}", daemon=True)
+                run._capture_thread.start()
+                run._thread.start()
+        print(f"Camera {camera_id} started (source={run.source!r}, video_id={run.video_id})")
+        return run
+
+    def stop(self, camera_id, timeout=5.0):
+        cam = self.cameras.get(camera_id)
+        if cam is None or not cam.running:
+            return False
+        cam._stop.set()
+        cam.slot.close()
+        cam.hub.wake_all()
+        for thread in (cam._capture_thread, cam._thread):
+            if thread is not None and thread is not threading.current_thread():
+                thread.join(timeout)
+                if thread.is_alive():
+                    print(f"Camera {camera_id}: {thread.name} still busy, it will exit on its own.")
+        print(f"Camera {camera_id} stopped.")
+        return True
+
+    def remove(self, camera_id):
+        self.stop(camera_id)
+        with self._lock:
+            return self.cameras.pop(camera_id, None) is not None
+
+    def report(self):
+        return [cam.report() for cam in list(self.cameras.values())]
+
+    def shutdown(self):
+        for camera_id in list(self.cameras):
+            self.stop(camera_id)
+        self._pool.shutdown(wait=True, cancel_futures=True)
+
+    def _capture(self, cam):
+        """
+        Read as fast as the source delivers and keep only the newest frame,
+        so OpenCV's buffer never fills and analysis never works on old frames.
+        """
+        cam._cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        # files are played at their own frame rate so they behave like a camera
+        frame_time = 1.0 / max(1.0, cam._cap.get(cv2.CAP_PROP_FPS) or 30.0) if cam.is_file else 0
+        next_read = time.perf_counter()
+        try:
+            while cam.running:
+                if frame_time:
+                    time.sleep(max(0.0, next_read - time.perf_counter()))
+                    next_read = max(next_read + frame_time, time.perf_counter() - frame_time)
+                ret, frame = cam._cap.read()
+                if not ret:
+                    cam.stats.failed += 1
+                    if not self._reconnect(cam):
+                        break
+                    continue
+                cam.stats.captured += 1
+                cam.slot.put(frame, time.perf_counter())
+        except Exception as e:
+            print(f"Camera {cam.camera_id} capture error:", e)
+        finally:
+            cam.slot.close()
+            if cam._cap is not None:
+                cam._cap.release()
+                cam._cap = None
+
+    def _run(self, cam):
+        try:
+            while True:
+                item = cam.slot.take()
+                if item is None:
+                    if cam.slot.closed or not cam.running:
+                        break
+                    continue
+                frame, captured_at = item
+                started = time.perf_counter()
+                frame = self._pool.submit(self._analyze, cam, frame, captured_at).result()
+                analyzed = time.perf_counter()
+                cam._publish(frame)
+                done = time.perf_counter()
+                cam.stats.analyzed += 1
+                cam.stats.analyzed_at.append(done)
+                cam.stats.frames.append({
+                    "frame": cam.frame_index,
+                    "wait_ms": round((started - captured_at) * 1000, 1),
+                    "infer_ms": round((analyzed - started) * 1000, 1),
+                    "latency_ms": round((done - captured_at) * 1000, 1),
+                })
+        except Exception as e:
+            print(f"Camera {cam.camera_id} error:", e)
+        finally:
+            cam._stop.set()
+            cam.slot.close()
+            cam.hub.wake_all()
+
+    def _reconnect(self, cam):
+        # files end; live sources get reopened until stopped
+        if cam.is_file:
+            print(f"Camera {cam.camera_id}: end of file.")
+            return False
+        cam._cap.release()
+        while not cam._stop.wait(STREAM_RECONNECT_DELAY):
+            cap = cam._open()
+            if cap is not None:
+                cam._cap = cap
+                print(f"Camera {cam.camera_id} reconnected.")
+                return True
+        return False
+
+    def _analyze(self, cam, frame, captured_at):
+        cam.frame_index += 1
+        frame_index = cam.frame_index
+        try:
+            with self.models.checkout(STREAM_MODELS) as models:
+                if models.get("person") is None:
+                    return frame
+                boxes, crops = video_utils.detect_persons(frame, models["person"], conf=STREAM_PERSON_CONF)
+                tracks, ppe = video_utils.detect_ppe_tracked(frame, boxes, crops, models, cam.tracker, frame_index)
+        except ModelNotReady:
+            # a model is loading in the background; show the raw frame meanwhile
+            return frame
+
+        missing_any = None
+        for (x1, y1, x2, y2), track, flags in zip(boxes, tracks, ppe):
+            missing = [item for item in video_utils.PPE_ITEMS if not flags[f"has_{item}"]]
+            status = "unsafe" if missing else "safe"
+            color = (0, 0, 255) if missing else (0, 255, 0)
+            cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+            cv2.putText(frame, f"#{track.track_id} {status.upper()}", (x1, y1 - 10),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+
+            state = (*(flags[f"has_{item}"] for item in video_utils.PPE_ITEMS), False)
+            if state != track.saved_state:
+                track.saved_state = state
+                save_to_db.save_person(
+                    video_id=cam.video_id,
+                    track_id=track.track_id,
+                    frame_number=frame_index,
+                    has_mask=flags["has_mask"],
+                    has_gloves=flags["has_gloves"],
+                    has_labcoat=flags["has_labcoat"],
+                    has_glasses=flags["has_glasses"],
+                    in_red_zone=False,
+                    status=status,
+                    created_at=datetime.now(timezone.utc).isoformat()
+                )
+            if missing:
+                missing_any = missing
+
+        if missing_any and cam.status == "safe":
+            text = alert_text(missing_any)
+            print(f"Alert ({cam.camera_id}): {text}")
+            save_to_db.save_alert(None, "PPE Violation", text)
+            cam.stats.alerts.append({
+                "frame": frame_index,
+                "latency_ms": round((time.perf_counter() - captured_at) * 1000, 1),
+                "at": time.time(),
+            })
+            cam.status = "unsafe"
+            if self.on_alert is not None:
+                self.on_alert(cam, text)
+        elif not missing_any and cam.status == "unsafe":
+            print(f"Camera {cam.camera_id}: status is safe now")
+            cam.status = "safe"
+        return frame
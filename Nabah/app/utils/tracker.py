@@ -0,0 +1,87 @@
+import itertools
+
+
+def iou(a, b):
+    ix1, iy1 = max(a[0], b[0]), max(a[1], b[1])
+    ix2, iy2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0, ix2 - ix1) * max(0, iy2 - iy1)
+    if inter == 0:
+        return 0.0
+    area_a = (a[2] - a[0]) * (a[3] - a[1])
+    area_b = (b[2] - b[0]) * (b[3] - b[1])
+    return inter / float(area_a + area_b - inter)
+
+
+class Track:
+    def __init__(self, track_id, box, frame_number):
+        self.track_id = track_id
+        self.box = box
+        self.first_frame = frame_number
+        self.last_frame = frame_number
+        # cached PPE verdict (same dict shape as video_utils.detect_ppe_batch)
+        self.flags = None
+        self.classified_box = None
+        self.classified_frame = None
+        # last (has_mask, has_gloves, has_labcoat, has_glasses, in_red_zone) written to persons
+        self.saved_state = None
+
+
+class IoUTracker:
+    """
+    Lightweight IoU tracker: each new box is greedily matched to the live
+    track it overlaps most. Unmatched boxes start new tracks and tracks not
+    seen for max_age frames are dropped.
+    """
+
+    def __init__(self, iou_threshold=0.3, max_age=30, refresh_interval=30, reclassify_iou=0.5):
+        self.iou_threshold = iou_threshold
+        self.max_age = max_age
+        self.refresh_interval = refresh_interval
+        self.reclassify_iou = reclassify_iou
+        self.tracks = {}
+        self._ids = itertools.count(1)
+
+    def update(self, boxes, frame_number):
+        """Return one Track per box, in the same order as boxes."""
+        pairs = []
+        for i, box in enumerate(boxes):
+            for tid, track in self.tracks.items():
+                score = iou(box, track.box)
+                if score >= self.iou_threshold:
+                    pairs.append((score, i, tid))
+        pairs.sort(reverse=True)
+
+        assigned = [None] * len(boxes)
+        used = set()
+        for _, i, tid in pairs:
+            if assigned[i] is not None or tid in used:
+                continue
+            assigned[i] = self.tracks[tid]
+            used.add(tid)
+
+        for i, box in enumerate(boxes):
+            track = assigned[i]
+            if track is None:
+                track = Track(next(self._ids), box, frame_number)
+                self.tracks[track.track_id] = track
+                assigned[i] = track
+            track.box = box
+            track.last_frame = frame_number
+
+        for tid in [tid for tid, t in self.tracks.items() if frame_number - t.last_frame > self.max_age]:
+            del self.tracks[tid]
+
+        return assigned
+
+    def needs_ppe(self, track, frame_number):
+        """Re-run PPE only for new tracks, moved boxes, or expired verdicts."""
+        if track.flags is None:
+            return True
+        if frame_number - track.classified_frame >= self.refresh_interval:
+            return True
+        return iou(track.box, track.classified_box) < self.reclassify_iou
+
+    def set_ppe(self, track, flags, frame_number):
+        track.flags = flags
+        track.classified_box = track.box
+        track.classified_frame = frame_number
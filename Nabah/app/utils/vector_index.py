@@ -0,0 +1,247 @@
+"""
+In-process IVF index over the RAG documents (local fallback for
+match_documents_rag).
+
+- vectors are L2-normalized float32, so inner product == cosine similarity
+- spherical k-means splits them into `nlist` cells; a query scans the
+  `nprobe` closest cells only
+- snapshots are a directory: vectors.f32 (raw, loaded back as a read-only
+  memmap), assign.npy, centroids.npy, docs.jsonl, meta.json
+- add() works on a loaded snapshot: new rows go to an in-memory block and
+  are assigned to the existing cells; re-adding a doc id replaces it
+"""
+import json, os, shutil, threading
+import numpy as np
+
+
+VECTOR_INDEX_NLIST = int(os.getenv("VECTOR_INDEX_NLIST", "256"))
+VECTOR_INDEX_NPROBE = int(os.getenv("VECTOR_INDEX_NPROBE", "16"))
+KMEANS_SAMPLE = 50_000
+KMEANS_ITERS = 10
+_CHUNK = 65_536
+
+
+def normalize(v):
+    v = np.asarray(v, dtype=np.float32)
+    norms = np.linalg.norm(v, axis=-1, keepdims=True)
+    return v / np.maximum(norms, 1e-12)
+
+
+def nearest(x, centroids):
+    """Index of the closest centroid for every row of x (chunked matmul)."""
+    out = np.empty(len(x), dtype=np.int32)
+    for i in range(0, len(x), _CHUNK):
+        out[i:i + _CHUNK] = np.argmax(x[i:i + _CHUNK] @ centroids.T, axis=1)
+    return out
+
+
+def kmeans(x, k, iters=KMEANS_ITERS, sample=KMEANS_SAMPLE, seed=0):
+    rng = np.random.default_rng(seed)
+    if len(x) > sample:
+        x = x[np.sort(rng.choice(len(x), sample, replace=False))]
+    centroids = x[rng.choice(len(x), k, replace=False)].copy()
+    for _ in range(iters):
+        assign = nearest(x, centroids)
+        counts = np.bincount(assign, minlength=k)
+        order = np.argsort(assign, kind="stable")
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        filled = counts > 0
+        # empty cells keep their previous centroid
+        centroids[filled] = np.add.reduceat(x[order], starts[filled], axis=0)
+        centroids = normalize(centroids)
+    return centroids
+
+
+class VectorIndex:
+    def __init__(self, dim, nlist=VECTOR_INDEX_NLIST, nprobe=VECTOR_INDEX_NPROBE):
+        self.dim = dim
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.centroids = None
+        self.docs = []
+        self._base = np.empty((0, dim), dtype=np.float32)
+        self._extra = np.empty((0, dim), dtype=np.float32)
+        self._n_extra = 0
+        self._assign = np.empty(0, dtype=np.int32)
+        self._row_of = {}
+        self._deleted = set()
+        self._lists = None
+        self._trained_on = 0
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.docs) - len(self._deleted)
+
+    @property
+    def rows(self):
+        return len(self._base) + self._n_extra
+
+    def _vectors(self, rows):
+        rows = np.asarray(rows, dtype=np.int64)
+        nb = len(self._base)
+        if not self._n_extra:
+            return np.asarray(self._base[rows])
+        out = np.empty((len(rows), self.dim), dtype=np.float32)
+        in_base = rows < nb
+        out[in_base] = self._base[rows[in_base]]
+        out[~in_base] = self._extra[rows[~in_base] - nb]
+        return out
+
+    def _live_rows(self):
+        if not self._deleted:
+            return np.arange(self.rows, dtype=np.int64)
+        mask = np.ones(self.rows, dtype=bool)
+        mask[list(self._deleted)] = False
+        return np.flatnonzero(mask)
+
+    def _append(self, vectors):
+        need = self._n_extra + len(vectors)
+        if need > len(self._extra):
+            grown = np.empty((max(need, 2 * len(self._extra), 1024), self.dim), dtype=np.float32)
+            grown[:self._n_extra] = self._extra[:self._n_extra]
+            self._extra = grown
+        self._extra[self._n_extra:need] = vectors
+        self._n_extra = need
+
+    def add(self, docs, vectors):
+        """docs: dicts with at least "id"; vectors: (n, dim). Same id replaces."""
+        vectors = normalize(vectors).reshape(-1, self.dim)
+        if len(docs) != len(vectors):
+            raise ValueError("docs and vectors differ in length")
+        with self._lock:
+            first = self.rows
+            for i, doc in enumerate(docs):
+                old = self._row_of.get(doc["id"])
+                if old is not None:
+                    self._deleted.add(old)
+                self._row_of[doc["id"]] = first + i
+            self.docs.extend(docs)
+            self._append(vectors)
+            if self.centroids is not None:
+                self._assign = np.concatenate((self._assign, nearest(vectors, self.centroids)))
+            else:
+                self._assign = np.concatenate((self._assign, np.full(len(vectors), -1, dtype=np.int32)))
+            self._lists = None
+            # train once there is enough data, retrain after 4x growth while cells are fewer than nlist
+            if self.centroids is None and len(self) >= 16 * min(self.nlist, 64):
+                self.train()
+            elif self.centroids is not None and len(self.centroids) < self.nlist and len(self) >= 4 * self._trained_on:
+                self.train()
+
+    def train(self):
+        with self._lock:
+            live = self._live_rows()
+            k = max(1, min(self.nlist, len(live) // 16))
+            self.centroids = kmeans(self._vectors(live), k)
+            assign = np.full(self.rows, -1, dtype=np.int32)
+            for i in range(0, len(live), _CHUNK):
+                chunk = live[i:i + _CHUNK]
+                assign[chunk] = nearest(self._vectors(chunk), self.centroids)
+            self._assign = assign
+            self._trained_on = len(live)
+            self._lists = None
+
+    def _cells(self):
+        if self._lists is None:
+            live = self._live_rows()
+            cells = self._assign[live]
+            order = np.argsort(cells, kind="stable")
+            bounds = np.searchsorted(cells[order], np.arange(len(self.centroids) + 1))
+            rows = live[order]
+            self._lists = [rows[bounds[j]:bounds[j + 1]] for j in range(len(self.centroids))]
+        return self._lists
+
+    def _all_scores(self, q):
+        scores = np.concatenate((self._base @ q, self._extra[:self._n_extra] @ q))
+        rows = np.arange(len(scores), dtype=np.int64)
+        if self._deleted:
+            live = self._live_rows()
+            return rows[live], scores[live]
+        return rows, scores
+
+    def _top(self, rows, q, k, threshold):
+        if rows is None:
+            rows, scores = self._all_scores(q)
+        elif len(rows):
+            scores = self._vectors(rows) @ q
+        else:
+            return []
+        keep = scores >= threshold
+        rows, scores = rows[keep], scores[keep]
+        if len(scores) > k:
+            part = np.argpartition(-scores, k)[:k]
+            rows, scores = rows[part], scores[part]
+        order = np.argsort(-scores, kind="stable")
+        return [(float(scores[i]), self.docs[rows[i]]) for i in order]
+
+    def search(self, query, k=8, threshold=0.0, nprobe=None):
+        """[(similarity, doc)] best first."""
+        q = normalize(query).reshape(self.dim)
+        with self._lock:
+            if self.centroids is None:
+                return self._top(None, q, k, threshold)
+            probes = np.argsort(-(self.centroids @ q))[:nprobe or self.nprobe]
+            cells = self._cells()
+            rows = np.concatenate([cells[p] for p in probes])
+            return self._top(rows, q, k, threshold)
+
+    def brute_force(self, query, k=8, threshold=0.0):
+        q = normalize(query).reshape(self.dim)
+        with self._lock:
+            return self._top(None, q, k, threshold)
+
+    def snapshot(self, path):
+        """Write a compacted copy (deleted rows dropped) and swap it in atomically."""
+        with self._lock:
+            live = self._live_rows()
+            tmp = path.rstrip("/") + ".tmp"
+            shutil.rmtree(tmp, ignore_errors=True)
+            os.makedirs(tmp)
+            out = np.memmap(os.path.join(tmp, "vectors.f32"), dtype=np.float32, mode="w+", shape=(max(len(live), 1), self.dim))
+            for i in range(0, len(live), _CHUNK):
+                out[i:i + _CHUNK] = self._vectors(live[i:i + _CHUNK])
+            out.flush()
+            del out
+            np.save(os.path.join(tmp, "assign.npy"), self._assign[live])
+            if self.centroids is not None:
+                np.save(os.path.join(tmp, "centroids.npy"), self.centroids)
+            with open(os.path.join(tmp, "docs.jsonl"), "w", encoding="utf-8") as f:
+                for r in live:
+                    f.write(json.dumps(self.docs[r], ensure_ascii=False, default=str) + "\n")
+            with open(os.path.join(tmp, "meta.json"), "w") as f:
+                json.dump({"dim": self.dim, "count": int(len(live)), "nlist": self.nlist, "nprobe": self.nprobe}, f)
+
+        old = path.rstrip("/") + ".old"
+        shutil.rmtree(old, ignore_errors=True)
+        if os.path.exists(path):
+            os.replace(path, old)
+        os.replace(tmp, path)
+        shutil.rmtree(old, ignore_errors=True)
+
+    @classmethod
+    def load(cls, path):
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        index = cls(meta["dim"], nlist=meta["nlist"], nprobe=meta["nprobe"])
+        count = meta["count"]
+        if count:
+            index._base = np.memmap(os.path.join(path, "vectors.f32"), dtype=np.float32, mode="r", shape=(count, meta["dim"]))
+        index._assign = np.load(os.path.join(path, "assign.npy"))
+        centroids = os.path.join(path, "centroids.npy")
+        if os.path.exists(centroids):
+            index.centroids = np.load(centroids)
+            index._trained_on = count
+        with open(os.path.join(path, "docs.jsonl"), encoding="utf-8") as f:
+            index.docs = [json.loads(line) for line in f]
+        index._row_of = {doc["id"]: i for i, doc in enumerate(index.docs)}
+        return index
+
+    def stats(self):
+        return {
+            "documents": len(self),
+            "rows": self.rows,
+            "deleted": len(self._deleted),
+            "cells": 0 if self.centroids is None else len(self.centroids),
+            "nprobe": self.nprobe,
+            "memmapped_rows": len(self._base),
+        }
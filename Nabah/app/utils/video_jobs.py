@@ -0,0 +1,317 @@
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import ExitStack
+from datetime import datetime, timezone
+import multiprocessing as mp
+import os, threading, time, uuid
+import cv2
+
+
+OUTPUTS_DIR = "/content/outputs"
+VIDEO_JOB_WORKERS = int(os.getenv("VIDEO_JOB_WORKERS", "1"))
+PROGRESS_EVERY = 15
+# finished jobs are forgotten after this many seconds
+VIDEO_JOB_TTL = float(os.getenv("VIDEO_JOB_TTL", "3600"))
+# a job whose worker process died (e.g. OOM) is resubmitted this many times
+VIDEO_JOB_RETRIES = 1
+# tables a job writes from its worker process; invalidated here when it ends
+VIDEO_JOB_TABLES = ("videos", "persons", "alerts", "spills", "detections", "clips")
+
+
+def _init_worker(model_state):
+    """Worker-process start: load and warm the models before the first job arrives."""
+    from Nabah.app.utils.model_registry import registry
+    # one job at a time per process, so one instance per model is enough
+    registry.pool_size = 1
+    registry.sync(model_state)
+    registry.preload()
+
+
+def _warm_up():
+    return os.getpid()
+
+
+def _insert_video(title, src):
+    from Nabah.app.utils.supabase_client import supabase
+    try:
+        res = supabase.table("videos").insert({
+            "title": title,
+            "video_name": os.path.basename(src),
+            "uploaded_at": datetime.now(timezone.utc).isoformat()
+        }).execute()
+        return res.data[0]["id"] if res.data else None
+    except Exception as e:
+        print("Cannot insert video:", e)
+        return None
+
+
+def run_analysis(job_id, src, out_path, params, progress, cancel_flags):
+    """
+    Worker-process entry point: pipelined decode -> infer -> encode for one upload.
+    Progress is published to the shared `progress` dict; the job stops early
+    if `cancel_flags[job_id]` is set.
+    """
+    from Nabah.app.utils import save_to_db, video_utils, video_pipeline
+    from Nabah.app.utils.model_registry import registry
+    from Nabah.app.utils.tracker import IoUTracker
+    from Nabah.app.utils.frame_sampler import FrameSampler
+
+    def report(**fields):
+        state = dict(progress.get(job_id, {}))
+        state.update(fields)
+        progress[job_id] = state
+
+    cap = out = None
+    checkout = ExitStack()
+    try:
+        report(status="running", started_at=time.time())
+        cap = cv2.VideoCapture(src)
+        if not cap.isOpened():
+            raise ValueError("Cannot open video")
+
+        fps = max(1, int(cap.get(cv2.CAP_PROP_FPS)))
+        w = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        h = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) or None
+        out = cv2.VideoWriter(out_path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (w, h))
+
+        # follow enable / disable / reload done in the main process since this worker started
+        registry.sync(params["models"])
+        models = checkout.enter_context(
+            registry.checkout(registry.names_for(params["analysis_type"], params["ppe_mode"]))
+        )
+        video_id = _insert_video(params["title"], src)
+        report(video_id=video_id, total_frames=total)
+
+        tracker = IoUTracker()
+        sampler = FrameSampler(params["sampling"], source_fps=fps, analysis_fps=params["analysis_fps"])
+        annotations = []
+        t0 = time.perf_counter()
+
+        def process(frame, frame_i):
+            if sampler.should_analyze(frame, frame_i, tracker):
+                return video_utils.process_frame(frame, models, video_id, frame_i, tracker, annotations)
+            return video_utils.draw_annotations(frame, annotations)
+
+        def on_frame(frame_i):
+            if frame_i % PROGRESS_EVERY == 0:
+                rate = frame_i / max(time.perf_counter() - t0, 1e-6)
+                eta = round((total - frame_i) / rate, 1) if total and total > frame_i else None
+                report(frames_done=frame_i, fps=round(rate, 2), eta_seconds=eta)
+
+        frame_i, stopped, stages = video_pipeline.run_pipeline(
+            cap, out, process,
+            should_stop=lambda: bool(cancel_flags.get(job_id)),
+            on_frame=on_frame,
+        )
+        if stopped:
+            report(status="cancelled", frames_done=frame_i, stages=stages, finished_at=time.time())
+            return None
+
+        rate = frame_i / max(time.perf_counter() - t0, 1e-6)
+        result = {
+            "video_id": video_id,
+            "analysis_type": params["analysis_type"],
+            "ppe_mode": "fused" if "ppe_fused" in models else "separate",
+            "sampling": sampler.report(),
+            "stages": stages,
+            "bottleneck": video_pipeline.bottleneck(stages),
+            "download_url": f"/download/{os.path.basename(out_path)}",
+        }
+        report(status="done", frames_done=frame_i, fps=round(rate, 2), eta_seconds=0,
+               stages=stages, finished_at=time.time(), result=result)
+        print(f"Video job {job_id} stages: {stages} (bottleneck: {result['bottleneck']})")
+        return result
+
+    except Exception as e:
+        print(f"Video job {job_id} failed:", e)
+        report(status="failed", error=str(e), finished_at=time.time())
+        return None
+
+    finally:
+        checkout.close()
+        if cap is not None:
+            cap.release()
+        if out is not None:
+            out.release()
+        save_to_db.flush_writes()
+        _remove(src)
+        if progress.get(job_id, {}).get("status") == "cancelled":
+            _remove(out_path)
+
+
+def _remove(path):
+    try:
+        if path and os.path.exists(path):
+            os.remove(path)
+    except OSError as e:
+        print(f"Cannot remove {path}: {e}")
+
+
+class VideoJobManager:
+    """
+    Runs video analysis jobs on a process pool (inference doesn't share the
+    API process's GIL). At most `max_workers` jobs run at once; the rest wait
+    in the executor queue.
+    """
+
+    def __init__(self, max_workers=VIDEO_JOB_WORKERS):
+        self.max_workers = max_workers
+        self.jobs = {}
+        self._args = {}
+        self._executor = None
+        self._manager = None
+        self._progress = None
+        self._cancel = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._manager is None:
+                ctx = mp.get_context("spawn")
+                self._manager = ctx.Manager()
+                self._progress = self._manager.dict()
+                self._cancel = self._manager.dict()
+            if self._executor is None:
+                from Nabah.app.utils.model_registry import registry
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers, mp_context=mp.get_context("spawn"),
+                    initializer=_init_worker, initargs=(registry.state(),),
+                )
+            return self._executor
+
+    def _discard_executor(self, executor):
+        """A dead worker breaks the whole pool; drop it so the next submit builds a new one."""
+        with self._lock:
+            if self._executor is not executor:
+                return
+            self._executor = None
+        print("Video worker process died; restarting the job pool.")
+        # called from the pool's own callback thread, so never wait here
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def warm_up(self):
+        """Start the worker processes now so they load their models before the first upload."""
+        executor = self._ensure_started()
+        for _ in range(self.max_workers):
+            executor.submit(_warm_up)
+
+    def _start(self, job_id, attempt):
+        src, out_path, params = self._args[job_id]
+        for retry in (False, True):
+            executor = self._ensure_started()
+            try:
+                future = executor.submit(run_analysis, job_id, src, out_path, params, self._progress, self._cancel)
+                break
+            except BrokenProcessPool:
+                self._discard_executor(executor)
+                if retry:
+                    raise
+        future.add_done_callback(lambda f: self._on_done(job_id, f, attempt, executor))
+        self.jobs[job_id] = future
+
+    def submit(self, src, title, analysis_type, ppe_mode="separate", sampling="all", analysis_fps=0):
+        from Nabah.app.utils.model_registry import registry
+        self._ensure_started()
+        self._evict()
+        job_id = uuid.uuid4().hex
+        os.makedirs(OUTPUTS_DIR, exist_ok=True)
+        out_path = os.path.join(OUTPUTS_DIR, f"annotated_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{job_id[:8]}.mp4")
+        params = {
+            "title": title,
+            "analysis_type": analysis_type,
+            "ppe_mode": ppe_mode,
+            "sampling": sampling,
+            "analysis_fps": analysis_fps,
+            "models": registry.state(),
+        }
+        self._progress[job_id] = {"status": "queued", "frames_done": 0, "created_at": time.time()}
+        self._args[job_id] = (src, out_path, params)
+        try:
+            self._start(job_id, attempt=0)
+        except Exception:
+            self._forget(job_id)
+            raise
+        print(f"Video job queued: {job_id}")
+        return job_id
+
+    def _on_done(self, job_id, future, attempt, executor):
+        src = self._args[job_id][0]
+        if not future.cancelled():
+            # the worker's writes bumped the cache versions in its own process only
+            from Nabah.app.utils import response_cache
+            response_cache.invalidate(*VIDEO_JOB_TABLES)
+        # the worker removes the upload itself; these cases never reached it
+        if future.cancelled():
+            _remove(src)
+            self._set(job_id, status="cancelled", finished_at=time.time())
+            return
+        error = future.exception()
+        if isinstance(error, BrokenProcessPool):
+            self._discard_executor(executor)
+            if attempt < VIDEO_JOB_RETRIES and not self._cancel.get(job_id) and os.path.exists(src):
+                print(f"Video job {job_id}: worker died, retrying.")
+                self._set(job_id, status="queued", retries=attempt + 1)
+                try:
+                    self._start(job_id, attempt + 1)
+                    return
+                except Exception as e:
+                    error = e
+        if error is not None:
+            _remove(src)
+            self._set(job_id, status="failed", error=str(error) or type(error).__name__, finished_at=time.time())
+
+    def _set(self, job_id, **fields):
+        try:
+            state = dict(self._progress.get(job_id, {}))
+            state.update(fields)
+            self._progress[job_id] = state
+        except Exception as e:
+            print(f"Cannot update job {job_id}: {e}")
+
+    def get(self, job_id):
+        if job_id not in self.jobs:
+            return None
+        return {"job_id": job_id, **dict(self._progress.get(job_id, {}))}
+
+    def list(self):
+        self._evict()
+        return [self.get(job_id) for job_id in list(self.jobs)]
+
+    def _forget(self, job_id):
+        self.jobs.pop(job_id, None)
+        self._args.pop(job_id, None)
+        for shared in (self._progress, self._cancel):
+            try:
+                shared.pop(job_id, None)
+            except Exception as e:
+                print(f"Cannot forget job {job_id}: {e}")
+
+    def _evict(self, ttl=VIDEO_JOB_TTL):
+        """Drop jobs that finished more than ttl seconds ago (their output file stays)."""
+        cutoff = time.time() - ttl
+        for job_id, future in list(self.jobs.items()):
+            if not future.done():
+                continue
+            finished_at = self._progress.get(job_id, {}).get("finished_at")
+            if finished_at is not None and finished_at < cutoff:
+                self._forget(job_id)
+
+    def cancel(self, job_id):
+        future = self.jobs.get(job_id)
+        if future is None:
+            return False
+        if not future.cancel():
+            self._cancel[job_id] = True
+        return True
+
+    def shutdown(self):
+        if self._executor is not None:
+            for job_id in self.jobs:
+                self._cancel[job_id] = True
+            self._executor.shutdown(wait=True, cancel_futures=True)
+        if self._manager is not None:
+            self._manager.shutdown()
+
+
+jobs = VideoJobManager()
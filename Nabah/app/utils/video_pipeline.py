@@ -0,0 +1,145 @@
+import queue, threading, time
+
+
+PIPELINE_QUEUE_SIZE = 8
+_END = object()
+
+
+class StageStats:
+    def __init__(self, name):
+        self.name = name
+        self.frames = 0
+        self.busy = 0.0
+        self.wait = 0.0
+
+    def report(self):
+        return {
+            "frames": self.frames,
+            "busy_s": round(self.busy, 3),
+            "wait_s": round(self.wait, 3),
+            "fps": round(self.frames / self.busy, 2) if self.busy > 0 else None,
+        }
+
+
+def _put(q, item, stop):
+    # bounded put that still notices a stop request
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def run_pipeline(cap, out, process, queue_size=PIPELINE_QUEUE_SIZE, should_stop=None, on_frame=None):
+    """
+    Three-stage pipeline: decoder thread -> inference (calling thread) -> encoder thread.
+
+    - process(frame, frame_number) returns the annotated frame
+    - bounded queues between stages give backpressure; a single inference
+      consumer and FIFO queues keep frame order
+    - should_stop() is polled per frame; on_frame(frame_number) after each inference
+    Returns (frames_processed, stopped, stats) where stats has one entry per stage.
+    """
+    decoded, encoded = queue.Queue(maxsize=queue_size), queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    errors = []
+    stats = {name: StageStats(name) for name in ("decode", "infer", "encode")}
+
+    def decode():
+        s = stats["decode"]
+        i = 0
+        try:
+            while not stop.is_set():
+                t = time.perf_counter()
+                ret, frame = cap.read()
+                s.busy += time.perf_counter() - t
+                if not ret:
+                    break
+                i += 1
+                s.frames += 1
+                t = time.perf_counter()
+                if not _put(decoded, (i, frame), stop):
+                    return
+                s.wait += time.perf_counter() - t
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+        finally:
+            _put(decoded, _END, stop)
+
+    def encode():
+        s = stats["encode"]
+        try:
+            while True:
+                t = time.perf_counter()
+                item = encoded.get()
+                s.wait += time.perf_counter() - t
+                if item is _END:
+                    return
+                t = time.perf_counter()
+                out.write(item)
+                s.busy += time.perf_counter() - t
+                s.frames += 1
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+
+    decoder = threading.Thread(target=decode, name="video-decode", daemon=True)
+    encoder = threading.Thread(target=encode, name="video-encode", daemon=True)
+    decoder.start()
+    encoder.start()
+
+    s = stats["infer"]
+    frames = 0
+    stopped = False
+    try:
+        while True:
+            if should_stop is not None and should_stop():
+                stopped = True
+                break
+            t = time.perf_counter()
+            try:
+                item = decoded.get(timeout=0.1)
+            except queue.Empty:
+                s.wait += time.perf_counter() - t
+                if stop.is_set():
+                    break
+                continue
+            s.wait += time.perf_counter() - t
+            if item is _END:
+                break
+            frame_number, frame = item
+            t = time.perf_counter()
+            frame = process(frame, frame_number)
+            s.busy += time.perf_counter() - t
+            s.frames += 1
+            frames = frame_number
+            t = time.perf_counter()
+            if not _put(encoded, frame, stop):
+                break
+            s.wait += time.perf_counter() - t
+            if on_frame is not None:
+                on_frame(frame_number)
+    finally:
+        stop.set()
+        # the encoder drains everything already queued before it sees _END
+        while encoder.is_alive():
+            try:
+                encoded.put(_END, timeout=0.1)
+                break
+            except queue.Full:
+                continue
+        decoder.join()
+        encoder.join()
+
+    if errors:
+        raise errors[0]
+    return frames, stopped, {name: st.report() for name, st in stats.items()}
+
+
+def bottleneck(stats):
+    """Name of the stage with the lowest throughput."""
+    rated = {name: s["fps"] for name, s in stats.items() if s["fps"]}
+    return min(rated, key=rated.get) if rated else None
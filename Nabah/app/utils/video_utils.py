@@ -8,7 +8,8 @@ MODEL_FILES = {
     "gloves": "/content/models/gloves.pt",
     "labcoat": "/content/models/labcoat.pt",
     "glasses": "/content/models/glasses.pt",
-    "liquid": "/content/models/liquid.pt"
+    "liquid": "/content/models/liquid.pt",
+    "ppe_fused": "/content/models/ppe_fused.pt"
 }
 
 def load_model(model_name: str):
@@ -22,53 +23,240 @@ def load_model(model_name: str):
     print(f" Loading model: {model_name} from {model_path}")
     return YOLO(model_path)
 
-def load_models_by_type(analysis_type: str):
+def model_names(analysis_type: str, ppe_mode: str = "separate", available=None):
     """
-    تحميل الموديلات بناءً على نوع التحليل (ppe / spill / both)
+    أسماء الموديلات المطلوبة لنوع التحليل (ppe / spill / both)
+    - ppe_mode: separate (الافتراضي) أربعة موديلات على قصّة كل شخص، أو fused موديل واحد على الإطار كاملًا
+    - إذا كان الموديل المدمج غير متوفر نرجع للوضع separate
     """
-    analysis_type = analysis_type.strip().lower()
-    models = {}
-
-    if analysis_type == "ppe":
-        models["person"] = load_model("person")
-        models["mask"] = load_model("mask")
-        models["gloves"] = load_model("gloves")
-        models["labcoat"] = load_model("labcoat")
-        models["glasses"] = load_model("glasses")
-
-    elif analysis_type == "spill":
-        models["liquid"] = load_model("liquid")
-
-    elif analysis_type == "both":
-        models["person"] = load_model("person")
-        models["mask"] = load_model("mask")
-        models["gloves"] = load_model("gloves")
-        models["labcoat"] = load_model("labcoat")
-        models["glasses"] = load_model("glasses")
-        models["liquid"] = load_model("liquid")
-
-    else:
+    if available is None:
+        available = lambda name: os.path.exists(MODEL_FILES[name])
+    analysis_type = (analysis_type or "ppe").strip().lower()
+    ppe_mode = (ppe_mode or "separate").strip().lower()
+    if analysis_type not in ("ppe", "spill", "both"):
         print(f" Unknown analysis type '{analysis_type}', using PPE models by default.")
-        models["person"] = load_model("person")
-        models["mask"] = load_model("mask")
-        models["gloves"] = load_model("gloves")
-        models["labcoat"] = load_model("labcoat")
-        models["glasses"] = load_model("glasses")
+        analysis_type = "ppe"
 
-    print(f" Loaded models for analysis type: {analysis_type}")
+    names = []
+    if analysis_type in ("ppe", "both"):
+        names.append("person")
+        if ppe_mode == "fused" and available("ppe_fused"):
+            names.append("ppe_fused")
+        else:
+            if ppe_mode == "fused":
+                print("ppe_fused model unavailable -> falling back to separate PPE models.")
+            names.extend(PPE_ITEMS)
+    if analysis_type in ("spill", "both"):
+        names.append("liquid")
+    return names
+
+def load_models_by_type(analysis_type: str, ppe_mode: str = "separate"):
+    """
+    تحميل نسخة مستقلة من الموديلات لنوع التحليل (للسكربتات والـ benchmarks)
+    - الخادم يستخدم model_registry بدلًا منها حتى لا يُعاد تحميل الأوزان
+    """
+    models = {name: load_model(name) for name in model_names(analysis_type, ppe_mode)}
+    print(f" Loaded models for analysis type: {analysis_type} (ppe_mode={ppe_mode})")
     return models
 
 from datetime import datetime, timezone
 from Nabah.app.utils import save_to_db
 import cv2
+import numpy as np
+
+
+PPE_ITEMS = ("mask", "gloves", "labcoat", "glasses")
+PPE_INPUT_SIZE = 640
+
+
+def letterbox(img, size=PPE_INPUT_SIZE, color=(114, 114, 114)):
+    """
+    تغيير حجم القصّة مع الحفاظ على النسبة وإضافة حواف حتى تصبح size × size
+    """
+    h, w = img.shape[:2]
+    scale = min(size / h, size / w)
+    nh, nw = max(1, int(round(h * scale))), max(1, int(round(w * scale)))
+    resized = cv2.resize(img, (nw, nh), interpolation=cv2.INTER_LINEAR)
+    canvas = np.full((size, size, 3), color, dtype=np.uint8)
+    top, left = (size - nh) // 2, (size - nw) // 2
+    canvas[top:top + nh, left:left + nw] = resized
+    return canvas
+
+
+def detect_ppe_batch(crops, models, size=PPE_INPUT_SIZE):
+    """
+    فحص معدات الوقاية لكل الأشخاص في الإطار دفعة واحدة
+    - crops: قصّات الأشخاص من نفس الإطار
+    - كل موديل (mask / gloves / labcoat / glasses) يُستدعى مرة واحدة للإطار كاملًا
+    - يرجّع قائمة dict لكل شخص: has_mask, has_gloves, has_labcoat, has_glasses
+    """
+    results = [{f"has_{item}": False for item in PPE_ITEMS} for _ in crops]
+    if not crops:
+        return results
+
+    batch = [letterbox(crop, size) for crop in crops]
+    for item in PPE_ITEMS:
+        model = models.get(item)
+        if not model:
+            continue
+        preds = model(batch, imgsz=size, verbose=False)
+        for i, pred in enumerate(preds):
+            results[i][f"has_{item}"] = len(pred.boxes) > 0
+    return results
+
+
+def detect_ppe_sequential(crops, models):
+    """
+    الطريقة القديمة: كل موديل يُستدعى لكل شخص على حدة (للمقارنة فقط)
+    """
+    results = []
+    for crop in crops:
+        flags = {}
+        for item in PPE_ITEMS:
+            model = models.get(item)
+            flags[f"has_{item}"] = len(model(crop, verbose=False)[0].boxes) > 0 if model else False
+        results.append(flags)
+    return results
+
+
+def detect_persons(frame, person_model, conf=0.5):
+    """
+    كشف الأشخاص وإرجاع الصناديق مع القصّات (يتجاهل القصّات الفارغة)
+    """
+    boxes, crops = [], []
+    det = person_model(frame, verbose=False)
+    for box in det[0].boxes:
+        if int(box.cls[0]) == 0 and float(box.conf[0]) > conf:
+            x1, y1, x2, y2 = map(int, box.xyxy[0].cpu().numpy())
+            crop = frame[y1:y2, x1:x2]
+            if crop.size == 0:
+                continue
+            boxes.append((x1, y1, x2, y2))
+            crops.append(crop)
+    return boxes, crops
+
+FUSED_CLASS_MAP = {
+    "mask": "mask",
+    "gloves": "gloves",
+    "glove": "gloves",
+    "labcoat": "labcoat",
+    "lab_coat": "labcoat",
+    "lab coat": "labcoat",
+    "glasses": "glasses",
+    "goggles": "glasses",
+}
+FUSED_MIN_CONTAINMENT = 0.5
+
+
+def _containment(inner, outer):
+    """
+    نسبة مساحة الصندوق inner الموجودة داخل الصندوق outer
+    """
+    ix1, iy1 = max(inner[0], outer[0]), max(inner[1], outer[1])
+    ix2, iy2 = min(inner[2], outer[2]), min(inner[3], outer[3])
+    inter = max(0, ix2 - ix1) * max(0, iy2 - iy1)
+    area = max(1, (inner[2] - inner[0]) * (inner[3] - inner[1]))
+    return inter / area
+
+
+def assign_ppe_to_persons(person_boxes, ppe_boxes, min_containment=FUSED_MIN_CONTAINMENT):
+    """
+    ربط كل صندوق معدات وقاية بالشخص الذي يحتويه أكثر
+    - ppe_boxes: قائمة (item, (x1, y1, x2, y2))
+    - يرجّع نفس صيغة detect_ppe_batch
+    """
+    results = [{f"has_{item}": False for item in PPE_ITEMS} for _ in person_boxes]
+    for item, box in ppe_boxes:
+        best_i, best_c = None, min_containment
+        for i, person_box in enumerate(person_boxes):
+            c = _containment(box, person_box)
+            if c >= best_c:
+                best_i, best_c = i, c
+        if best_i is not None:
+            results[best_i][f"has_{item}"] = True
+    return results
+
+
+def detect_ppe_fused(frame, person_boxes, fused_model, conf=0.25):
+    """
+    تمرير واحد للموديل المدمج على الإطار كاملًا ثم توزيع النتائج على الأشخاص
+    """
+    if not person_boxes:
+        return []
+    names = fused_model.names
+    ppe_boxes = []
+    det = fused_model(frame, verbose=False)
+    for box in det[0].boxes:
+        if float(box.conf[0]) < conf:
+            continue
+        item = FUSED_CLASS_MAP.get(str(names[int(box.cls[0])]).lower())
+        if item is None:
+            continue
+        ppe_boxes.append((item, tuple(map(int, box.xyxy[0].cpu().numpy()))))
+    return assign_ppe_to_persons(person_boxes, ppe_boxes)
+
+
+def _without_disabled(results, models):
+    """
+    العناصر المعطّلة من صفحة الإعدادات (models["disabled"]) لا تُحسب كمخالفة
+    """
+    disabled = models.get("disabled")
+    if not disabled:
+        return results
+    forced = {f"has_{item}": True for item in disabled}
+    return [dict(flags, **forced) for flags in results]
+
+def detect_ppe(frame, boxes, crops, models):
+    """
+    اختيار مسار معدات الوقاية: المدمج إذا كان محمّلًا وإلا الدفعات
+    """
+    if models.get("ppe_fused"):
+        return _without_disabled(detect_ppe_fused(frame, boxes, models["ppe_fused"]), models)
+    return _without_disabled(detect_ppe_batch(crops, models), models)
+
+def detect_ppe_tracked(frame, boxes, crops, models, tracker, frame_number):
+    """
+    ربط الأشخاص بمسارات ثابتة ثم فحص معدات الوقاية فقط للمسارات التي تحتاج ذلك
+    (مسار جديد / تغيّر الصندوق كثيرًا / انتهت مدة التحديث) والباقي من الذاكرة
+    - يرجّع (tracks, ppe) بنفس ترتيب boxes
+    """
+    tracks = tracker.update(boxes, frame_number)
+    todo = [i for i, t in enumerate(tracks) if tracker.needs_ppe(t, frame_number)]
+    if todo:
+        if models.get("ppe_fused"):
+            fused = detect_ppe_fused(frame, boxes, models["ppe_fused"])
+            fresh = [fused[i] for i in todo]
+        else:
+            fresh = detect_ppe_batch([crops[i] for i in todo], models)
+        for i, flags in zip(todo, fresh):
+            tracker.set_ppe(tracks[i], flags, frame_number)
+    return tracks, _without_disabled([t.flags for t in tracks], models)
+
+def _annotate(frame, drawn, box, color, label=None, text_y=None):
+    x1, y1, x2, y2 = box
+    cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+    if label:
+        cv2.putText(frame, label, (x1, text_y), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+    drawn.append((box, color, label, text_y))
 
-def process_frame(frame, models, video_id, frame_number):
+def draw_annotations(frame, annotations):
+    """
+    إعادة رسم نتائج آخر إطار محلَّل على إطار تم تخطيه
+    """
+    for box, color, label, text_y in annotations:
+        _annotate(frame, [], box, color, label, text_y)
+    return frame
+
+def process_frame(frame, models, video_id, frame_number, tracker=None, annotations=None):
     """
     تحليل إطار واحد باستخدام الموديلات المحمّلة
-    - models: ناتج من load_models_by_type()
+    - models: من model_registry.checkout() أو load_models_by_type()
     - video_id: رقم الفيديو في قاعدة البيانات
     - frame_number: رقم الإطار الحالي
+    - tracker: IoUTracker اختياري؛ عند وجوده يُحفظ الشخص مرة لكل تغيّر في حالته بدل كل إطار
+    - annotations: قائمة اختيارية تُملأ بما تم رسمه لإعادة رسمه على الإطارات المتخطاة
     """
+    drawn = []
     try:
         
         h, w = frame.shape[:2]
@@ -77,51 +265,50 @@ def process_frame(frame, models, video_id, frame_number):
 
         
         person = models.get("person")
-        mask = models.get("mask")
-        gloves = models.get("gloves")
-        labcoat = models.get("labcoat")
-        glasses = models.get("glasses")
         liquid = models.get("liquid")
 
         
         if person:
-            det = person(frame, verbose=False)
-            for box in det[0].boxes:
-                if int(box.cls[0]) == 0 and float(box.conf[0]) > 0.5:
-                    x1, y1, x2, y2 = map(int, box.xyxy[0].cpu().numpy())
-                    crop = frame[y1:y2, x1:x2]
-                    if crop.size == 0:
-                        continue
+            boxes, crops = detect_persons(frame, person, conf=0.5)
+            if tracker is not None:
+                tracks, ppe = detect_ppe_tracked(frame, boxes, crops, models, tracker, frame_number)
+            else:
+                tracks, ppe = [None] * len(boxes), detect_ppe(frame, boxes, crops, models)
+            for (x1, y1, x2, y2), track, flags in zip(boxes, tracks, ppe):
+                has_mask = flags["has_mask"]
+                has_gloves = flags["has_gloves"]
+                has_labcoat = flags["has_labcoat"]
+                has_glasses = flags["has_glasses"]
 
-                    has_mask = len(mask(crop, verbose=False)[0].boxes) > 0 if mask else False
-                    has_gloves = len(gloves(crop, verbose=False)[0].boxes) > 0 if gloves else False
-                    has_labcoat = len(labcoat(crop, verbose=False)[0].boxes) > 0 if labcoat else False
-                    has_glasses = len(glasses(crop, verbose=False)[0].boxes) > 0 if glasses else False
+                status = "safe" if all([has_mask, has_gloves, has_labcoat, has_glasses]) else "unsafe"
+                color = (0, 255, 0) if status == "safe" else (0, 0, 255)
 
-                    status = "safe" if all([has_mask, has_gloves, has_labcoat, has_glasses]) else "unsafe"
-                    color = (0, 255, 0) if status == "safe" else (0, 0, 255)
+                label = status.upper() if track is None else f"#{track.track_id} {status.upper()}"
+                _annotate(frame, drawn, (x1, y1, x2, y2), color, label, max(15, y1 - 5))
 
-                    cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
-                    cv2.putText(frame, status.upper(), (x1, max(15, y1 - 5)),
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+                
+                cx, cy = (x1 + x2) // 2, (y1 + y2) // 2
+                in_red = (red_x1 <= cx <= red_x2) and (red_y1 <= cy <= red_y2)
 
-                    
-                    cx, cy = (x1 + x2) // 2, (y1 + y2) // 2
-                    in_red = (red_x1 <= cx <= red_x2) and (red_y1 <= cy <= red_y2)
+                
+                if track is not None:
+                    state = (has_mask, has_gloves, has_labcoat, has_glasses, in_red)
+                    if state == track.saved_state:
+                        continue
+                    track.saved_state = state
 
-                    
-                    save_to_db.save_person(
-                        video_id=video_id,
-                        track_id=None,
-                        frame_number=frame_number,
-                        has_mask=has_mask,
-                        has_gloves=has_gloves,
-                        has_labcoat=has_labcoat,
-                        has_glasses=has_glasses,
-                        in_red_zone=in_red,
-                        status=status,
-                        created_at=datetime.now(timezone.utc).isoformat()
-                    )
+                save_to_db.save_person(
+                    video_id=video_id,
+                    track_id=track.track_id if track is not None else None,
+                    frame_number=frame_number,
+                    has_mask=has_mask,
+                    has_gloves=has_gloves,
+                    has_labcoat=has_labcoat,
+                    has_glasses=has_glasses,
+                    in_red_zone=in_red,
+                    status=status,
+                    created_at=datetime.now(timezone.utc).isoformat()
+                )
 
       
         if liquid:
@@ -129,9 +316,7 @@ def process_frame(frame, models, video_id, frame_number):
             for box in liq[0].boxes:
                 if float(box.conf[0]) > 0.6:
                     x1, y1, x2, y2 = map(int, box.xyxy[0].cpu().numpy())
-                    cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 0, 255), 2)
-                    cv2.putText(frame, "Spill", (x1, max(15, y1 - 7)),
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 2)
+                    _annotate(frame, drawn, (x1, y1, x2, y2), (0, 0, 255), "Spill", max(15, y1 - 7))
                     save_to_db.save_spill(
                         video_id=video_id,
                         frame_path="processed_frame",
@@ -141,10 +326,14 @@ def process_frame(frame, models, video_id, frame_number):
                     )
 
         
-        cv2.rectangle(frame, (red_x1, red_y1), (red_x2, red_y2), (0, 0, 255), 2)
+        _annotate(frame, drawn, (red_x1, red_y1, red_x2, red_y2), (0, 0, 255))
 
         return frame
 
     except Exception as e:
         print(" process_frame error:", e)
         return frame
+
+    finally:
+        if annotations is not None:
+            annotations[:] = drawn
@@ -0,0 +1,152 @@
+"""
+Spoken alerts that never block the video loop.
+
+- every alert text is synthesized once and cached as voices/alert_<hash>.mp3
+  (the texts come from the 15 combinations of missing PPE items, so they
+  are pre-synthesized in the background at startup)
+- say() only enqueues; one audio worker thread synthesizes (on a cache
+  miss) and plays, one clip at a time
+- a text already queued or played within VOICE_REPEAT_COOLDOWN seconds is
+  skipped, and when the queue is full new alerts are dropped
+"""
+from itertools import combinations
+import asyncio, hashlib, os, queue, threading, time
+import edge_tts
+from playsound import playsound
+
+
+VOICES_DIR = os.getenv("VOICES_DIR", "voices")
+VOICE = os.getenv("VOICE_ALERT_VOICE", "ar-SA-ZariyahNeural")
+VOICE_QUEUE_SIZE = int(os.getenv("VOICE_QUEUE_SIZE", "4"))
+VOICE_REPEAT_COOLDOWN = float(os.getenv("VOICE_REPEAT_COOLDOWN", "10"))
+VOICE_PRESYNTHESIZE = os.getenv("VOICE_PRESYNTHESIZE", "1") == "1"
+
+
+def voice_path(text):
+    digest = hashlib.sha1(f"{VOICE}\n{text}".encode("utf-8")).hexdigest()[:16]
+    return os.path.join(VOICES_DIR, f"alert_{digest}.mp3")
+
+
+def synthesize(text):
+    """Path of the cached MP3 for text, generating it on first use."""
+    path = voice_path(text)
+    if os.path.exists(path):
+        return path, True
+    os.makedirs(VOICES_DIR, exist_ok=True)
+    tmp = f"{path}.{threading.get_ident()}.tmp"
+    asyncio.run(edge_tts.Communicate(text=text, voice=VOICE).save(tmp))
+    os.replace(tmp, path)
+    return path, False
+
+
+class AudioWorker:
+    def __init__(self, queue_size=VOICE_QUEUE_SIZE, cooldown=VOICE_REPEAT_COOLDOWN):
+        self.cooldown = cooldown
+        self.queued = 0
+        self.played = 0
+        self.deduped = 0
+        self.dropped = 0
+        self.cache_hits = 0
+        self.synthesized = 0
+        self.failed = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._pending = set()
+        self._last_played = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="voice-alerts", daemon=True)
+                self._thread.start()
+
+    def say(self, text):
+        """Queue text for playback; returns False if skipped. Never blocks."""
+        self._ensure_started()
+        with self._lock:
+            recent = time.monotonic() - self._last_played.get(text, float("-inf")) < self.cooldown
+            if text in self._pending or recent:
+                self.deduped += 1
+                return False
+            try:
+                self._queue.put_nowait(text)
+            except queue.Full:
+                self.dropped += 1
+                return False
+            self._pending.add(text)
+            self.queued += 1
+            return True
+
+    def _run(self):
+        while True:
+            text = self._queue.get()
+            if text is None:
+                return
+            try:
+                path, cached = synthesize(text)
+                with self._lock:
+                    if cached:
+                        self.cache_hits += 1
+                    else:
+                        self.synthesized += 1
+                playsound(path)
+                with self._lock:
+                    self.played += 1
+            except Exception as e:
+                self.failed += 1
+                print("Voice alert failed:", e)
+            finally:
+                with self._lock:
+                    self._pending.discard(text)
+                    self._last_played[text] = time.monotonic()
+
+    def shutdown(self, timeout=2.0):
+        if self._thread is not None:
+            try:
+                self._queue.put_nowait(None)
+            except queue.Full:
+                pass
+            self._thread.join(timeout)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "queued": self.queued,
+                "played": self.played,
+                "deduplicated": self.deduped,
+                "dropped_queue_full": self.dropped,
+                "cache_hits": self.cache_hits,
+                "synthesized": self.synthesized,
+                "failed": self.failed,
+                "pending": len(self._pending),
+            }
+
+
+def presynthesize(texts):
+    done = 0
+    for text in texts:
+        try:
+            synthesize(text)
+            done += 1
+        except Exception as e:
+            print(f"Cannot pre-synthesize voice alert: {e}")
+            break
+    print(f"Voice alerts ready: {done}/{len(texts)} cached.")
+
+
+def presynthesize_in_background(texts):
+    if VOICE_PRESYNTHESIZE:
+        threading.Thread(target=presynthesize, args=(list(texts),), name="voice-presynth", daemon=True).start()
+
+
+def missing_combinations(items):
+    """Every non-empty subset of items, in items order (matches how alert texts are built)."""
+    return [list(c) for n in range(1, len(items) + 1) for c in combinations(items, n)]
+
+
+audio = AudioWorker()
+
+
+def say(text):
+    return audio.say(text)
@@ -0,0 +1,89 @@
+"""
+Chat-path DB latency: sequential round trips vs. concurrent fan-out vs.
+the grouped-count RPC, on a local SQLite stand-in with simulated RTT.
+
+Run from the folder that contains Nabah/:
+    python -m Nabah.benchmarks.bench_chat_counts --rtt-ms 30 --persons 100000
+"""
+import argparse
+import time
+from datetime import datetime, timedelta, timezone
+
+from Nabah.app.utils import chat_counts
+from Nabah.benchmarks.local_db import LocalClient, build_sqlite
+
+CONTEXT_TABLES = ["alerts", "spills", "persons", "detections", "videos"]
+
+
+# SQLite translation of sql/chat_counts.sql
+def _trend_rpc(params):
+    table = params["p_table"]
+    col = chat_counts.TIME_COLUMNS[table]
+    today = datetime.fromisoformat(params["p_today"]).date()
+    t0 = f"{today}T00:00:00Z"
+    y0, y1 = f"{today - timedelta(days=1)}T00:00:00Z", f"{today - timedelta(days=1)}T23:59:59Z"
+    sql = (
+        f"select sum({col} >= ?) as today, sum({col} >= ? and {col} <= ?) as yesterday, count(*) as week "
+        f"from {table} where {col} >= ? and {col} <= ?"
+    )
+    return sql, (t0, y0, y1, f"{today - timedelta(days=7)}T00:00:00Z", f"{today}T23:59:59Z")
+
+
+def sequential_trend(client, table, today):
+    yesterday = today - timedelta(days=1)
+    week_start = today - timedelta(days=7)
+    return (
+        chat_counts.count_between(client, table, today, today),
+        chat_counts.count_between(client, table, yesterday, yesterday),
+        chat_counts.count_between(client, table, week_start, today),
+    )
+
+
+def sequential_context(client, tables, top_k):
+    return {t: chat_counts._latest(client, t, top_k) for t in tables}
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--persons", type=int, default=100_000)
+    parser.add_argument("--rtt-ms", type=float, default=30)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    conn = build_sqlite(persons=args.persons)
+    client = LocalClient(conn, rtt=args.rtt_ms / 1000, rpcs={"chat_trend_counts": _trend_rpc})
+    today = datetime.now(timezone.utc).date()
+
+    print(f"{'path':<34}{'ms':>10}{'round trips':>14}")
+
+    def run(label, fn):
+        before = client.round_trips
+        seconds, result = timed(fn, args.repeat)
+        trips = (client.round_trips - before) // args.repeat
+        print(f"{label:<34}{seconds * 1000:>10.1f}{trips:>14}")
+        return result
+
+    chat_counts.CHAT_COUNTS_RPC = False
+    seq = run("trend: sequential", lambda: sequential_trend(client, "persons", today))
+    fan = run("trend: fan-out", lambda: chat_counts.trend_counts(client, "persons", today))
+    chat_counts.CHAT_COUNTS_RPC = True
+    rpc = run("trend: grouped RPC", lambda: chat_counts.trend_counts(client, "persons", today))
+    assert seq == fan == rpc, (seq, fan, rpc)
+
+    a = run("context (5 tables): sequential", lambda: sequential_context(client, CONTEXT_TABLES, 8))
+    b = run("context (5 tables): fan-out", lambda: chat_counts.latest_rows(client, CONTEXT_TABLES, 8))
+    assert a == b
+    print(f"\ncounts (today, yesterday, week): {rpc}")
+
+
+if __name__ == "__main__":
+    main()
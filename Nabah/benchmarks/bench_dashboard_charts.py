@@ -0,0 +1,201 @@
+"""
+/api/dashboard-charts: the previous per-chart loops vs. the single-pass
+NumPy engine in utils/dashboard_charts, on synthetic rows. Also checks the
+JSON bytes are identical.
+
+Run from the folder that contains Nabah/:
+    python -m Nabah.benchmarks.bench_dashboard_charts --persons 1000000
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+import argparse
+import json
+import random
+import time
+
+from Nabah.app.utils.dashboard_charts import compute_charts
+from Nabah.benchmarks.local_db import ALERT_TYPES, synthetic_persons
+
+
+def legacy_charts(persons, alerts, spills, detections):
+    # verbatim copy of the loops get_dashboard_charts used before dashboard_charts.py
+    compliance_daily = defaultdict(lambda: [0, 0])
+    for p in persons:
+        created_at = p.get("created_at")
+        if not created_at:
+            continue
+        try:
+            day = datetime.fromisoformat(created_at.replace('Z', '+00:00')).strftime('%Y-%m-%d')
+        except ValueError:
+            continue
+        compliance_daily[day][0] += 1
+        if all([p.get("has_mask") is True, p.get("has_gloves") is True, p.get("has_labcoat") is True, p.get("has_glasses") is True]):
+            compliance_daily[day][1] += 1
+    compliance_over_time = [
+        {"day": d, "rate": round((c / t) * 100, 2) if t else 0}
+        for d, (t, c) in sorted(compliance_daily.items())
+    ]
+    total_persons_for_ppe = len(persons) or 1
+    ppe_compliance = {
+        "Mask": round(sum(1 for p in persons if p.get("has_mask") is True) / total_persons_for_ppe * 100, 2),
+        "Gloves": round(sum(1 for p in persons if p.get("has_gloves") is True) / total_persons_for_ppe * 100, 2),
+        "Labcoat": round(sum(1 for p in persons if p.get("has_labcoat") is True) / total_persons_for_ppe * 100, 2),
+        "Glasses": round(sum(1 for p in persons if p.get("has_glasses") is True) / total_persons_for_ppe * 100, 2)
+    }
+    zone_events = {"Red Zone": 0, "Other": 0}
+    for p in persons:
+        if str(p.get("status", "")).lower() == "unsafe":
+            if p.get("in_red_zone") is True:
+                zone_events["Red Zone"] += 1
+            else:
+                zone_events["Other"] += 1
+    incident_types = defaultdict(int)
+    for a in alerts:
+        incident_types[a.get("alert_type", "Unknown")] += 1
+    shift_buckets = {"Morning": [0, 0], "Evening": [0, 0], "Night": [0, 0]}
+    for p in persons:
+        created_at = p.get("created_at")
+        if not created_at:
+            continue
+        try:
+            hour = datetime.fromisoformat(created_at.replace('Z', '+00:00')).hour
+        except ValueError:
+            continue
+        if 8 <= hour < 16:
+            shift = "Morning"
+        elif 16 <= hour < 24:
+            shift = "Evening"
+        else:
+            shift = "Night"
+        shift_buckets[shift][0] += 1
+        if all([p.get("has_mask") is True, p.get("has_gloves") is True, p.get("has_labcoat") is True, p.get("has_glasses") is True]):
+            shift_buckets[shift][1] += 1
+    shift_compliance = {s: round((c / t) * 100, 2) if t else 0 for s, (t, c) in shift_buckets.items()}
+    unsafe_ratio_daily = defaultdict(lambda: [0, 0])
+    for p in persons:
+        created_at = p.get("created_at")
+        if not created_at:
+            continue
+        try:
+            day = datetime.fromisoformat(created_at.replace('Z', '+00:00')).strftime('%Y-%m-%d')
+        except ValueError:
+            continue
+        unsafe_ratio_daily[day][0] += 1
+        if str(p.get("status", "")).lower() == "unsafe":
+            unsafe_ratio_daily[day][1] += 1
+    unsafe_ratio = {d: round((unsafe / total) * 100, 2) if total else 0 for d, (total, unsafe) in sorted(unsafe_ratio_daily.items())}
+    violation_counts = {"Mask": 0, "Gloves": 0, "Labcoat": 0, "Glasses": 0}
+    for p in persons:
+        if str(p.get("status", "")).lower() == "unsafe":
+            if not p.get("has_mask"): violation_counts["Mask"] += 1
+            if not p.get("has_gloves"): violation_counts["Gloves"] += 1
+            if not p.get("has_labcoat"): violation_counts["Labcoat"] += 1
+            if not p.get("has_glasses"): violation_counts["Glasses"] += 1
+    alert_type_counts = defaultdict(int)
+    for a in alerts:
+        alert_type_counts[a.get("alert_type", "Unknown")] += 1
+    spills_per_day = defaultdict(int)
+    for s in spills:
+        ts = s.get("detected_at") or s.get("created_at")
+        if not ts:
+            continue
+        try:
+            day = datetime.fromisoformat(ts.replace('Z', '+00:00')).strftime('%Y-%m-%d')
+            spills_per_day[day] += 1
+        except ValueError:
+            continue
+    ppe_histogram = {
+        "Fully Safe": sum(1 for p in persons if p["status"] == "safe"),
+        "Unsafe": sum(1 for p in persons if p["status"] == "unsafe"),
+    }
+    avg_ppe_items = round(sum([
+        int(p.get("has_mask", 0)) + int(p.get("has_gloves", 0)) + int(p.get("has_labcoat", 0)) + int(p.get("has_glasses", 0))
+        for p in persons
+    ]) / max(len(persons), 1), 2)
+    unsafe_trend = defaultdict(lambda: [0, 0])
+    for p in persons:
+        ts = p.get("created_at")
+        if not ts:
+            continue
+        try:
+            day = datetime.fromisoformat(ts.replace('Z', '+00:00')).strftime('%Y-%m-%d')
+        except ValueError:
+            continue
+        unsafe_trend[day][0] += 1
+        if str(p.get("status", "")).lower() == "unsafe":
+            unsafe_trend[day][1] += 1
+    unsafe_over_time = [{"day": d, "unsafe_rate": round((u / t) * 100, 2) if t else 0} for d, (t, u) in sorted(unsafe_trend.items())]
+    total_persons = len(persons) or 1
+    ppe_missing_ratio = {
+        "Mask": round(sum(1 for p in persons if not p.get("has_mask")) / total_persons * 100, 2),
+        "Gloves": round(sum(1 for p in persons if not p.get("has_gloves")) / total_persons * 100, 2),
+        "Labcoat": round(sum(1 for p in persons if not p.get("has_labcoat")) / total_persons * 100, 2),
+        "Glasses": round(sum(1 for p in persons if not p.get("has_glasses")) / total_persons * 100, 2),
+    }
+    alerts_daily = defaultdict(int)
+    for a in alerts:
+        ts = a.get("created_at")
+        if not ts:
+            continue
+        try:
+            day = datetime.fromisoformat(ts.replace('Z', '+00:00')).strftime('%Y-%m-%d')
+            alerts_daily[day] += 1
+        except ValueError:
+            continue
+    conf_by_class = defaultdict(list)
+    for d in detections:
+        if d.get("class_name") and d.get("confidence") is not None:
+            conf_by_class[d["class_name"]].append(float(d["confidence"]))
+    avg_confidence = {k: round(sum(v) / len(v), 2) for k, v in conf_by_class.items() if v}
+    return {
+        "compliance_over_time": compliance_over_time, "ppe_compliance": ppe_compliance,
+        "zone_events": zone_events, "incident_types": incident_types,
+        "shift_compliance": shift_compliance, "unsafe_ratio": unsafe_ratio,
+        "violation_counts": violation_counts, "alert_type_counts": alert_type_counts,
+        "spills_per_day": spills_per_day, "ppe_histogram": ppe_histogram,
+        "avg_ppe_items": avg_ppe_items, "unsafe_over_time": unsafe_over_time,
+        "ppe_missing_ratio": ppe_missing_ratio, "alerts_daily": alerts_daily,
+        "avg_confidence": avg_confidence,
+    }
+
+
+def render(content):
+    # same settings as starlette's JSONResponse
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def synthetic(n, seed=7):
+    rnd = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    persons = list(synthetic_persons(n, seed=seed))
+    ts = lambda: (now - timedelta(seconds=rnd.randrange(90 * 86400))).isoformat()
+    alerts = [{"alert_type": rnd.choice(ALERT_TYPES), "created_at": ts()} for _ in range(n // 20)]
+    spills = [{"detected_at": ts(), "confidence": rnd.random()} for _ in range(n // 200)]
+    detections = [{"class_name": rnd.choice(["mask", "gloves", "spill"]), "confidence": rnd.random()} for _ in range(n // 10)]
+    return persons, alerts, spills, detections
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--persons", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    data = synthetic(args.persons)
+
+    t = time.perf_counter()
+    old = render(legacy_charts(*data))
+    old_t = time.perf_counter() - t
+
+    t = time.perf_counter()
+    new = render(compute_charts(*data))
+    new_t = time.perf_counter() - t
+
+    print(f"persons: {args.persons}")
+    print(f"legacy loops:   {old_t:.2f}s")
+    print(f"single pass:    {new_t:.2f}s")
+    print(f"speedup:        {old_t / new_t:.2f}x")
+    print(f"byte-identical: {old == new}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+/api/dashboard-stats: fetch-everything-and-count-in-Python vs. one
+aggregate scan vs. reading the hourly rollups, on a local SQLite stand-in.
+The rollup path should stay flat as the persons table grows.
+
+Run from the folder that contains Nabah/:
+    python -m Nabah.benchmarks.bench_dashboard_stats --sizes 10000 100000 1000000
+"""
+import argparse
+import time
+
+from Nabah.app.utils.dashboard_stats import stats_from_rows
+from Nabah.benchmarks.local_db import build_sqlite, rows
+
+# SQLite translation of sql/dashboard_stats.sql
+STATS_SQL = """
+select
+  (select count(*) from persons) as persons_count,
+  (select count(*) from alerts) as alerts_count,
+  (select count(*) from spills) as spills_count,
+  (select count(*) from videos) as videos_count,
+  (select case when count(*) > 0 then round(
+      sum(has_mask = 1 and has_gloves = 1 and has_labcoat = 1 and has_glasses = 1) * 100.0 / count(*), 2)
+    else 0 end from persons) as compliance_rate,
+  (select count(distinct substr(created_at, 1, 13)) from persons) as active_hours
+"""
+
+
+# SQLite translation of rebuild_rollups() (the columns dashboard_stats() reads)
+ROLLUP_BUILD_SQL = """
+create table rollup_hourly (bucket text primary key, persons_total int default 0, persons_safe int default 0, spills int default 0);
+create table rollup_alert_types (alert_type text primary key, total int default 0);
+insert into rollup_hourly (bucket, persons_total, persons_safe)
+  select substr(created_at, 1, 13), count(*),
+         sum(has_mask = 1 and has_gloves = 1 and has_labcoat = 1 and has_glasses = 1)
+  from persons where created_at is not null group by 1;
+insert into rollup_hourly (bucket, spills)
+  select substr(detected_at, 1, 13), count(*) from spills where detected_at is not null group by 1
+  on conflict (bucket) do update set spills = spills + excluded.spills;
+insert into rollup_alert_types select coalesce(alert_type, 'Unknown'), count(*) from alerts group by 1;
+"""
+
+# SQLite translation of dashboard_stats() in sql/dashboard_stats.sql
+ROLLUP_STATS_SQL = """
+select
+  h.total as persons_count,
+  (select coalesce(sum(total), 0) from rollup_alert_types) as alerts_count,
+  h.spills as spills_count,
+  (select count(*) from videos) as videos_count,
+  case when h.total > 0 then round(h.safe * 100.0 / h.total, 2) else 0 end as compliance_rate,
+  h.hours as active_hours
+from (
+  select coalesce(sum(persons_total), 0) as total, coalesce(sum(persons_safe), 0) as safe,
+         coalesce(sum(spills), 0) as spills, sum(persons_total > 0) as hours
+  from rollup_hourly
+) h
+"""
+
+
+def python_path(conn):
+    persons = rows(conn, "select has_mask, has_gloves, has_labcoat, has_glasses, created_at, status, in_red_zone from persons")
+    alerts = rows(conn, "select alert_type from alerts")
+    spills = rows(conn, "select * from spills")
+    videos = rows(conn, "select * from videos")
+    return stats_from_rows(persons, len(alerts), len(spills), len(videos))
+
+
+def sql_path(conn):
+    return rows(conn, STATS_SQL)[0]
+
+
+def rollup_path(conn):
+    return rows(conn, ROLLUP_STATS_SQL)[0]
+
+
+def timed(fn, conn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t = time.perf_counter()
+        out = fn(conn)
+        best = min(best, time.perf_counter() - t)
+    return out, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'persons':>10}{'python ms':>12}{'scan ms':>10}{'rollup ms':>11}  match")
+    for n in args.sizes:
+        conn = build_sqlite(n)
+        conn.executescript(ROLLUP_BUILD_SQL)
+        py, py_t = timed(python_path, conn, args.repeat)
+        sq, sq_t = timed(sql_path, conn, args.repeat)
+        ru, ru_t = timed(rollup_path, conn, args.repeat)
+        match = all(abs(float(py[k]) - float(sq[k])) < 1e-6 and abs(float(py[k]) - float(ru[k])) < 1e-6 for k in py)
+        print(f"{n:>10}{py_t * 1000:>12.1f}{sq_t * 1000:>10.1f}{ru_t * 1000:>11.2f}  {match}")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
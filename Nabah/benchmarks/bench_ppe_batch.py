@@ -0,0 +1,73 @@
+"""
+Benchmark: batched PPE stage vs. the old sequential per-person calls.
+
+Run from the folder that contains Nabah/:
+    python -m Nabah.benchmarks.bench_ppe_batch --video sample.mp4 --frames 200
+"""
+import argparse
+import os
+import time
+
+# CPU numbers are what we care about on the lab boxes.
+os.environ.setdefault("CUDA_VISIBLE_DEVICES", "")
+
+import cv2
+from Nabah.app.utils import video_utils
+
+
+def read_frames(path, limit):
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise FileNotFoundError(f"Cannot open video: {path}")
+    frames = []
+    while len(frames) < limit:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+def run(frames, models, ppe_fn, conf):
+    verdicts = []
+    start = time.perf_counter()
+    for frame in frames:
+        _, crops = video_utils.detect_persons(frame, models["person"], conf=conf)
+        verdicts.append(ppe_fn(crops, models))
+    elapsed = time.perf_counter() - start
+    return verdicts, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--video", required=True)
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--conf", type=float, default=0.5)
+    args = parser.parse_args()
+
+    frames = read_frames(args.video, args.frames)
+    models = video_utils.load_models_by_type("ppe")
+
+    # warm-up so the first call's graph setup doesn't skew either path
+    run(frames[:2], models, video_utils.detect_ppe_batch, args.conf)
+    run(frames[:2], models, video_utils.detect_ppe_sequential, args.conf)
+
+    seq, seq_t = run(frames, models, video_utils.detect_ppe_sequential, args.conf)
+    bat, bat_t = run(frames, models, video_utils.detect_ppe_batch, args.conf)
+
+    persons = sum(len(v) for v in seq)
+    mismatches = sum(
+        1 for a_frame, b_frame in zip(seq, bat)
+        for a, b in zip(a_frame, b_frame) if a != b
+    )
+
+    print(f"frames: {len(frames)}  persons: {persons}")
+    print(f"sequential: {len(frames) / seq_t:.2f} fps  ({seq_t:.2f}s)")
+    print(f"batched:    {len(frames) / bat_t:.2f} fps  ({bat_t:.2f}s)")
+    print(f"speedup:    {seq_t / bat_t:.2f}x")
+    print(f"per-person verdict mismatches: {mismatches}/{persons}")
+
+
+if __name__ == "__main__":
+    main()
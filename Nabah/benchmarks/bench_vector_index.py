@@ -0,0 +1,74 @@
+"""
+Local IVF index vs. brute force: recall@k and per-query latency over
+synthetic clustered embeddings, plus snapshot / memmap load time.
+
+Run from the folder that contains Nabah/:
+    python -m Nabah.benchmarks.bench_vector_index --docs 100000 --dim 384 --nprobe 4 8 16 32
+"""
+import argparse
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from Nabah.app.utils.vector_index import VectorIndex, normalize
+
+
+def synthetic(n, dim, topics=500, noise=0.5, seed=3):
+    # documents cluster around topics, like rows rendered from the same table/template
+    rng = np.random.default_rng(seed)
+    centers = normalize(rng.standard_normal((topics, dim)))
+    labels = rng.integers(0, topics, n)
+    return normalize(centers[labels] + noise * rng.standard_normal((n, dim)).astype(np.float32) / np.sqrt(dim) * 4)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=8)
+    parser.add_argument("--nlist", type=int, default=256)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 8, 16, 32])
+    parser.add_argument("--noise", type=float, default=0.5, help="spread around each topic (higher = harder)")
+    args = parser.parse_args()
+
+    vectors = synthetic(args.docs + args.queries, args.dim, noise=args.noise)
+    docs, queries = vectors[:args.docs], vectors[args.docs:]
+    index = VectorIndex(args.dim, nlist=args.nlist)
+
+    t = time.perf_counter()
+    index.add([{"id": i, "text": f"doc {i}"} for i in range(args.docs)], docs)
+    print(f"build: {args.docs} docs in {time.perf_counter() - t:.2f}s ({index.stats()['cells']} cells)")
+
+    t = time.perf_counter()
+    truth = [{d["id"] for _, d in index.brute_force(q, args.k)} for q in queries]
+    brute_ms = (time.perf_counter() - t) / args.queries * 1000
+
+    print(f"\n{'search':<16}{'ms/query':>10}{'recall@' + str(args.k):>12}")
+    print(f"{'brute force':<16}{brute_ms:>10.2f}{1.0:>12.3f}")
+    for nprobe in args.nprobe:
+        t = time.perf_counter()
+        found = [{d["id"] for _, d in index.search(q, args.k, nprobe=nprobe)} for q in queries]
+        ms = (time.perf_counter() - t) / args.queries * 1000
+        recall = np.mean([len(f & g) / args.k for f, g in zip(found, truth)])
+        print(f"{'ivf nprobe=' + str(nprobe):<16}{ms:>10.2f}{recall:>12.3f}")
+
+    folder = tempfile.mkdtemp()
+    try:
+        path = f"{folder}/index"
+        t = time.perf_counter()
+        index.snapshot(path)
+        saved = time.perf_counter() - t
+        t = time.perf_counter()
+        loaded = VectorIndex.load(path)
+        load_s = time.perf_counter() - t
+        same = [d["id"] for _, d in loaded.search(queries[0], args.k)] == [d["id"] for _, d in index.search(queries[0], args.k)]
+        print(f"\nsnapshot {saved:.2f}s, load (memmap) {load_s:.2f}s, same results after load: {same}")
+    finally:
+        shutil.rmtree(folder)
+
+
+if __name__ == "__main__":
+    main()
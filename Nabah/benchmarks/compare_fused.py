@@ -0,0 +1,73 @@
+"""
+Accuracy / latency comparison: fused multi-class PPE detector vs. the
+four separate per-item models.
+
+The separate models are treated as the reference, so "accuracy" here is
+per-item agreement (plus precision / recall of the fused detector against
+the reference verdicts) on the same person boxes.
+
+Run from the folder that contains Nabah/:
+    python -m Nabah.benchmarks.compare_fused --video sample.mp4 --frames 200
+"""
+import argparse
+import os
+import time
+
+os.environ.setdefault("CUDA_VISIBLE_DEVICES", "")
+
+from Nabah.app.utils import video_utils
+from Nabah.benchmarks.bench_ppe_batch import read_frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--video", required=True)
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--conf", type=float, default=0.5)
+    args = parser.parse_args()
+
+    frames = read_frames(args.video, args.frames)
+    separate = video_utils.load_models_by_type("ppe", "separate")
+    fused = video_utils.load_models_by_type("ppe", "fused")
+    if "ppe_fused" not in fused:
+        raise SystemExit("Fused weights not found, nothing to compare.")
+
+    sep_t = fused_t = 0.0
+    stats = {item: {"tp": 0, "fp": 0, "fn": 0, "tn": 0} for item in video_utils.PPE_ITEMS}
+    persons = 0
+
+    for frame in frames:
+        boxes, crops = video_utils.detect_persons(frame, separate["person"], conf=args.conf)
+        persons += len(boxes)
+
+        t0 = time.perf_counter()
+        ref = video_utils.detect_ppe_batch(crops, separate)
+        t1 = time.perf_counter()
+        got = video_utils.detect_ppe_fused(frame, boxes, fused["ppe_fused"])
+        t2 = time.perf_counter()
+        sep_t += t1 - t0
+        fused_t += t2 - t1
+
+        for r, g in zip(ref, got):
+            for item in video_utils.PPE_ITEMS:
+                key = f"has_{item}"
+                cell = ("t" if r[key] == g[key] else "f") + ("p" if g[key] else "n")
+                stats[item][cell] += 1
+
+    n = max(len(frames), 1)
+    print(f"frames: {len(frames)}  persons: {persons}")
+    print(f"separate PPE stage: {sep_t / n * 1000:.1f} ms/frame")
+    print(f"fused PPE stage:    {fused_t / n * 1000:.1f} ms/frame")
+    print()
+    print(f"{'item':<10}{'agree':>8}{'prec':>8}{'recall':>8}")
+    for item, s in stats.items():
+        total = max(sum(s.values()), 1)
+        agree = (s["tp"] + s["tn"]) / total
+        prec = s["tp"] / max(s["tp"] + s["fp"], 1)
+        # a false negative of the fused model is a person the reference marked "has"
+        recall = s["tp"] / max(s["tp"] + s["fn"], 1)
+        print(f"{item:<10}{agree:>8.3f}{prec:>8.3f}{recall:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
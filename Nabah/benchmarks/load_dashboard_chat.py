@@ -0,0 +1,128 @@
+"""
+p50/p99 latency of dashboard requests while chat questions are in flight.
+
+Default mode runs in-process: a small app whose handlers block for the
+given DB / LLM latencies, once calling the blocking client straight from
+the async route (the old code) and once through db_executor.
+
+    python -m Nabah.benchmarks.load_dashboard_chat --clients 50 --requests 20
+
+--url targets a running server instead (real /api/dashboard-* and /api/db-chat):
+
+    python -m Nabah.benchmarks.load_dashboard_chat --url http://127.0.0.1:8000
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+from fastapi import FastAPI
+
+from Nabah.app.utils.db_executor import run_db, run_llm
+
+
+def build_app(db_ms, llm_ms, pooled):
+    app = FastAPI()
+
+    def query():
+        time.sleep(db_ms / 1000)
+        return {"ok": True}
+
+    def chat():
+        time.sleep(llm_ms / 1000)
+        return {"answer": "ok"}
+
+    if pooled:
+        @app.get("/api/dashboard-stats")
+        async def stats():
+            return await run_db(query)
+
+        @app.post("/api/db-chat")
+        async def db_chat():
+            return await run_llm(chat)
+    else:
+        @app.get("/api/dashboard-stats")
+        async def stats():
+            return query()
+
+        @app.post("/api/db-chat")
+        async def db_chat():
+            return chat()
+
+    return app
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(q * len(values)))] * 1000, 1)
+
+
+async def client_loop(client, path, method, n, interval, out):
+    # open loop: latency counts from when the request was due, so time spent
+    # waiting for a blocked event loop is included
+    start = time.perf_counter()
+    for k in range(n):
+        due = start + k * interval
+        await asyncio.sleep(max(0.0, due - time.perf_counter()))
+        if method == "POST":
+            r = await client.post(path, json={"question": "how many alerts this week?"})
+        else:
+            r = await client.get(path)
+        r.raise_for_status()
+        out.append(time.perf_counter() - due)
+
+
+async def run_load(client, clients, requests, interval, chat_clients, dashboard_paths):
+    latencies = {p: [] for p in dashboard_paths}
+    latencies["/api/db-chat"] = []
+    tasks = []
+    for i in range(clients):
+        path = dashboard_paths[i % len(dashboard_paths)]
+        tasks.append(client_loop(client, path, "GET", requests, interval, latencies[path]))
+    tasks += [
+        client_loop(client, "/api/db-chat", "POST", max(1, requests // 10), interval * 10, latencies["/api/db-chat"])
+        for _ in range(chat_clients)
+    ]
+    t = time.perf_counter()
+    await asyncio.gather(*tasks)
+    wall = time.perf_counter() - t
+    return wall, latencies
+
+
+def report(label, wall, latencies):
+    print(f"\n{label}  (wall {wall:.2f}s)")
+    print(f"{'endpoint':<24}{'n':>6}{'p50 ms':>10}{'p99 ms':>10}")
+    for path, values in latencies.items():
+        print(f"{path:<24}{len(values):>6}{percentile(values, 0.5):>10}{percentile(values, 0.99):>10}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="base URL of a running server")
+    parser.add_argument("--clients", type=int, default=50, help="concurrent dashboard clients")
+    parser.add_argument("--chat-clients", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=20, help="requests per dashboard client")
+    parser.add_argument("--interval", type=float, default=0.25, help="seconds between a client's requests")
+    parser.add_argument("--db-ms", type=float, default=40, help="simulated query latency")
+    parser.add_argument("--llm-ms", type=float, default=1500, help="simulated chat latency")
+    args = parser.parse_args()
+
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url, timeout=120) as client:
+            wall, lat = await run_load(client, args.clients, args.requests, args.interval, args.chat_clients,
+                                       ["/api/dashboard-stats", "/api/dashboard-charts"])
+        report(args.url, wall, lat)
+        return
+
+    for pooled in (False, True):
+        app = build_app(args.db_ms, args.llm_ms, pooled)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            wall, lat = await run_load(client, args.clients, args.requests, args.interval, args.chat_clients, ["/api/dashboard-stats"])
+        report("db_executor" if pooled else "blocking client in async route", wall, lat)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
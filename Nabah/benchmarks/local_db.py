@@ -0,0 +1,190 @@
+"""
+SQLite stand-in for the Supabase tables, filled with synthetic rows.
+Shared by the dashboard / chat benchmarks.
+"""
+from datetime import datetime, timedelta, timezone
+import random
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+create table persons (
+    id integer primary key, video_id integer, track_id integer, frame_number integer,
+    has_mask boolean, has_gloves boolean, has_labcoat boolean, has_glasses boolean,
+    in_red_zone boolean, status text, created_at text
+);
+create table alerts (id integer primary key, person_id integer, alert_type text, reason text, created_at text);
+create table spills (id integer primary key, video_id integer, frame_path text, bbox text, confidence real, detected_at text);
+create table videos (id integer primary key, video_name text, title text, uploaded_by text, uploaded_at text);
+create table detections (id integer primary key, class_name text, confidence real, bbox text, frame_path text, detected_at text);
+create index persons_created_at_idx on persons (created_at);
+create index alerts_created_at_idx on alerts (created_at);
+"""
+
+ALERT_TYPES = ["PPE Violation", "ppe_violation", "Red Zone", "Spill"]
+
+
+def synthetic_persons(n, days=90, seed=7):
+    rnd = random.Random(seed)
+    start = datetime.now(timezone.utc) - timedelta(days=days)
+    span = days * 86400
+    for i in range(n):
+        flags = [rnd.random() < 0.85 for _ in range(4)]
+        yield {
+            "id": i + 1,
+            "video_id": rnd.randint(1, 50),
+            "track_id": rnd.randint(1, 5000),
+            "frame_number": rnd.randint(1, 9000),
+            "has_mask": flags[0],
+            "has_gloves": flags[1],
+            "has_labcoat": flags[2],
+            "has_glasses": flags[3],
+            "in_red_zone": rnd.random() < 0.1,
+            "status": "safe" if all(flags) else "unsafe",
+            "created_at": (start + timedelta(seconds=rnd.randrange(span))).isoformat(),
+        }
+
+
+def build_sqlite(persons=100_000, alerts=None, spills=None, videos=50, path=":memory:", seed=7):
+    rnd = random.Random(seed)
+    alerts = persons // 20 if alerts is None else alerts
+    spills = persons // 200 if spills is None else spills
+    now = datetime.now(timezone.utc)
+
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.executescript(SCHEMA)
+    conn.executemany(
+        "insert into persons values (:id, :video_id, :track_id, :frame_number, :has_mask, :has_gloves, "
+        ":has_labcoat, :has_glasses, :in_red_zone, :status, :created_at)",
+        synthetic_persons(persons, seed=seed),
+    )
+    conn.executemany(
+        "insert into alerts (person_id, alert_type, reason, created_at) values (?, ?, ?, ?)",
+        ((None, rnd.choice(ALERT_TYPES), "synthetic", (now - timedelta(seconds=rnd.randrange(90 * 86400))).isoformat())
+         for _ in range(alerts)),
+    )
+    conn.executemany(
+        "insert into spills (video_id, frame_path, bbox, confidence, detected_at) values (?, ?, ?, ?, ?)",
+        ((rnd.randint(1, videos), "processed_frame", "{}", rnd.random(), (now - timedelta(seconds=rnd.randrange(90 * 86400))).isoformat())
+         for _ in range(spills)),
+    )
+    conn.executemany(
+        "insert into videos (video_name, title, uploaded_at) values (?, ?, ?)",
+        ((f"video_{i}.mp4", "Synthetic", now.isoformat()) for i in range(videos)),
+    )
+    conn.commit()
+    return conn
+
+
+def rows(conn, sql, params=()):
+    cur = conn.execute(sql, params)
+    cols = [c[0] for c in cur.description]
+    out = []
+    for r in cur.fetchall():
+        row = dict(zip(cols, r))
+        for k in ("has_mask", "has_gloves", "has_labcoat", "has_glasses", "in_red_zone"):
+            if k in row and row[k] is not None:
+                row[k] = bool(row[k])
+        out.append(row)
+    return out
+
+
+class _Result:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+class _Query:
+    def __init__(self, client, table):
+        self.client = client
+        self.table = table
+        self.columns = "*"
+        self.count = None
+        self.where = []
+        self.params = []
+        self.order_by = []
+        self.limit_n = None
+
+    def select(self, columns="*", count=None):
+        self.columns = columns
+        self.count = count
+        return self
+
+    def eq(self, col, value):
+        self.where.append(f"{col} = ?")
+        self.params.append(value)
+        return self
+
+    def gte(self, col, value):
+        self.where.append(f"{col} >= ?")
+        self.params.append(value)
+        return self
+
+    def lte(self, col, value):
+        self.where.append(f"{col} <= ?")
+        self.params.append(value)
+        return self
+
+    def order(self, col, desc=False):
+        self.order_by.append(f"{col} {'desc' if desc else 'asc'}")
+        return self
+
+    def limit(self, n):
+        self.limit_n = n
+        return self
+
+    def execute(self):
+        where = f" where {' and '.join(self.where)}" if self.where else ""
+        sql = f"select {self.columns} from {self.table}{where}"
+        if self.order_by:
+            sql += " order by " + ", ".join(self.order_by)
+        if self.limit_n is not None:
+            sql += f" limit {int(self.limit_n)}"
+        if self.count == "exact":
+            # PostgREST returns the count with the rows: still one round trip
+            data, count = self.client.query([sql, f"select count(*) as n from {self.table}{where}"], self.params)
+            return _Result(data, count[0]["n"])
+        return _Result(self.client.query(sql, self.params))
+
+
+class _Rpc:
+    def __init__(self, client, sql, params):
+        self.client, self.sql, self.params = client, sql, params
+
+    def execute(self):
+        return _Result(self.client.query(self.sql, self.params))
+
+
+class LocalClient:
+    """
+    The subset of the Supabase client the chat path uses, over SQLite.
+    Each execute() sleeps `rtt` seconds (outside the DB lock) to stand in
+    for the network round trip. `rpcs` maps an RPC name to a function
+    (params) -> (sql, sql_params).
+    """
+
+    def __init__(self, conn, rtt=0.03, rpcs=None):
+        self.conn = conn
+        self.rtt = rtt
+        self.rpcs = rpcs or {}
+        self.round_trips = 0
+        self._lock = threading.Lock()
+
+    def query(self, sql, params=()):
+        """One round trip; a list of statements returns a list of results."""
+        time.sleep(self.rtt)
+        with self._lock:
+            self.round_trips += 1
+            if isinstance(sql, list):
+                return [rows(self.conn, s, params) for s in sql]
+            return rows(self.conn, sql, params)
+
+    def table(self, name):
+        return _Query(self, name)
+
+    def rpc(self, name, params):
+        if name not in self.rpcs:
+            raise RuntimeError(f"function {name} does not exist")
+        return _Rpc(self, *self.rpcs[name](params))
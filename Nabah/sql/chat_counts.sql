@@ -0,0 +1,36 @@
+-- Grouped counts for the chat's trend answers: today, yesterday and the
+-- last 7 days in one range scan instead of three count queries.
+-- Bounds match chat_counts.count_between (00:00:00Z .. 23:59:59Z).
+
+create or replace function chat_trend_counts(p_table text, p_today date)
+returns table (today bigint, yesterday bigint, week bigint)
+language plpgsql stable
+as $$
+declare
+  col text;
+  t0 timestamptz := p_today::timestamp at time zone 'UTC';
+begin
+  col := case p_table
+    when 'persons' then 'created_at'
+    when 'alerts' then 'created_at'
+    when 'spills' then 'detected_at'
+  end;
+  if col is null then
+    raise exception 'chat_trend_counts: unsupported table %', p_table;
+  end if;
+
+  return query execute format(
+    'select
+       count(*) filter (where %1$I >= $1),
+       count(*) filter (where %1$I >= $2 and %1$I <= $3),
+       count(*)
+     from %2$I
+     where %1$I >= $4 and %1$I <= $5',
+    col, p_table)
+  using t0,
+        t0 - interval '1 day', t0 - interval '1 second',
+        t0 - interval '7 days', t0 + interval '23:59:59';
+end;
+$$;
+
+create index if not exists spills_detected_at_idx on spills (detected_at);
@@ -0,0 +1,68 @@
+-- KPIs for /api/dashboard-stats, computed inside Postgres so the API never
+-- pulls whole tables. Run once in the Supabase SQL editor, after
+-- rollups.sql (and `select rebuild_rollups();` to backfill).
+--
+-- dashboard_stats() reads the maintained rollups, so its cost depends on
+-- the number of hourly buckets, not on the number of person rows.
+-- dashboard_stats_scan() is the raw-table version; it is used only while
+-- the rollups are still empty.
+
+create index if not exists persons_created_at_idx on persons (created_at);
+
+create or replace function dashboard_stats_scan()
+returns json
+language sql
+stable
+as $$
+  select json_build_object(
+    'persons_count', p.total,
+    'alerts_count', (select count(*) from alerts),
+    'spills_count', (select count(*) from spills),
+    'videos_count', (select count(*) from videos),
+    'compliance_rate', case when p.total > 0 then round(p.safe * 100.0 / p.total, 2) else 0 end,
+    'active_hours', p.hours
+  )
+  from (
+    select
+      count(*) as total,
+      count(*) filter (
+        where has_mask is true and has_gloves is true
+          and has_labcoat is true and has_glasses is true
+      ) as safe,
+      count(distinct date_trunc('hour', created_at)) as hours
+    from persons
+  ) p;
+$$;
+
+create or replace function dashboard_stats()
+returns json
+language plpgsql
+stable
+as $$
+declare
+  result json;
+begin
+  -- rollups not backfilled yet: answer from the raw tables instead of zeros
+  if not exists (select 1 from rollup_hourly) and exists (select 1 from persons) then
+    return dashboard_stats_scan();
+  end if;
+
+  select json_build_object(
+    'persons_count', h.total,
+    'alerts_count', (select coalesce(sum(total), 0) from rollup_alert_types),
+    'spills_count', h.spills,
+    'videos_count', (select count(*) from videos),
+    'compliance_rate', case when h.total > 0 then round(h.safe * 100.0 / h.total, 2) else 0 end,
+    'active_hours', h.hours
+  ) into result
+  from (
+    select
+      coalesce(sum(persons_total), 0) as total,
+      coalesce(sum(persons_safe), 0) as safe,
+      coalesce(sum(spills), 0) as spills,
+      count(*) filter (where persons_total > 0) as hours
+    from rollup_hourly
+  ) h;
+  return result;
+end;
+$$;
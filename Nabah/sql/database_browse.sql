@@ -0,0 +1,14 @@
+-- Keyset indexes for /api/database/{table}: every page is an index range
+-- scan on (time column, id), however deep the cursor is.
+
+create index if not exists persons_browse_idx on persons (created_at desc, id desc);
+create index if not exists alerts_browse_idx on alerts (created_at desc, id desc);
+create index if not exists spills_browse_idx on spills (detected_at desc, id desc);
+create index if not exists videos_browse_idx on videos (uploaded_at desc, id desc);
+create index if not exists detections_browse_idx on detections (detected_at desc, id desc);
+create index if not exists clips_browse_idx on clips (created_at desc, id desc);
+
+create index if not exists persons_status_idx on persons (status, created_at desc, id desc);
+create index if not exists persons_video_idx on persons (video_id, created_at desc, id desc);
+create index if not exists alerts_type_idx on alerts (alert_type, created_at desc, id desc);
+create index if not exists spills_video_idx on spills (video_id, detected_at desc, id desc);
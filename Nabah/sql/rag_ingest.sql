@@ -0,0 +1,26 @@
+-- Incremental RAG ingestion (utils/rag_ingest.py).
+-- Documents are keyed by their source row so re-ingesting is an upsert,
+-- and each source table keeps a watermark of the last row processed.
+
+create extension if not exists vector;
+
+create table if not exists documents_rag (
+  id bigserial primary key,
+  table_name text not null,
+  text text not null,
+  embedding vector not null
+);
+
+alter table documents_rag add column if not exists source_id bigint;
+alter table documents_rag add column if not exists source_time timestamptz;
+alter table documents_rag add column if not exists updated_at timestamptz default now();
+
+create unique index if not exists documents_rag_source_idx on documents_rag (table_name, source_id);
+
+create table if not exists rag_ingest_state (
+  source text primary key,
+  last_id bigint not null default 0,
+  last_time timestamptz,
+  documents bigint not null default 0,
+  updated_at timestamptz not null default now()
+);
@@ -0,0 +1,219 @@
+-- Pre-aggregated buckets behind /api/dashboard-charts and dashboard_stats().
+-- Insert triggers on persons / alerts / spills / detections keep them
+-- current; rebuild_rollups() recomputes everything from the raw tables
+-- (backfill, or schedule it with pg_cron as a periodic compactor).
+
+create table if not exists rollup_hourly (
+  bucket timestamptz primary key,
+  persons_total bigint not null default 0,
+  persons_safe bigint not null default 0,       -- all four PPE items present
+  persons_unsafe bigint not null default 0,     -- status = unsafe
+  status_safe bigint not null default 0,        -- status = safe
+  unsafe_red bigint not null default 0,         -- unsafe and in the red zone
+  has_mask bigint not null default 0,
+  has_gloves bigint not null default 0,
+  has_labcoat bigint not null default 0,
+  has_glasses bigint not null default 0,
+  unsafe_no_mask bigint not null default 0,
+  unsafe_no_gloves bigint not null default 0,
+  unsafe_no_labcoat bigint not null default 0,
+  unsafe_no_glasses bigint not null default 0,
+  alerts bigint not null default 0,
+  spills bigint not null default 0
+);
+
+create table if not exists rollup_alert_types (
+  alert_type text primary key,
+  total bigint not null default 0
+);
+
+create table if not exists rollup_detection_conf (
+  class_name text primary key,
+  total bigint not null default 0,
+  conf_sum double precision not null default 0
+);
+
+create or replace view rollup_daily as
+  select (bucket at time zone 'utc')::date as day,
+         sum(persons_total) as persons_total, sum(persons_safe) as persons_safe,
+         sum(persons_unsafe) as persons_unsafe, sum(status_safe) as status_safe,
+         sum(unsafe_red) as unsafe_red,
+         sum(has_mask) as has_mask, sum(has_gloves) as has_gloves,
+         sum(has_labcoat) as has_labcoat, sum(has_glasses) as has_glasses,
+         sum(unsafe_no_mask) as unsafe_no_mask, sum(unsafe_no_gloves) as unsafe_no_gloves,
+         sum(unsafe_no_labcoat) as unsafe_no_labcoat, sum(unsafe_no_glasses) as unsafe_no_glasses,
+         sum(alerts) as alerts, sum(spills) as spills
+  from rollup_hourly
+  group by 1;
+
+create or replace view rollup_hour_of_day as
+  select extract(hour from bucket at time zone 'utc')::int as hour,
+         sum(persons_total) as persons_total, sum(persons_safe) as persons_safe
+  from rollup_hourly
+  group by 1;
+
+-- Rollups are bumped by statement-level AFTER INSERT triggers, in the same
+-- transaction as the insert: a crash or a retried batch can't make them
+-- drift from the raw tables. Triggers hold the rollup advisory lock in
+-- shared mode (they don't block each other); rebuild_rollups() takes it
+-- exclusively, so a rebuild never interleaves with an in-flight insert.
+drop function if exists apply_rollup_deltas(jsonb);
+
+create or replace function rollup_persons_insert()
+returns trigger
+language plpgsql
+as $$
+begin
+  perform pg_advisory_xact_lock_shared(hashtext('rollups'));
+  insert into rollup_hourly as r (
+    bucket, persons_total, persons_safe, persons_unsafe, status_safe, unsafe_red,
+    has_mask, has_gloves, has_labcoat, has_glasses,
+    unsafe_no_mask, unsafe_no_gloves, unsafe_no_labcoat, unsafe_no_glasses
+  )
+  select date_trunc('hour', created_at),
+         count(*),
+         count(*) filter (where has_mask is true and has_gloves is true and has_labcoat is true and has_glasses is true),
+         count(*) filter (where lower(status) = 'unsafe'),
+         count(*) filter (where status = 'safe'),
+         count(*) filter (where lower(status) = 'unsafe' and in_red_zone is true),
+         count(*) filter (where has_mask is true),
+         count(*) filter (where has_gloves is true),
+         count(*) filter (where has_labcoat is true),
+         count(*) filter (where has_glasses is true),
+         count(*) filter (where lower(status) = 'unsafe' and has_mask is not true),
+         count(*) filter (where lower(status) = 'unsafe' and has_gloves is not true),
+         count(*) filter (where lower(status) = 'unsafe' and has_labcoat is not true),
+         count(*) filter (where lower(status) = 'unsafe' and has_glasses is not true)
+  from new_rows
+  where created_at is not null
+  group by 1
+  on conflict (bucket) do update set
+    persons_total = r.persons_total + excluded.persons_total,
+    persons_safe = r.persons_safe + excluded.persons_safe,
+    persons_unsafe = r.persons_unsafe + excluded.persons_unsafe,
+    status_safe = r.status_safe + excluded.status_safe,
+    unsafe_red = r.unsafe_red + excluded.unsafe_red,
+    has_mask = r.has_mask + excluded.has_mask,
+    has_gloves = r.has_gloves + excluded.has_gloves,
+    has_labcoat = r.has_labcoat + excluded.has_labcoat,
+    has_glasses = r.has_glasses + excluded.has_glasses,
+    unsafe_no_mask = r.unsafe_no_mask + excluded.unsafe_no_mask,
+    unsafe_no_gloves = r.unsafe_no_gloves + excluded.unsafe_no_gloves,
+    unsafe_no_labcoat = r.unsafe_no_labcoat + excluded.unsafe_no_labcoat,
+    unsafe_no_glasses = r.unsafe_no_glasses + excluded.unsafe_no_glasses;
+  return null;
+end;
+$$;
+
+create or replace function rollup_alerts_insert()
+returns trigger
+language plpgsql
+as $$
+begin
+  perform pg_advisory_xact_lock_shared(hashtext('rollups'));
+  insert into rollup_hourly as r (bucket, alerts)
+  select date_trunc('hour', created_at), count(*) from new_rows where created_at is not null group by 1
+  on conflict (bucket) do update set alerts = r.alerts + excluded.alerts;
+
+  insert into rollup_alert_types as r (alert_type, total)
+  select coalesce(alert_type, 'Unknown'), count(*) from new_rows group by 1
+  on conflict (alert_type) do update set total = r.total + excluded.total;
+  return null;
+end;
+$$;
+
+create or replace function rollup_spills_insert()
+returns trigger
+language plpgsql
+as $$
+begin
+  perform pg_advisory_xact_lock_shared(hashtext('rollups'));
+  insert into rollup_hourly as r (bucket, spills)
+  select date_trunc('hour', detected_at), count(*) from new_rows where detected_at is not null group by 1
+  on conflict (bucket) do update set spills = r.spills + excluded.spills;
+  return null;
+end;
+$$;
+
+create or replace function rollup_detections_insert()
+returns trigger
+language plpgsql
+as $$
+begin
+  perform pg_advisory_xact_lock_shared(hashtext('rollups'));
+  insert into rollup_detection_conf as r (class_name, total, conf_sum)
+  select class_name, count(*), sum(confidence) from new_rows
+  where class_name is not null and confidence is not null
+  group by 1
+  on conflict (class_name) do update set
+    total = r.total + excluded.total,
+    conf_sum = r.conf_sum + excluded.conf_sum;
+  return null;
+end;
+$$;
+
+drop trigger if exists rollup_persons on persons;
+create trigger rollup_persons after insert on persons
+  referencing new table as new_rows for each statement execute function rollup_persons_insert();
+
+drop trigger if exists rollup_alerts on alerts;
+create trigger rollup_alerts after insert on alerts
+  referencing new table as new_rows for each statement execute function rollup_alerts_insert();
+
+drop trigger if exists rollup_spills on spills;
+create trigger rollup_spills after insert on spills
+  referencing new table as new_rows for each statement execute function rollup_spills_insert();
+
+drop trigger if exists rollup_detections on detections;
+create trigger rollup_detections after insert on detections
+  referencing new table as new_rows for each statement execute function rollup_detections_insert();
+
+create or replace function rebuild_rollups()
+returns void
+language plpgsql
+as $$
+begin
+  -- waits for inserts whose trigger already ran, and holds new ones back until the rebuild commits
+  perform pg_advisory_xact_lock(hashtext('rollups'));
+  truncate rollup_hourly, rollup_alert_types, rollup_detection_conf;
+
+  insert into rollup_hourly (
+    bucket, persons_total, persons_safe, persons_unsafe, status_safe, unsafe_red,
+    has_mask, has_gloves, has_labcoat, has_glasses,
+    unsafe_no_mask, unsafe_no_gloves, unsafe_no_labcoat, unsafe_no_glasses
+  )
+  select date_trunc('hour', created_at),
+         count(*),
+         count(*) filter (where has_mask is true and has_gloves is true and has_labcoat is true and has_glasses is true),
+         count(*) filter (where lower(status) = 'unsafe'),
+         count(*) filter (where status = 'safe'),
+         count(*) filter (where lower(status) = 'unsafe' and in_red_zone is true),
+         count(*) filter (where has_mask is true),
+         count(*) filter (where has_gloves is true),
+         count(*) filter (where has_labcoat is true),
+         count(*) filter (where has_glasses is true),
+         count(*) filter (where lower(status) = 'unsafe' and has_mask is not true),
+         count(*) filter (where lower(status) = 'unsafe' and has_gloves is not true),
+         count(*) filter (where lower(status) = 'unsafe' and has_labcoat is not true),
+         count(*) filter (where lower(status) = 'unsafe' and has_glasses is not true)
+  from persons
+  where created_at is not null
+  group by 1;
+
+  insert into rollup_hourly as r (bucket, alerts)
+  select date_trunc('hour', created_at), count(*) from alerts where created_at is not null group by 1
+  on conflict (bucket) do update set alerts = r.alerts + excluded.alerts;
+
+  insert into rollup_hourly as r (bucket, spills)
+  select date_trunc('hour', detected_at), count(*) from spills where detected_at is not null group by 1
+  on conflict (bucket) do update set spills = r.spills + excluded.spills;
+
+  insert into rollup_alert_types (alert_type, total)
+  select coalesce(alert_type, 'Unknown'), count(*) from alerts group by 1;
+
+  insert into rollup_detection_conf (class_name, total, conf_sum)
+  select class_name, count(*), sum(confidence) from detections
+  where class_name is not null and confidence is not null
+  group by 1;
+end;
+$$;